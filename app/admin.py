@@ -10,8 +10,8 @@ class UserAdmin(admin.ModelAdmin):
 
 
 class PostAdminSite(admin.ModelAdmin):
-    list_display = ['title', 'user', 'topic']
-    list_filter = ['title', 'user', 'topic']
+    list_display = ['title', 'user', 'topic', 'status', 'created']
+    list_filter = ['status', 'title', 'user', 'topic']
     search_fields = ['title', 'content']
 
 
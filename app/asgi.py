@@ -0,0 +1,164 @@
+"""
+ASGI entry point of the API, served by blog.asgi.
+
+Django 2.2 has neither ASGI support nor an async ORM, so the ASGI application runs the
+regular Django handler in worker threads. The connections wait in the event loop, which
+holds thousands of them at little cost, and only the requests being handled take a
+thread: reads (GET, HEAD and OPTIONS, i.e. the list and retrieve endpoints) share a pool
+of ASGI_READ_THREADS threads, writes a separate pool of ASGI_WRITE_THREADS, so a burst of
+slow reads never starves writes and writes stay as serialized as with the WSGI workers.
+
+A request runs from the first query to the last body chunk in the same thread, since
+Django's database connections belong to the thread that opened them. Response chunks are
+handed to the event loop as they are produced, so streaming responses (the post export)
+are not buffered.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+READ_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class ASGIHandler(object):
+
+    def __init__(self, read_threads=None, write_threads=None):
+        self.wsgi = WSGIHandler()
+        self.read_executor = ThreadPoolExecutor(
+            max_workers=read_threads or settings.ASGI_READ_THREADS, thread_name_prefix='asgi-read',
+        )
+        self.write_executor = ThreadPoolExecutor(
+            max_workers=write_threads or settings.ASGI_WRITE_THREADS, thread_name_prefix='asgi-write',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError('Unsupported ASGI scope type: {}'.format(scope['type']))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def shutdown(self):
+        self.read_executor.shutdown(wait=True)
+        self.write_executor.shutdown(wait=True)
+
+    def executor(self, scope):
+        return self.read_executor if scope['method'] in READ_METHODS else self.write_executor
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor(scope), self.handle, scope, body, send, loop)
+        finally:
+            body.close()
+
+    async def read_body(self, receive):
+        """
+        The request body, spooled to disk past FILE_UPLOAD_MAX_MEMORY_SIZE, or None if the
+        client went away before sending it.
+        """
+        body = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode='w+b')
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    def handle(self, scope, body, send, loop):
+        """
+        Runs in a worker thread: calls the WSGI handler and sends the response.
+        """
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        def start():
+            if not response.get('started'):
+                response['started'] = True
+                emit({'type': 'http.response.start', 'status': response['status'],
+                      'headers': response['headers']})
+
+        chunks = self.wsgi(self.environ(scope, body), start_response)
+        try:
+            for chunk in chunks:
+                if chunk:
+                    start()
+                    emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            # Sends request_finished, which closes the database connections of this thread.
+            chunks.close()
+        start()
+        emit({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    def environ(self, scope, body):
+        script_name = scope.get('root_path', '')
+        path = scope['path']
+        if script_name and path.startswith(script_name):
+            path = path[len(script_name):]
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            # WSGI carries paths as latin-1 decoded bytes.
+            'SCRIPT_NAME': script_name.encode('utf-8').decode('latin-1'),
+            'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1] or 80),
+            'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+            environ['REMOTE_PORT'] = str(scope['client'][1])
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_{}'.format(name)
+            if name in environ:
+                # HTTP/2 sends every cookie as a header of its own, joined like Cookie values.
+                value = '{}{}{}'.format(environ[name], '; ' if name == 'HTTP_COOKIE' else ',', value)
+            environ[name] = value
+        return environ
+
+
+def get_asgi_application():
+    import django
+
+    django.setup(set_prefix=False)
+    return ASGIHandler()
@@ -0,0 +1,228 @@
+"""
+Batch writes of posts for the bulk endpoints of PostViewSet.
+
+A batch is validated in memory, checked against the database with one query per kind of
+lookup (posts, topics) and written with bulk_create/bulk_update or a single UPDATE in
+one transaction. Results are reported per item, in input order. Bulk writes send no
+model signals, so the cached representations are dropped here.
+"""
+from django.db import connections, router, transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import PermissionDenied, NotFound
+
+from app import cache
+from app.hyperlinks import detail_url_template
+from app.models import Post, Topic
+from app.serializers import BulkPostSerializer, BulkPostUpdateSerializer
+
+BULK_MAX_ITEMS = 1000
+
+
+def get_items(data):
+    if not isinstance(data, list):
+        raise serializers.ValidationError({
+            'non_field_errors': ['Expected a list of items but got type "{}".'.format(type(data).__name__)]
+        })
+    if len(data) > BULK_MAX_ITEMS:
+        raise serializers.ValidationError({
+            'non_field_errors': ['Ensure this list has no more than {} items.'.format(BULK_MAX_ITEMS)]
+        })
+    return data
+
+
+def error(code, detail):
+    key = 'errors' if code == status.HTTP_400_BAD_REQUEST else 'detail'
+    return {'status': code, key: detail}
+
+
+def validate_items(serializer, items):
+    """
+    Returns the per item results, filled for invalid items, and the ``(index, data)``
+    pairs of the valid ones.
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, serializer.child.run_validation(item)))
+        except serializers.ValidationError as exc:
+            results[index] = error(status.HTTP_400_BAD_REQUEST, exc.detail)
+    return results, valid
+
+
+def require_url(results, valid):
+    """
+    Items of update-like endpoints are identified by the ``url`` of the post.
+    """
+    message = serializers.Field.default_error_messages['required']
+    checked = []
+    for index, data in valid:
+        if 'url' not in data:
+            results[index] = error(status.HTTP_400_BAD_REQUEST, {'url': [message]})
+        else:
+            checked.append((index, data))
+    return checked
+
+
+def check_topics(results, valid):
+    """
+    Reports items whose topic does not exist, with one query for the whole batch.
+    """
+    topic_pks = {data['topic'].pk for _, data in valid if 'topic' in data}
+    existing = set(Topic.objects.filter(pk__in=topic_pks).values_list('pk', flat=True))
+    message = serializers.HyperlinkedRelatedField.default_error_messages['does_not_exist']
+    checked = []
+    for index, data in valid:
+        if 'topic' in data and data['topic'].pk not in existing:
+            results[index] = error(status.HTTP_400_BAD_REQUEST, {'topic': [message]})
+        else:
+            checked.append((index, data))
+    return checked
+
+
+def post_url(request, pk):
+    prefix, suffix = detail_url_template('post-detail', request)
+    return '{}{}{}'.format(prefix, pk, suffix)
+
+
+def create_posts(request, items):
+    serializer = BulkPostSerializer(many=True, context={'request': request})
+    results, valid = validate_items(serializer, items)
+    valid = check_topics(results, valid)
+
+    posts = [Post(user=request.user, **data) for _, data in valid]
+    using = router.db_for_write(Post)
+    with transaction.atomic(using=using):
+        Post.objects.using(using).bulk_create(posts)
+        if posts and posts[0].pk is None:
+            # SQLite has no INSERT ... RETURNING and leaves the pks unset. It lets one
+            # writer at a time in and the transaction holds the write lock since its first
+            # insert, so the posts got consecutive pks, up to the last inserted rowid of
+            # the connection (inserts by the feed triggers do not change it).
+            with connections[using].cursor() as cursor:
+                cursor.execute('SELECT last_insert_rowid()')
+                last = cursor.fetchone()[0]
+            for pk, post in enumerate(posts, start=last - len(posts) + 1):
+                post.pk = pk
+
+    for (index, _), post in zip(valid, posts):
+        cache.invalidate_post(post)
+        post.remember_loaded_values()
+        results[index] = {'status': status.HTTP_201_CREATED, 'url': post_url(request, post.pk)}
+    return results
+
+
+def load_owned_posts(request, results, valid, queryset=None):
+    """
+    Applies IsOwnerOrAdmin to the whole batch with one query. Returns the posts by pk and
+    the ``(index, data)`` pairs the user may change.
+    """
+    posts = (Post.objects if queryset is None else queryset).in_bulk([data['url'].pk for _, data in valid])
+    allowed = []
+    for index, data in valid:
+        post = posts.get(data['url'].pk)
+        if post is None:
+            results[index] = error(status.HTTP_404_NOT_FOUND, NotFound.default_detail)
+        elif post.user_id != request.user.pk and not request.user.is_staff:
+            results[index] = error(status.HTTP_403_FORBIDDEN, PermissionDenied.default_detail)
+        else:
+            allowed.append((index, data))
+    return posts, allowed
+
+
+def update_posts(request, items):
+    serializer = BulkPostUpdateSerializer(many=True, partial=True, context={'request': request})
+    results, valid = validate_items(serializer, items)
+    valid = check_topics(results, require_url(results, valid))
+
+    # The posts are loaded in the transaction that writes them and locked until it ends,
+    # so an edit committed in between is not overwritten with the values read before it.
+    with transaction.atomic():
+        posts, allowed = load_owned_posts(request, results, valid, Post.objects.select_for_update())
+        now = timezone.now()
+        fields = {'modified'}
+        changed = []
+        for index, data in allowed:
+            post = posts[data.pop('url').pk]
+            for name, value in data.items():
+                setattr(post, name, value)
+                fields.add(name)
+            post.modified = now
+            changed.append((index, post))
+        Post.objects.bulk_update({post for _, post in changed}, sorted(fields))
+
+    for index, post in changed:
+        results[index] = {'status': status.HTTP_200_OK, 'url': post_url(request, post.pk)}
+    for post in {post for _, post in changed}:
+        cache.invalidate_post(post)
+        post.remember_loaded_values()
+    return results
+
+
+def publish_posts(request, items):
+    """
+    Posts that are already published are reported as such and not written again.
+    """
+    serializer = BulkPostUpdateSerializer(many=True, partial=True, context={'request': request})
+    results, valid = validate_items(serializer, items)
+    valid = require_url(results, valid)
+    posts, allowed = load_owned_posts(request, results, valid)
+
+    publish = []
+    for index, data in allowed:
+        post = posts[data['url'].pk]
+        if post.status == 'published':
+            results[index] = error(status.HTTP_400_BAD_REQUEST, ['This post is already published'])
+        else:
+            publish.append((index, post))
+
+    publish_rows({(post.pk, post.topic_id, post.user_id) for _, post in publish})
+    for index, post in publish:
+        results[index] = {'status': status.HTTP_200_OK, 'url': post_url(request, post.pk)}
+    return results
+
+
+def publish_filtered(request, filters):
+    """
+    Publishes the draft posts matching ``filters`` (topic, created range) with a single
+    conditional UPDATE. Users publish their own posts, admins everybody's. Returns the
+    number of published posts.
+    """
+    queryset = Post.objects.all()
+    if not request.user.is_staff:
+        queryset = queryset.filter(user=request.user)
+    if 'topic' in filters:
+        queryset = queryset.filter(topic_id=filters['topic'].pk)
+    if 'created_after' in filters:
+        queryset = queryset.filter(created__gte=filters['created_after'])
+    if 'created_before' in filters:
+        queryset = queryset.filter(created__lt=filters['created_before'])
+
+    published = queryset.exclude(status='published').update(status='published', modified=timezone.now())
+    # The published posts are not read, so every cached representation goes.
+    if published:
+        cache.invalidate_all()
+    return published
+
+
+def publish_rows(rows, chunk_size=BULK_MAX_ITEMS):
+    """
+    Publishes the posts given as ``(pk, topic_id, user_id)`` rows with one conditional
+    UPDATE per chunk: posts published concurrently by someone else are left alone, so
+    concurrent publishes never write a post twice. Returns the number of published posts.
+    """
+    rows = list(rows)
+    now = timezone.now()
+    published = 0
+    with transaction.atomic():
+        for start in range(0, len(rows), chunk_size):
+            pks = [row[0] for row in rows[start:start + chunk_size]]
+            published += Post.objects.filter(pk__in=pks).exclude(status='published').update(
+                status='published', modified=now
+            )
+
+    cache.invalidate(*{
+        (model_name, pk) for row in rows for model_name, pk in zip(('post', 'topic', 'user'), row)
+    })
+    return published
@@ -0,0 +1,94 @@
+"""
+Cache of rendered detail responses.
+
+Entries are keyed by model, pk and the URL base (scheme, host and format suffix) their
+hyperlinks were built for. Every object also has a generation token that is part of the
+key: invalidating an object deletes its token, which orphans the entries of all URL
+bases at once without having to know them. A global token, also part of every key,
+orphans the entries of all objects at once.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'API_CACHE_TIMEOUT', 300)
+
+
+_GLOBAL_GENERATION_KEY = 'api:generation'
+
+
+def _generation_key(model_name, pk):
+    return 'api:generation:{}:{}'.format(model_name, pk)
+
+
+def _response_key(model_name, pk, generation, base):
+    return 'api:detail:{}:{}:{}:{}'.format(
+        model_name, pk, generation, hashlib.md5(base.encode('utf-8')).hexdigest()
+    )
+
+
+def get_generation(model_name, pk):
+    """
+    Returns the current generation of an object, with the global one, starting new ones
+    where there are none. Must be called before the object is read from the database: if
+    the object changes in between, the response is stored under a generation that is
+    already gone.
+    """
+    cache = get_cache()
+    keys = [_GLOBAL_GENERATION_KEY, _generation_key(model_name, pk)]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, uuid.uuid4().hex, None)
+            generations[key] = cache.get(key)
+    return '{}:{}'.format(*[generations[key] for key in keys])
+
+
+def get_response(model_name, pk, generation, base):
+    """
+    Returns the cached ``(content_type, content)`` pair or None.
+    """
+    return get_cache().get(_response_key(model_name, pk, generation, base))
+
+
+def set_response(model_name, pk, generation, base, content_type, content):
+    get_cache().set(_response_key(model_name, pk, generation, base), (content_type, content), get_timeout())
+
+
+def invalidate(*objects):
+    """
+    Drops the cached representations of the given ``(model_name, pk)`` pairs once the
+    current transaction commits, right away outside of one. Until then, concurrent
+    requests still read the old rows and may cache them under the current generation.
+    """
+    keys = [_generation_key(model_name, pk) for model_name, pk in objects if pk is not None]
+    if keys:
+        transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+def invalidate_all():
+    """
+    Drops the cached representations of every object once the current transaction
+    commits, for writes that do not read the rows they change.
+    """
+    transaction.on_commit(lambda: get_cache().delete(_GLOBAL_GENERATION_KEY))
+
+
+def invalidate_post(post):
+    """
+    A post is embedded in the representations of its topic and author, so those are
+    dropped too, including the ones it was attached to before the last save.
+    """
+    objects = {('post', post.pk), ('topic', post.topic_id), ('user', post.user_id)}
+    objects.add(('topic', post.get_loaded_value('topic_id')))
+    objects.add(('user', post.get_loaded_value('user_id')))
+    invalidate(*objects)
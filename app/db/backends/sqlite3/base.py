@@ -0,0 +1,69 @@
+from django.db.backends.sqlite3 import base
+
+from app.db.backends.sqlite3.schema import DatabaseSchemaEditor
+from app.db.pool import PooledDatabaseWrapperMixin
+
+# PRAGMAs run on every new connection, by name of the profile selected with the PRAGMAS
+# database setting (which may also be a dict of PRAGMAs).
+PRAGMA_PROFILES = {
+    # SQLite's own defaults: rollback journal, readers and writers block each other.
+    'default': {},
+    'tuned': {
+        # Readers and the writer no longer block each other, a commit appends to the WAL.
+        'journal_mode': 'WAL',
+        # Fsync at checkpoints only. With WAL the database stays consistent, an OS crash or
+        # power loss may lose the last commits, an application crash loses nothing.
+        'synchronous': 'NORMAL',
+        # Milliseconds a writer waits for the lock before failing with "database is locked".
+        'busy_timeout': 5000,
+        # Page cache of each connection, in KiB when negative: 64 MiB.
+        'cache_size': -64000,
+        # Reads go through a memory map of up to 256 MiB of the file instead of read() calls.
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# How atomic blocks begin their transaction, by name of the PRAGMA profile, overridden with
+# the TRANSACTION_MODE database setting. A DEFERRED transaction that reads and then writes
+# asks for the write lock at its first write: if another connection wrote in between, it
+# fails with "database is locked" at once, whatever busy_timeout says, since waiting could
+# not make its snapshot current. IMMEDIATE takes the write lock at BEGIN, where
+# busy_timeout applies, and in WAL mode readers are still not blocked.
+TRANSACTION_MODES = {
+    'default': 'DEFERRED',
+    'tuned': 'IMMEDIATE',
+}
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    SchemaEditorClass = DatabaseSchemaEditor
+
+    def get_pool(self):
+        # Closing the connection of an in-memory database (the test database) drops it,
+        # Django keeps it open and it is never given back.
+        if self.is_in_memory_db():
+            return None
+        return super(DatabaseWrapper, self).get_pool()
+
+    def get_pragmas(self):
+        pragmas = self.settings_dict.get('PRAGMAS') or {}
+        if isinstance(pragmas, str):
+            pragmas = PRAGMA_PROFILES[pragmas]
+        return pragmas
+
+    def get_transaction_mode(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE')
+        if mode is None:
+            pragmas = self.settings_dict.get('PRAGMAS')
+            mode = TRANSACTION_MODES.get(pragmas, 'DEFERRED') if isinstance(pragmas, str) else 'DEFERRED'
+        return mode
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN {}'.format(self.get_transaction_mode()))
+
+    def open_connection(self, conn_params):
+        connection = super(DatabaseWrapper, self).open_connection(conn_params)
+        for name, value in self.get_pragmas().items():
+            connection.execute('PRAGMA {} = {}'.format(name, value))
+        return connection
@@ -0,0 +1,65 @@
+import re
+
+from django.db.backends.sqlite3 import schema
+
+
+def mentions(sql, name):
+    return re.search(r'\b{}\b'.format(re.escape(name)), sql, re.IGNORECASE) is not None
+
+
+class DatabaseSchemaEditor(schema.DatabaseSchemaEditor):
+    """
+    Keeps what the migrations create with raw SQL across the table rebuilds SQLite needs
+    for most field changes:
+
+    * triggers (post counters, topic feeds, search index): the triggers on a table go
+      away with the old table, and a trigger on another table that refers to it makes
+      the rebuild fail, so all of them are dropped before the rebuild and created again
+      after it;
+    * expression indexes (case-insensitive emails), which Django does not know about
+      and does not recreate, unless they cover a field the rebuild removes or alters.
+    """
+
+    def triggers_referencing(self, table):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' ORDER BY name")
+            return [(name, sql) for name, sql in cursor.fetchall() if mentions(sql, table)]
+
+    def expression_indexes(self, table):
+        indexes = []
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL "
+                "ORDER BY name", [table]
+            )
+            for name, sql in cursor.fetchall():
+                cursor.execute('PRAGMA index_info({})'.format(self.quote_name(name)))
+                # Expressions have no column (cid -2).
+                if any(cid == -2 for _, cid, _ in cursor.fetchall()):
+                    indexes.append((name, sql))
+        return indexes
+
+    def _create_index_sql(self, model, fields, **kwargs):
+        # Django 2.2 qualifies the columns of partial index conditions with the table
+        # name, which is the temporary name of the new table during a rebuild.
+        if kwargs.get('condition'):
+            kwargs['condition'] = kwargs['condition'].replace(
+                '{}.'.format(self.quote_name(model._meta.db_table)), ''
+            )
+        return super(DatabaseSchemaEditor, self)._create_index_sql(model, fields, **kwargs)
+
+    def _remake_table(self, model, create_field=None, delete_field=None, alter_field=None):
+        table = model._meta.db_table
+        changed = [field.column for field in [delete_field] + list(alter_field or ()) if field is not None]
+        triggers = self.triggers_referencing(table)
+        indexes = [
+            (name, sql) for name, sql in self.expression_indexes(table)
+            if not any(mentions(sql, column) for column in changed)
+        ]
+        for name, _ in triggers:
+            self.execute('DROP TRIGGER {}'.format(self.quote_name(name)))
+        super(DatabaseSchemaEditor, self)._remake_table(
+            model, create_field=create_field, delete_field=delete_field, alter_field=alter_field
+        )
+        for _, sql in indexes + triggers:
+            self.execute(sql, None)
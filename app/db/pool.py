@@ -0,0 +1,189 @@
+"""
+Process wide pools of database connections, used by the backends of app.db.backends.
+
+Django keeps one connection per thread and, with CONN_MAX_AGE = 0, opens it at the first
+query of a request and closes it when the request finishes. The pooled backends hand the
+connection back to the pool of their database instead of closing it, so the next request
+of any thread reuses it without connecting again. The ``POOL`` entry of the database
+settings configures the pool:
+
+* ``SIZE``: connections open at most, idle or in use, 0 disables pooling. A thread
+  needing a connection while all of them are in use waits for one.
+* ``TIMEOUT``: seconds to wait for a connection before failing with OperationalError.
+* ``MAX_LIFETIME``: seconds after which a connection is closed instead of reused.
+* ``CHECK_IDLE``: connections idle for longer than this many seconds run ``SELECT 1``
+  before being reused, and are replaced when it fails.
+
+Waits, timeouts and connections opened, reused and closed are reported by app.metrics.
+"""
+import threading
+import time
+
+from django.db import OperationalError
+
+from app import metrics
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool(object):
+
+    def __init__(self, alias, size, timeout=10, max_lifetime=600, check_idle=30):
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        # (connection, created, released) of the idle connections, the most recently
+        # released last: reusing it first lets the others reach CHECK_IDLE and expire.
+        self.idle = []
+        self.opened = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, connect):
+        """
+        Returns a ``(connection, created)`` pair, reusing an idle connection or opening
+        one with ``connect()`` when the pool is not full.
+        """
+        start = time.monotonic()
+        with self.condition:
+            while not self.idle and self.opened >= self.size:
+                remaining = start + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.count('timeout')
+                    raise OperationalError('No connection of the "{}" database pool was released within {} '
+                                           'seconds.'.format(self.alias, self.timeout))
+                self.condition.wait(remaining)
+            if self.idle:
+                connection, created, released = self.idle.pop()
+            else:
+                connection = None
+                self.opened += 1
+        now = time.monotonic()
+        metrics.DB_POOL_WAIT.observe((self.alias,), now - start)
+
+        if connection is not None:
+            if now - created > self.max_lifetime:
+                self.discard(connection, 'expired')
+                connection = None
+            elif now - released > self.check_idle and not self.is_usable(connection):
+                self.discard(connection, 'unhealthy')
+                connection = None
+            else:
+                self.count('reused')
+                return connection, created
+            with self.condition:
+                self.opened += 1
+
+        try:
+            connection = connect()
+        except Exception:
+            self.discard(None, None)
+            raise
+        self.count('opened')
+        return connection, now
+
+    def release(self, connection, created):
+        """
+        Gives a connection back, rolling back what it left uncommitted.
+        """
+        now = time.monotonic()
+        if now - created > self.max_lifetime:
+            self.discard(connection, 'expired')
+            return
+        try:
+            connection.rollback()
+        except Exception:
+            self.discard(connection, 'broken')
+            return
+        with self.condition:
+            self.idle.append((connection, created, now))
+            self.condition.notify()
+
+    def discard(self, connection, reason):
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+            self.count(reason)
+        with self.condition:
+            self.opened -= 1
+            self.condition.notify()
+
+    @staticmethod
+    def is_usable(connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def count(self, event):
+        metrics.DB_POOL_CONNECTIONS.inc((self.alias, event))
+
+    def close(self):
+        """
+        Closes the idle connections.
+        """
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for connection, _, _ in idle:
+            self.discard(connection, 'closed')
+
+
+def get_pool(alias, settings_dict):
+    """
+    The pool of a database, or None when its POOL settings disable pooling.
+    """
+    options = settings_dict.get('POOL') or {}
+    if not options.get('SIZE'):
+        return None
+    key = (alias, settings_dict['NAME'], settings_dict.get('HOST'), settings_dict.get('PORT'))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(
+                    alias, options['SIZE'],
+                    **{name.lower(): options[name] for name in ('TIMEOUT', 'MAX_LIFETIME', 'CHECK_IDLE')
+                       if name in options}
+                )
+    return pool
+
+
+class PooledDatabaseWrapperMixin(object):
+    """
+    Takes the connections of a Django DatabaseWrapper from the pool of its database and
+    gives them back on close().
+    """
+    pooled_since = None
+
+    def get_pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def open_connection(self, conn_params):
+        """
+        Opens a new connection, for the pool or not. Per connection setup goes here, it is
+        kept by pooled connections.
+        """
+        return super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params)
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool()
+        if pool is None:
+            return self.open_connection(conn_params)
+        connection, self.pooled_since = pool.acquire(lambda: self.open_connection(conn_params))
+        return connection
+
+    def _close(self):
+        pool = self.get_pool()
+        if pool is None or self.pooled_since is None:
+            return super(PooledDatabaseWrapperMixin, self)._close()
+        created, self.pooled_since = self.pooled_since, None
+        with self.wrap_database_errors:
+            pool.release(self.connection, created)
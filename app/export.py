@@ -0,0 +1,82 @@
+"""
+Streaming export of posts as NDJSON or CSV.
+
+Rows are read with ``QuerySet.iterator()`` (a server-side cursor on Postgres, chunked
+fetches on SQLite) and written out chunk by chunk, so memory use does not depend on the
+number of exported posts.
+"""
+import csv
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from app.hyperlinks import detail_url_template
+
+EXPORT_FIELDS = ('url', 'topic', 'user', 'title', 'content', 'status', 'created', 'modified')
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+CHUNK_SIZE = 2000
+
+
+def export_rows(request, queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yields one tuple per post, in EXPORT_FIELDS order, with the same hyperlinks as
+    PostSerializer. Datetimes are left as they are.
+    """
+    post_prefix, post_suffix = detail_url_template('post-detail', request)
+    topic_prefix, topic_suffix = detail_url_template('topic-detail', request)
+    user_prefix, user_suffix = detail_url_template('user-detail', request)
+
+    rows = queryset.values_list(
+        'pk', 'topic_id', 'user_id', 'title', 'content', 'status', 'created', 'modified'
+    ).iterator(chunk_size=chunk_size)
+    for pk, topic_id, user_id, title, content, status, created, modified in rows:
+        yield (
+            '{}{}{}'.format(post_prefix, pk, post_suffix),
+            '{}{}{}'.format(topic_prefix, topic_id, topic_suffix),
+            '{}{}{}'.format(user_prefix, user_id, user_suffix),
+            title, content, status, created, modified,
+        )
+
+
+def chunked(lines, chunk_size=CHUNK_SIZE):
+    """
+    Joins lines into chunks, so the response is not written one row at a time.
+    """
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def ndjson_lines(rows):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+
+class _Line(object):
+    """
+    File-like object for csv.writer that hands back the written line.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    encoder = JSONEncoder()
+    writer = csv.writer(_Line())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row[:6] + (encoder.default(row[6]), encoder.default(row[7])))
+
+
+def export(request, queryset, output):
+    lines = ndjson_lines if output == 'ndjson' else csv_lines
+    return chunked(lines(export_rows(request, queryset)))
@@ -0,0 +1,53 @@
+"""
+Password hashing with a cost set per environment, and optionally a bound on the number
+of hashes running at once.
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher, with the iterations of settings.PASSWORD_HASH_ITERATIONS.
+    Hashes of another cost still verify and are upgraded on the next login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+_slots = None
+_slots_size = None
+_slots_lock = threading.Lock()
+
+
+def get_slots():
+    """
+    The semaphore of the process bounding the hashes to settings.PASSWORD_HASH_CONCURRENCY,
+    None when the setting is 0. Created once, and again only if the setting changes.
+    """
+    global _slots, _slots_size
+    size = settings.PASSWORD_HASH_CONCURRENCY
+    if not size:
+        return None
+    with _slots_lock:
+        if _slots_size != size:
+            _slots, _slots_size = threading.BoundedSemaphore(size), size
+        return _slots
+
+
+def make_password(password):
+    """
+    Hashes in the request thread. With PASSWORD_HASH_CONCURRENCY set, at most that many
+    hashes run at once however many requests sign up: a burst queues on the semaphore
+    instead of sharing the CPUs between all of its PBKDF2 runs, and the threads that do
+    not sign up keep some CPU.
+    """
+    slots = get_slots()
+    if slots is None:
+        return hashers.make_password(password)
+    with slots:
+        return hashers.make_password(password)
@@ -0,0 +1,75 @@
+"""
+Hyperlinks built without going through the URL resolver for every object.
+
+A view name is reversed once with a placeholder in place of the lookup value and the
+result is kept as a ``(prefix, suffix)`` template for each scheme, host, script prefix
+and urlconf. Building a hyperlink then only formats the lookup value into the template.
+"""
+from urllib.parse import quote
+
+from django.urls import get_script_prefix, get_urlconf
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+
+from app.profiling import phase
+
+PK_PLACEHOLDER = 'pk-placeholder'
+
+# Characters Django leaves unquoted in reversed URL arguments.
+SAFE_CHARACTERS = "!$&'()*+,;=/~:@"
+
+# Keyed by host among others, the templates are dropped once there are this many.
+MAX_TEMPLATES = 1024
+
+_templates = {}
+
+
+def url_template(view_name, request, format=None, lookup_url_kwarg='pk'):
+    """
+    Returns a ``(prefix, suffix)`` pair, so that ``prefix + str(pk) + suffix`` is the URL
+    ``reverse(view_name, kwargs={lookup_url_kwarg: pk}, request=request, format=format)``
+    would build. Without ``lookup_url_kwarg`` the suffix is empty and the prefix is the
+    URL of ``view_name`` itself.
+    """
+    key = (view_name, format, lookup_url_kwarg, get_script_prefix(), get_urlconf())
+    if request is not None:
+        key += (request.scheme, request.get_host())
+    template = _templates.get(key)
+    if template is None:
+        if len(_templates) >= MAX_TEMPLATES:
+            _templates.clear()
+        kwargs = {lookup_url_kwarg: PK_PLACEHOLDER} if lookup_url_kwarg else None
+        with phase('reverse'):
+            url = reverse(view_name, kwargs=kwargs, request=request, format=format)
+        template = _templates[key] = tuple(url.split(PK_PLACEHOLDER, 1)) if kwargs else (url, '')
+    return template
+
+
+def detail_url_template(view_name, request, format=None):
+    return url_template(view_name, request, format)
+
+
+def list_url(view_name, request, format=None):
+    return url_template(view_name, request, format, lookup_url_kwarg=None)[0]
+
+
+class TemplateHyperlinkMixin(object):
+    """
+    Builds the URLs of DRF hyperlinked fields from app.hyperlinks templates.
+    """
+
+    def get_url(self, obj, view_name, request, format):
+        # Unsaved objects will not yet have a valid URL.
+        if hasattr(obj, 'pk') and obj.pk in (None, ''):
+            return None
+        lookup_value = getattr(obj, self.lookup_field)
+        prefix, suffix = url_template(view_name, request, format, self.lookup_url_kwarg)
+        return '{}{}{}'.format(prefix, quote(str(lookup_value), safe=SAFE_CHARACTERS), suffix)
+
+
+class HyperlinkedRelatedField(TemplateHyperlinkMixin, serializers.HyperlinkedRelatedField):
+    pass
+
+
+class HyperlinkedIdentityField(TemplateHyperlinkMixin, serializers.HyperlinkedIdentityField):
+    pass
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from app import cache
+from app.models import Post, Topic, User
+
+# Rows per UPDATE, below the SQLite limit of query parameters.
+CHUNK_SIZE = 500
+
+
+def actual_count(column, **filters):
+    counts = Post.objects.filter(**{column: OuterRef('pk')}, **filters).order_by().values(column)
+    return Coalesce(Subquery(counts.annotate(count=Count('pk')).values('count'), output_field=IntegerField()), Value(0))
+
+
+def drifted_pks(model, column):
+    return list(model.objects.annotate(
+        actual_post_count=actual_count(column),
+        actual_published_count=actual_count(column, status='published'),
+    ).filter(
+        ~Q(post_count=F('actual_post_count')) | ~Q(published_count=F('actual_published_count'))
+    ).values_list('pk', flat=True))
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the post_count and published_count of the topics and users that drifted from their posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the rows that drifted.')
+
+    def handle(self, *args, **options):
+        for model, column in [(Topic, 'topic'), (User, 'user')]:
+            with transaction.atomic():
+                pks = drifted_pks(model, column)
+                if not options['dry_run']:
+                    now = timezone.now()
+                    for start in range(0, len(pks), CHUNK_SIZE):
+                        # ``modified`` moves too, so conditional GETs see the new counts.
+                        model.objects.filter(pk__in=pks[start:start + CHUNK_SIZE]).update(
+                            post_count=actual_count(column),
+                            published_count=actual_count(column, status='published'),
+                            modified=now,
+                        )
+            if not options['dry_run']:
+                model_name = model._meta.model_name
+                cache.invalidate(*[(model_name, pk) for pk in pks])
+            self.stdout.write('{}: {} {} drifted{}'.format(
+                model._meta.verbose_name_plural, len(pks), 'row' if len(pks) == 1 else 'rows',
+                '' if options['dry_run'] else ', reconciled',
+            ))
@@ -0,0 +1,305 @@
+"""
+Prometheus style metrics of the API, exposed in the text exposition format by
+app.views.metrics to the addresses of METRICS_ALLOWED_IPS and to staff users.
+
+Metrics live in the registry of this process. With METRICS_MULTIPROCESS_DIR set (several
+WSGI worker processes), every process also writes its values to a file of its own in
+that directory, at most every METRICS_FLUSH_INTERVAL seconds, and a scrape adds up the
+files of all processes, including the ones that exited.
+
+Recording takes a lock and updates a dict entry: label values are passed as a tuple, in
+the order of the label names of the metric.
+"""
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('app.metrics')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Metric(object):
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def snapshot(self):
+        with self.lock:
+            samples = [[list(labels), self.copy_value(value)] for labels, value in self.values.items()]
+        return {'type': self.type, 'help': self.documentation, 'labelnames': list(self.labelnames),
+                'samples': samples}
+
+    def copy_value(self, value):
+        return value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Histogram(Metric):
+    """
+    Values are ``[count per bucket..., sum, count]``, the last bucket being +Inf.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, amount):
+        index = bisect.bisect_left(self.buckets, amount)
+        with self.lock:
+            value = self.values.get(labels)
+            if value is None:
+                value = self.values[labels] = [0] * (len(self.buckets) + 3)
+            value[index] += 1
+            value[-2] += amount
+            value[-1] += 1
+
+    def snapshot(self):
+        snapshot = super(Histogram, self).snapshot()
+        snapshot['buckets'] = list(self.buckets)
+        return snapshot
+
+    def copy_value(self, value):
+        return list(value)
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.metrics = []
+        self.flushed = 0.0
+        self.path = None
+        # Held by the thread writing the file of this process.
+        self.lock = threading.Lock()
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def process_path(self, directory):
+        # The random part tells processes that got the pid of an exited one apart.
+        if self.path is None or os.path.dirname(self.path) != directory:
+            self.path = os.path.join(directory, 'metrics-{}-{}.json'.format(os.getpid(), uuid.uuid4().hex))
+        return self.path
+
+    def flush(self, force=False):
+        """
+        Writes the values of this process to METRICS_MULTIPROCESS_DIR, if set, unless
+        they were written less than METRICS_FLUSH_INTERVAL seconds ago. The file is
+        written under a temporary name and renamed, so a scrape never reads half of it.
+        """
+        directory = getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+        if not directory:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.flushed < settings.METRICS_FLUSH_INTERVAL:
+                return
+            self.flushed = now
+            path = self.process_path(directory)
+            fd, temporary = tempfile.mkstemp(dir=directory, prefix='{}.'.format(os.path.basename(path)),
+                                             suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.snapshot(), f)
+                os.replace(temporary, path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+
+    def collect(self):
+        """
+        The values of all processes: this one, or every file of METRICS_MULTIPROCESS_DIR.
+        """
+        directory = getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+        if not directory:
+            return self.snapshot()
+        self.flush(force=True)
+        snapshots = []
+        for name in sorted(os.listdir(directory)):
+            if name.startswith('metrics-') and name.endswith('.json'):
+                try:
+                    with open(os.path.join(directory, name)) as f:
+                        snapshots.append(json.load(f))
+                except (IOError, ValueError):
+                    continue
+        return merge(snapshots)
+
+    def exposition(self):
+        return exposition(self.collect())
+
+
+def merge(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, dict(metric, samples={}))
+            for labels, value in metric['samples']:
+                key = tuple(labels)
+                if metric['type'] == 'histogram':
+                    previous = target['samples'].get(key, [0] * len(value))
+                    target['samples'][key] = [a + b for a, b in zip(previous, value)]
+                else:
+                    target['samples'][key] = target['samples'].get(key, 0) + value
+    for metric in merged.values():
+        metric['samples'] = [[list(labels), value] for labels, value in metric['samples'].items()]
+    return merged
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{{{}}}'.format(','.join('{}="{}"'.format(name, escape(value)) for name, value in pairs))
+
+
+def format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return '{:.1f}'.format(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def exposition(snapshot):
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append('# HELP {} {}'.format(name, metric['help'].replace('\\', r'\\').replace('\n', r'\n')))
+        lines.append('# TYPE {} {}'.format(name, metric['type']))
+        for labels, value in sorted(metric['samples']):
+            if metric['type'] == 'histogram':
+                cumulative = 0
+                for bound, count in zip(metric['buckets'] + ['+Inf'], value[:-2]):
+                    cumulative += count
+                    lines.append('{}_bucket{} {}'.format(
+                        name, format_labels(metric['labelnames'], labels, [('le', bound)]), cumulative
+                    ))
+                lines.append('{}_sum{} {}'.format(name, format_labels(metric['labelnames'], labels),
+                                                  format_number(value[-2])))
+                lines.append('{}_count{} {}'.format(name, format_labels(metric['labelnames'], labels), value[-1]))
+            else:
+                lines.append('{}{} {}'.format(name, format_labels(metric['labelnames'], labels), format_number(value)))
+    return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'api_requests_total', 'Requests handled, by viewset, action and response status.',
+    ('viewset', 'action', 'status'),
+)
+REQUEST_DURATION = registry.histogram(
+    'api_request_duration_seconds', 'Time to handle a request, in seconds.', ('viewset', 'action'),
+)
+REQUEST_QUERIES = registry.histogram(
+    'api_request_queries', 'Database queries run by a request.', ('viewset', 'action'), buckets=COUNT_BUCKETS,
+)
+REQUEST_QUERY_DURATION = registry.histogram(
+    'api_request_query_duration_seconds', 'Time a request spent in database queries, in seconds.',
+    ('viewset', 'action'),
+)
+CACHE_LOOKUPS = registry.counter(
+    'api_cache_lookups_total', 'Lookups of cached responses, by model and result (hit or miss).',
+    ('model', 'result'),
+)
+DB_POOL_WAIT = registry.histogram(
+    'api_db_pool_wait_seconds', 'Time spent waiting for a connection of a database pool, in seconds.', ('database',),
+)
+DB_POOL_CONNECTIONS = registry.counter(
+    'api_db_pool_connections_total', 'Connections of a database pool by event: opened, reused, and closed because '
+    'expired, unhealthy, broken or on shutdown; timeout counts the waits that gave up.', ('database', 'event'),
+)
+
+
+def view_labels(request):
+    """
+    ``(viewset, action)`` of the view that handled the request: the viewset class and
+    its action for DRF viewsets, the view name otherwise.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '', ''
+    view = match.func
+    actions = getattr(view, 'actions', None)
+    if actions is not None:
+        return view.cls.__name__, actions.get(request.method.lower(), '')
+    cls = getattr(view, 'view_class', None) or getattr(view, 'cls', None)
+    return (cls.__name__ if cls is not None else view.__name__), request.method.lower()
+
+
+class QueryTimer(object):
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware(object):
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        labels = view_labels(request)
+        REQUESTS.inc(labels + (str(response.status_code),))
+        REQUEST_DURATION.observe(labels, duration)
+        REQUEST_QUERIES.observe(labels, queries.count)
+        REQUEST_QUERY_DURATION.observe(labels, queries.seconds)
+        try:
+            registry.flush()
+        except Exception:
+            # Metrics are not worth failing the request: the next one writes them again.
+            logger.exception('Could not write the metrics to %s', settings.METRICS_MULTIPROCESS_DIR)
+        return response
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+SQLITE_FORWARDS = [
+    "CREATE VIRTUAL TABLE app_post_fts USING fts5("
+    "title, content, content='app_post', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER app_post_fts_insert AFTER INSERT ON app_post BEGIN "
+    "INSERT INTO app_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    "CREATE TRIGGER app_post_fts_delete AFTER DELETE ON app_post BEGIN "
+    "INSERT INTO app_post_fts(app_post_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "END",
+    "CREATE TRIGGER app_post_fts_update AFTER UPDATE OF title, content ON app_post BEGIN "
+    "INSERT INTO app_post_fts(app_post_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO app_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    "INSERT INTO app_post_fts(app_post_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS app_post_fts_update",
+    "DROP TRIGGER IF EXISTS app_post_fts_delete",
+    "DROP TRIGGER IF EXISTS app_post_fts_insert",
+    "DROP TABLE IF EXISTS app_post_fts",
+]
+
+# The expression must match app.search.POSTGRES_DOCUMENT.
+POSTGRES_FORWARDS = [
+    "CREATE INDEX post_search_idx ON app_post USING GIN "
+    "((to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))))",
+]
+
+POSTGRES_BACKWARDS = [
+    "DROP INDEX IF EXISTS post_search_idx",
+]
+
+
+def run_for_vendor(sqlite, postgresql):
+    def run(apps, schema_editor):
+        statements = {
+            'sqlite': sqlite,
+            'postgresql': postgresql,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(SQLITE_FORWARDS, POSTGRES_FORWARDS),
+            run_for_vendor(SQLITE_BACKWARDS, POSTGRES_BACKWARDS),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_post_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='modified',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
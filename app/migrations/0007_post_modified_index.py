@@ -0,0 +1,17 @@
+# Generated by Django 2.2 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_topic_modified'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['modified', 'id'], name='post_modified_id_idx'),
+        ),
+    ]
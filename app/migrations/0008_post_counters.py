@@ -0,0 +1,107 @@
+# Generated by Django 2.2 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+def counter_updates(sign, row):
+    published = "(CASE WHEN {row}.status = 'published' THEN 1 ELSE 0 END)".format(row=row)
+    return [
+        "UPDATE {table} SET post_count = post_count {sign} 1, published_count = published_count {sign} {published} "
+        "WHERE id = {row}.{column};".format(table=table, sign=sign, published=published, row=row, column=column)
+        for table, column in [('app_topic', 'topic_id'), ('app_user', 'user_id')]
+    ]
+
+
+# SQLite rebuilds a table for most field changes, which drops the triggers on it and fails
+# while triggers on other tables refer to it. The schema editor of app.db.backends.sqlite3
+# drops these triggers before a rebuild of app_post, app_topic or app_user and creates them
+# again after it; Django's own sqlite3 backend does not.
+SQLITE_FORWARDS = [
+    "CREATE TRIGGER app_post_counts_insert AFTER INSERT ON app_post BEGIN {} END".format(
+        ' '.join(counter_updates('+', 'new'))
+    ),
+    "CREATE TRIGGER app_post_counts_delete AFTER DELETE ON app_post BEGIN {} END".format(
+        ' '.join(counter_updates('-', 'old'))
+    ),
+    "CREATE TRIGGER app_post_counts_update AFTER UPDATE OF topic_id, user_id, status ON app_post BEGIN {} END".format(
+        ' '.join(counter_updates('-', 'old') + counter_updates('+', 'new'))
+    ),
+]
+
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS app_post_counts_update",
+    "DROP TRIGGER IF EXISTS app_post_counts_delete",
+    "DROP TRIGGER IF EXISTS app_post_counts_insert",
+]
+
+POSTGRES_FORWARDS = [
+    "CREATE FUNCTION app_post_counts() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP IN ('UPDATE', 'DELETE') THEN {} END IF; "
+    "IF TG_OP IN ('INSERT', 'UPDATE') THEN {} END IF; "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql".format(
+        ' '.join(counter_updates('-', 'OLD')), ' '.join(counter_updates('+', 'NEW'))
+    ),
+    "CREATE TRIGGER app_post_counts AFTER INSERT OR DELETE OR UPDATE OF topic_id, user_id, status ON app_post "
+    "FOR EACH ROW EXECUTE PROCEDURE app_post_counts()",
+]
+
+POSTGRES_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS app_post_counts ON app_post",
+    "DROP FUNCTION IF EXISTS app_post_counts()",
+]
+
+# Counts of the posts that already exist, on every backend.
+BACKFILL = [
+    "UPDATE {table} SET "
+    "post_count = (SELECT COUNT(*) FROM app_post WHERE app_post.{column} = {table}.id), "
+    "published_count = (SELECT COUNT(*) FROM app_post WHERE app_post.{column} = {table}.id "
+    "AND app_post.status = 'published')".format(table=table, column=column)
+    for table, column in [('app_topic', 'topic_id'), ('app_user', 'user_id')]
+]
+
+
+def run_for_vendor(sqlite, postgresql):
+    def run(apps, schema_editor):
+        statements = {
+            'sqlite': sqlite,
+            'postgresql': postgresql,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_post_modified_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='published_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='published_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.RunPython(
+            run_for_vendor(SQLITE_FORWARDS, POSTGRES_FORWARDS),
+            run_for_vendor(SQLITE_BACKWARDS, POSTGRES_BACKWARDS),
+        ),
+    ]
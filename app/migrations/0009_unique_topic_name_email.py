@@ -0,0 +1,82 @@
+# Generated by Django 2.2 on 2026-10-18 18:32
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+# Emails are unique regardless of case, on top of the unique=True of the field. Backends
+# without expression indexes rely on a case-insensitive collation instead (MySQL).
+FORWARDS = [
+    "CREATE UNIQUE INDEX user_email_lower_uniq ON app_user (LOWER(email))",
+]
+
+BACKWARDS = [
+    "DROP INDEX IF EXISTS user_email_lower_uniq",
+]
+
+
+def check_duplicates(apps, schema_editor):
+    """
+    Topic names were not unique and emails only case-sensitively: rows that the new
+    indexes reject are reported before creating them, to be renamed or merged by hand.
+    """
+    Topic = apps.get_model('app', 'Topic')
+    User = apps.get_model('app', 'User')
+    using = schema_editor.connection.alias
+    problems = []
+    names = (Topic.objects.using(using).values('name').annotate(rows=Count('pk')).filter(rows__gt=1)
+             .values_list('name', flat=True))
+    for name in names:
+        pks = Topic.objects.using(using).filter(name=name).order_by('pk').values_list('pk', flat=True)
+        problems.append('topics {} are all named {!r}'.format(', '.join(map(str, pks)), name))
+    emails = (User.objects.using(using).annotate(lower_email=Lower('email')).values('lower_email')
+              .annotate(rows=Count('pk')).filter(rows__gt=1).values_list('lower_email', flat=True))
+    for email in emails:
+        pks = User.objects.using(using).filter(email__iexact=email).order_by('pk').values_list('pk', flat=True)
+        problems.append('users {} all have the email {!r} in some case'.format(', '.join(map(str, pks)), email))
+    if problems:
+        raise RuntimeError(
+            'Topic names and emails are unique from now on, rename or merge these rows and migrate again: '
+            '{}.'.format('; '.join(problems))
+        )
+
+
+def run_for_vendor(vendors, statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor in vendors:
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        # A plain unique index: altering the field would make SQLite rebuild app_topic,
+        # which the post counter triggers of 0008 did not survive before the schema
+        # editor of app.db.backends.sqlite3 kept them.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    "CREATE UNIQUE INDEX topic_name_uniq ON app_topic (name)",
+                    "DROP INDEX topic_name_uniq",
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='topic',
+                    name='name',
+                    field=models.CharField(max_length=128, unique=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(
+            run_for_vendor({'sqlite', 'postgresql'}, FORWARDS),
+            run_for_vendor({'sqlite', 'postgresql'}, BACKWARDS),
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 2.2 on 2026-10-18 18:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+COLUMNS = 'post_id, topic_id, user_id, title, content, published'
+
+
+def insert_entry(row, condition):
+    return (
+        "INSERT INTO app_feedentry ({columns}) SELECT {row}.id, {row}.topic_id, {row}.user_id, {row}.title, "
+        "{row}.content, {row}.modified WHERE {condition};".format(columns=COLUMNS, row=row, condition=condition)
+    )
+
+
+# A post enters the feed of its topic when it is published, at its ``modified`` time then,
+# and leaves it when it is unpublished or deleted. Edits of a published post are copied.
+def update_statements(old, new):
+    return [
+        "DELETE FROM app_feedentry WHERE post_id = {old}.id AND {new}.status != 'published';".format(old=old, new=new),
+        "UPDATE app_feedentry SET topic_id = {new}.topic_id, user_id = {new}.user_id, title = {new}.title, "
+        "content = {new}.content WHERE post_id = {new}.id;".format(new=new),
+        insert_entry(new, "{new}.status = 'published' AND {old}.status != 'published'".format(old=old, new=new)),
+    ]
+
+
+# Django saves every column of a post, the update trigger only runs when one of the
+# columns of the feed changed. Like the counter triggers of 0008, these are kept across
+# rebuilds of app_post and app_feedentry by app.db.backends.sqlite3.
+SQLITE_FORWARDS = [
+    "CREATE TRIGGER app_post_feed_insert AFTER INSERT ON app_post WHEN new.status = 'published' BEGIN {} END".format(
+        insert_entry('new', "new.status = 'published'")
+    ),
+    "CREATE TRIGGER app_post_feed_delete AFTER DELETE ON app_post WHEN old.status = 'published' BEGIN "
+    "DELETE FROM app_feedentry WHERE post_id = old.id; END",
+    "CREATE TRIGGER app_post_feed_update AFTER UPDATE OF topic_id, user_id, title, content, status ON app_post "
+    "WHEN old.status IS NOT new.status OR (new.status = 'published' AND (old.topic_id IS NOT new.topic_id OR "
+    "old.user_id IS NOT new.user_id OR old.title IS NOT new.title OR old.content IS NOT new.content)) "
+    "BEGIN {} END".format(' '.join(update_statements('old', 'new'))),
+]
+
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS app_post_feed_update",
+    "DROP TRIGGER IF EXISTS app_post_feed_delete",
+    "DROP TRIGGER IF EXISTS app_post_feed_insert",
+]
+
+POSTGRES_FORWARDS = [
+    "CREATE FUNCTION app_post_feed() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP = 'INSERT' THEN {insert} "
+    "ELSIF TG_OP = 'DELETE' THEN DELETE FROM app_feedentry WHERE post_id = OLD.id; "
+    "ELSIF OLD.status IS DISTINCT FROM NEW.status OR (NEW.status = 'published' AND ("
+    "OLD.topic_id, OLD.user_id, OLD.title, OLD.content) IS DISTINCT FROM (NEW.topic_id, NEW.user_id, NEW.title, "
+    "NEW.content)) THEN {update} "
+    "END IF; "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql".format(
+        insert=insert_entry('NEW', "NEW.status = 'published'"), update=' '.join(update_statements('OLD', 'NEW')),
+    ),
+    "CREATE TRIGGER app_post_feed AFTER INSERT OR DELETE OR UPDATE OF topic_id, user_id, title, content, status "
+    "ON app_post FOR EACH ROW EXECUTE PROCEDURE app_post_feed()",
+]
+
+POSTGRES_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS app_post_feed ON app_post",
+    "DROP FUNCTION IF EXISTS app_post_feed()",
+]
+
+# Feeds of the posts that are already published, on every backend. Their publication
+# time is unknown, their last modification stands in for it.
+BACKFILL = [
+    "INSERT INTO app_feedentry ({}) SELECT id, topic_id, user_id, title, content, modified FROM app_post "
+    "WHERE status = 'published'".format(COLUMNS),
+]
+
+
+def run_for_vendor(sqlite, postgresql):
+    def run(apps, schema_editor):
+        statements = {
+            'sqlite': sqlite,
+            'postgresql': postgresql,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_unique_topic_name_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='app.Post')),
+                ('title', models.CharField(max_length=252)),
+                ('content', models.TextField()),
+                ('published', models.DateTimeField()),
+                ('topic', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app.Topic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Feed entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['topic', 'published', 'post'], name='feed_topic_published_idx'),
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.RunPython(
+            run_for_vendor(SQLITE_FORWARDS, POSTGRES_FORWARDS),
+            run_for_vendor(SQLITE_BACKWARDS, POSTGRES_BACKWARDS),
+        ),
+    ]
@@ -0,0 +1,181 @@
+import hashlib
+from calendar import timegm
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import permissions
+from rest_framework.response import Response
+
+from app import cache, metrics, routers
+from app.profiling import phase
+
+
+class ConditionalGetMixin(object):
+    """
+    Answers conditional ``list`` and ``retrieve`` requests (If-None-Match,
+    If-Modified-Since) with 304 Not Modified before anything is serialized.
+
+    The validators are a dict returned by ``get_list_validators`` and
+    ``get_detail_validators``: the ETag is a hash of all of them, Last-Modified is the
+    latest of the values whose key ends with ``modified``. A list page is validated by
+    its own rows, read once by ReaderListMixin (which must follow this mixin) and
+    serialized only when the client's copy is stale, so the cost does not depend on the
+    size of the table. A detail is validated by cheap aggregates over ``modified``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader, rows = self.read_list()
+        validators = self.get_list_validators(reader, rows)
+
+        def view(request, *args, **kwargs):
+            return self.list_response(reader, rows)
+
+        return self.conditional_response(validators, view, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            validators = self.get_detail_validators(
+                self.filter_queryset(self.get_queryset()), {self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+        except (ValueError, ValidationError):
+            validators = None
+        return self.conditional_response(
+            validators, super(ConditionalGetMixin, self).retrieve, request, *args, **kwargs
+        )
+
+    # Reverse relation embedded in the representation (e.g. the posts of a topic), its
+    # rows are part of the detail validators.
+    embedded_relation = None
+
+    def get_list_validators(self, reader, rows):
+        validators = reader.get_validators(rows)
+        if self.paginator is not None:
+            # The links (and the count of offset pagination) around the results.
+            validators['pagination'] = [
+                (key, value) for key, value in self.get_paginated_response([]).data.items() if key != 'results'
+            ]
+        return validators
+
+    def get_detail_validators(self, queryset, lookup):
+        queryset = queryset.prefetch_related(None).filter(**lookup)
+        if self.embedded_relation:
+            queryset = queryset.annotate(
+                embedded_modified=Max('{}__modified'.format(self.embedded_relation)),
+                embedded_count=Count(self.embedded_relation),
+            )
+            return queryset.values('modified', 'embedded_modified', 'embedded_count').first()
+        return queryset.values('modified').first()
+
+    def conditional_response(self, validators, view, request, *args, **kwargs):
+        # No validators: the object does not exist, the view answers with 404.
+        if validators is None:
+            return view(request, *args, **kwargs)
+
+        # The representation also depends on the URL (hyperlinks, cursor, filters) and
+        # on the negotiated media type.
+        fingerprint = '|'.join([
+            request.build_absolute_uri(),
+            request.accepted_media_type,
+        ] + ['{}={}'.format(key, validators[key]) for key in sorted(validators)])
+        etag = quote_etag(hashlib.md5(fingerprint.encode('utf-8')).hexdigest())
+        modified = [value for key, value in validators.items() if key.endswith('modified') and value is not None]
+        last_modified = timegm(max(modified).utctimetuple()) if modified else None
+
+        # Also part of the key of cached responses, see CachedRetrieveMixin.
+        self.etag = etag
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class CachedRetrieveMixin(object):
+    """
+    Serves ``retrieve`` from the rendered JSON kept in app.cache. Entries are dropped by
+    the signal handlers in app.signals whenever the object, or a post embedded in it,
+    changes.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        # Query parameters may filter the queryset (and 404 the object), and other
+        # renderers are not cached.
+        if request.GET or request.accepted_renderer.format != 'json':
+            return super(CachedRetrieveMixin, self).retrieve(request, *args, **kwargs)
+
+        model = self.get_queryset().model
+        try:
+            pk = model._meta.pk.to_python(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValidationError:
+            return super(CachedRetrieveMixin, self).retrieve(request, *args, **kwargs)
+
+        # With ConditionalGetMixin the key also holds the ETag, so writes that bypass the
+        # signals but touch ``modified`` (queryset updates) still miss the cache.
+        model_name = model._meta.model_name
+        base = '{}|{}|{}'.format(request.build_absolute_uri('/'), self.format_kwarg, getattr(self, 'etag', None))
+        generation = cache.get_generation(model_name, pk)
+        cached = cache.get_response(model_name, pk, generation, base)
+        metrics.CACHE_LOOKUPS.inc((model_name, 'miss' if cached is None else 'hit'))
+        if cached is not None:
+            content_type, content = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super(CachedRetrieveMixin, self).retrieve(request, *args, **kwargs)
+
+        def store(rendered):
+            cache.set_response(model_name, pk, generation, base, rendered['Content-Type'], rendered.content)
+
+        response.add_post_render_callback(store)
+        return response
+
+
+class ReaderListMixin(object):
+    """
+    Serializes ``list`` pages with ``list_reader_class`` (see app.readers), which builds
+    the representation of the serializer from ``values()`` rows.
+    """
+    list_reader_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.list_reader_class is None:
+            return super(ReaderListMixin, self).list(request, *args, **kwargs)
+        return self.list_response(*self.read_list())
+
+    def read_list(self):
+        """
+        Returns the reader and the rows of the requested page, of the whole list when
+        it is not paginated.
+        """
+        reader = self.list_reader_class(self.request, format=self.format_kwarg)
+        queryset = reader.get_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        return reader, (list(queryset) if page is None else page)
+
+    def list_response(self, reader, rows):
+        with phase('serialize'):
+            data = reader.to_representation(rows)
+        if self.paginator is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class ReplicaReadMixin(object):
+    """
+    Reads ``replica_actions`` from a replica (see app.routers) when everybody may perform
+    them. Cached responses stay consistent: their key holds the ETag, built from the
+    ``modified`` values read from the same replica.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super(ReplicaReadMixin, self).initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and all(
+                isinstance(permission, permissions.AllowAny) for permission in self.get_permissions()):
+            routers.use_replica()
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractUser
 
 POST_STATUS_CHOICES = [
@@ -7,7 +8,29 @@ POST_STATUS_CHOICES = [
 ]
 
 
-class User(AbstractUser):
+class PostCounters(models.Model):
+    """
+    Number of posts and published posts, kept up to date by database triggers on app_post
+    (migration 0008) in the statement that writes the post. The reconcile_post_counts
+    command recomputes them on backends without the triggers.
+    """
+    COUNTER_FIELDS = ('post_count', 'published_count')
+
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    published_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Saving a loaded instance must not write back counters that changed since it was
+        # loaded: the UPDATE of save() leaves them out. Everything else is Model.save's,
+        # deferred fields and the INSERT of a row that is gone included.
+        values = [value for value in values if value[0].name not in self.COUNTER_FIELDS]
+        return super(PostCounters, self)._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+
+class User(PostCounters, AbstractUser):
     first_name = models.CharField(max_length=128)
     last_name = models.CharField(max_length=252)
     email = models.EmailField(unique=True)
@@ -16,13 +39,18 @@ class User(AbstractUser):
 
     class Meta:
         verbose_name_plural = 'Users'
+        indexes = [
+            # Backs the cursor pagination of the user list.
+            models.Index(fields=['created', 'id'], name='user_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.first_name + '' + self.last_name
 
 
-class Topic(models.Model):
-    name = models.CharField(max_length=128)
+class Topic(PostCounters):
+    name = models.CharField(max_length=128, unique=True)
+    modified = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = 'Topics'
@@ -42,6 +70,62 @@ class Post(models.Model):
 
     class Meta:
         verbose_name_plural = 'Posts'
+        indexes = [
+            # Backs the cursor pagination of the post list.
+            models.Index(fields=['created', 'id'], name='post_created_id_idx'),
+            # Post list filtered by ?status=, ?topic= or ?user= (the posts_url of topics
+            # and users), in cursor order.
+            models.Index(fields=['status', 'created', 'id'], name='post_status_created_idx'),
+            models.Index(fields=['topic', 'created', 'id'], name='post_topic_created_idx'),
+            models.Index(fields=['user', 'created', 'id'], name='post_user_created_idx'),
+            # Incremental exports read the posts modified in a time range.
+            models.Index(fields=['modified', 'id'], name='post_modified_id_idx'),
+            # Public listings only ever read published posts, drafts stay out of the index
+            # on backends that support partial indexes.
+            models.Index(
+                fields=['created', 'id'], name='post_published_created_idx', condition=Q(status='published')
+            ),
+        ]
+
+    # Values as last loaded from or saved to the db, so signal handlers can tell what a save changed.
+    TRACKED_FIELDS = ('topic_id', 'user_id', 'status')
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Post, cls).from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def get_loaded_value(self, name):
+        return getattr(self, '_loaded_values', {}).get(name)
+
+    def remember_loaded_values(self):
+        self._loaded_values = {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+
+class FeedEntry(models.Model):
+    """
+    A published post in the feed of its topic, with the fields of its representation, so
+    that a feed page is one range scan of feed_topic_published_idx however many posts
+    there are. The rows are written by database triggers on app_post (migration 0010) in
+    the statement that publishes, edits, unpublishes or deletes the post, bulk and
+    queryset writes included. ``published`` is the time the post was published.
+    """
+    post = models.OneToOneField(Post, on_delete=models.DO_NOTHING, primary_key=True, related_name='+')
+    topic = models.ForeignKey(Topic, on_delete=models.DO_NOTHING, related_name='+', db_index=False)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='+')
+    title = models.CharField(max_length=252)
+    content = models.TextField()
+    published = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = 'Feed entries'
+        indexes = [
+            # Backs the cursor pagination of the topic feeds, newest first.
+            models.Index(fields=['topic', 'published', 'post'], name='feed_topic_published_idx'),
+        ]
@@ -0,0 +1,67 @@
+from rest_framework import serializers
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+# Number of posts embedded in a user or topic representation. The rest can be
+# fetched from the paginated post list linked by ``posts_url``.
+NESTED_POSTS_LIMIT = 10
+
+
+class BlogCursorPagination(CursorPagination):
+    """
+    Keyset pagination: every page is a single indexed range scan, so deep pages cost
+    the same as the first one. The ordering must be backed by an index.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class PostCursorPagination(BlogCursorPagination):
+    ordering = ('created', 'pk')
+
+
+class UserCursorPagination(BlogCursorPagination):
+    ordering = ('created', 'pk')
+
+
+class TopicCursorPagination(BlogCursorPagination):
+    ordering = ('pk', )
+
+
+class FeedCursorPagination(BlogCursorPagination):
+    # Newest first, backed by feed_topic_published_idx.
+    ordering = ('-published', '-pk')
+
+
+class SearchResultsPagination(LimitOffsetPagination):
+    """
+    Search results are ordered by relevance, which is not an indexed column, so they are
+    paginated by offset into the ranked matches instead of by cursor.
+    """
+    default_limit = 50
+    max_limit = 500
+
+
+def first_nested_posts(posts, *fields):
+    """
+    The first NESTED_POSTS_LIMIT of the ``posts`` of a topic or user, by creation. Posts
+    prefetched (in that order) are sliced in memory, otherwise they are read with one
+    LIMIT query, of ``fields`` only when given, instead of loading all of them.
+    """
+    posts = posts.all()
+    if posts._result_cache is None:
+        posts = posts.order_by('created', 'pk')
+        if fields:
+            posts = posts.only(*fields)
+    return posts[:NESTED_POSTS_LIMIT]
+
+
+class NestedPostsListSerializer(serializers.ListSerializer):
+    """
+    Caps nested posts to NESTED_POSTS_LIMIT, see first_nested_posts.
+    """
+
+    def to_representation(self, data):
+        if hasattr(data, 'all'):
+            data = first_nested_posts(data, *getattr(self.child.Meta, 'nested_only', ()))
+        return super(NestedPostsListSerializer, self).to_representation(data)
@@ -0,0 +1,149 @@
+"""
+Opt-in per request profiling.
+
+ProfilingMiddleware profiles the requests that send the PROFILING_HEADER header, and a
+PROFILING_SAMPLE_RATE fraction of all requests. The header is only honoured from staff
+users logged in with a session, or when its value is the PROFILING_SECRET shared secret:
+profiles expose the SQL of the request. A profiled request reports the time
+spent in each phase in a ``Server-Timing`` header and logs it, with its queries, as one
+JSON line on the ``app.profiling`` logger.
+
+Phases are timed by ``phase(name)`` blocks placed in the code: every query (sql),
+serializer ``data`` and list readers (serialize), URL templates missing from the cache
+of app.hyperlinks (reverse) and the JSON renderer (render). A phase nested in another
+one is subtracted from it, so the durations do not overlap. The blocks wrap whole steps
+rather than objects, and outside of profiled requests they only look up a thread local.
+"""
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('app.profiling')
+
+PHASES = ('sql', 'serialize', 'reverse', 'render')
+
+_local = threading.local()
+
+
+class Profile(object):
+    def __init__(self):
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = []
+        # [name, start, time spent in nested phases] of the phases being timed.
+        self.stack = []
+
+    def enter(self, name):
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.durations[name] = self.durations.get(name, 0.0) + elapsed - nested
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        return elapsed
+
+
+class phase(object):
+    """
+    Times the block (or the decorated function) as ``name`` in the profile of the
+    current request, if it is profiled.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.profile = getattr(_local, 'profile', None)
+        if self.profile is not None:
+            self.profile.enter(self.name)
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.exit()
+
+    def __call__(self, function):
+        name = self.name
+
+        def wrapper(*args, **kwargs):
+            profile = getattr(_local, 'profile', None)
+            if profile is None:
+                return function(*args, **kwargs)
+            profile.enter(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile.exit()
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        wrapper.__wrapped__ = function
+        return wrapper
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _local.profile
+    profile.enter('sql')
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries.append({'sql': sql, 'ms': round(profile.exit() * 1000, 3)})
+
+
+class ProfilingMiddleware(object):
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        header = getattr(settings, 'PROFILING_HEADER', None)
+        self.header = 'HTTP_{}'.format(header.upper().replace('-', '_')) if header else None
+        self.secret = getattr(settings, 'PROFILING_SECRET', None)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+
+    def is_profiled(self, request):
+        value = request.META.get(self.header) if self.header is not None else None
+        if value and self.is_allowed(request, value):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def is_allowed(self, request, value):
+        if self.secret and hmac.compare_digest(value.encode('utf-8'), self.secret.encode('utf-8')):
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_active and user.is_staff
+
+    def __call__(self, request):
+        if not self.is_profiled(request):
+            return self.get_response(request)
+
+        profile = _local.profile = Profile()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        total = time.perf_counter() - start
+
+        durations = dict(profile.durations, total=total)
+        response['Server-Timing'] = ', '.join(
+            '{};dur={:.3f}{}'.format(name, durations[name] * 1000, ';desc="{} queries"'.format(
+                len(profile.queries)) if name == 'sql' else '')
+            for name in PHASES + ('total',)
+        )
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'ms': {name: round(value * 1000, 3) for name, value in durations.items()},
+            'queries': profile.queries,
+        }))
+        return response
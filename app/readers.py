@@ -0,0 +1,195 @@
+"""
+Fast read path of the list endpoints.
+
+Readers build exactly the representation of PostSerializer, TopicSerializer and
+UserSerializer (the tests compare the rendered bytes), but from ``values()`` rows and
+with hyperlinks formatted into URL templates that are reversed once per request,
+instead of running the DRF fields and ``reverse()`` for every object.
+"""
+from collections import OrderedDict, defaultdict
+
+from django.db.models import Expression
+
+from app.hyperlinks import detail_url_template, list_url
+from app.models import Post
+from app.pagination import NESTED_POSTS_LIMIT
+
+
+class ListReader(object):
+    """
+    Base class of the readers: ``get_queryset`` narrows the queryset of a viewset to the
+    ``values()`` of ``fields``, and subclasses implement ``to_representation``, taking a
+    page of those rows and returning the list of representations.
+    """
+    fields = ()
+    # Fields of the rows that change whenever their representation does: the counters
+    # are written by triggers, without touching ``modified``.
+    version_fields = ('pk', 'modified')
+
+    def __init__(self, request, format=None):
+        self.request = request
+        self.format = format
+
+    def url_template(self, view_name):
+        return detail_url_template(view_name, self.request, self.format)
+
+    def get_queryset(self, queryset):
+        return queryset.prefetch_related(None).values(*self.fields)
+
+    def get_validators(self, rows):
+        """
+        Conditional GET validators of a page of rows (see app.mixins.ConditionalGetMixin).
+        """
+        return {
+            'modified': max((row['modified'] for row in rows), default=None),
+            'rows': [tuple(row[name] for name in self.version_fields) for row in rows],
+        }
+
+
+class PostListReader(ListReader):
+    """
+    Same representation as PostSerializer.
+    """
+    fields = ('pk', 'topic_id', 'user_id', 'title', 'content', 'status', 'created', 'modified')
+
+    def to_representation(self, rows):
+        post_prefix, post_suffix = self.url_template('post-detail')
+        topic_prefix, topic_suffix = self.url_template('topic-detail')
+        user_prefix, user_suffix = self.url_template('user-detail')
+        return [OrderedDict((
+            ('url', '{}{}{}'.format(post_prefix, row['pk'], post_suffix)),
+            ('topic', '{}{}{}'.format(topic_prefix, row['topic_id'], topic_suffix)),
+            ('user', '{}{}{}'.format(user_prefix, row['user_id'], user_suffix)),
+            ('title', row['title']),
+            ('content', row['content']),
+            ('status', row['status']),
+        )) for row in rows]
+
+
+class FeedReader(PostListReader):
+    """
+    Same representation as PostSerializer, from app.models.FeedEntry rows.
+    """
+    fields = ('pk', 'topic_id', 'user_id', 'title', 'content', 'published')
+
+    def to_representation(self, rows):
+        return super(FeedReader, self).to_representation(dict(row, status='published') for row in rows)
+
+
+class UnionAll(Expression):
+    """
+    ``UNION ALL`` of querysets, as the right-hand side of an ``__in`` lookup. Every
+    queryset is wrapped in a subselect, so that each keeps its ORDER BY and LIMIT.
+    """
+
+    def __init__(self, querysets):
+        super(UnionAll, self).__init__()
+        self.querysets = querysets
+
+    def as_sql(self, compiler, connection):
+        sqls, params = [], []
+        for index, queryset in enumerate(self.querysets):
+            sql, queryset_params = queryset.query.get_compiler(connection=connection).as_sql()
+            sqls.append('SELECT * FROM ({}) AS {}'.format(sql, connection.ops.quote_name('nested{}'.format(index))))
+            params.extend(queryset_params)
+        return ' UNION ALL '.join(sqls), params
+
+
+def nested_posts(lookup, pks, fields):
+    """
+    Reads the first NESTED_POSTS_LIMIT posts of every parent in ``pks`` with one query,
+    in the order of app.pagination.first_nested_posts. Each parent reads its posts with
+    a LIMIT query of its own (a range of post_topic_created_idx or post_user_created_idx),
+    so a page costs the same however many posts its parents have.
+    """
+    posts = defaultdict(list)
+    if pks:
+        first = [
+            Post.objects.filter(**{lookup: pk}).order_by('created', 'pk').values('pk')[:NESTED_POSTS_LIMIT]
+            for pk in pks
+        ]
+        rows = Post.objects.filter(pk__in=UnionAll(first)).order_by(lookup, 'created', 'pk').values(lookup, *fields)
+        for row in rows:
+            posts[row[lookup]].append(row)
+    return posts
+
+
+class NestedPostsReader(ListReader):
+    """
+    Base class of the readers of topics and users, which embed their first posts.
+    """
+    version_fields = ('pk', 'modified', 'post_count', 'published_count')
+    posts_lookup = None
+    posts_fields = ()
+
+    def get_posts(self, rows):
+        """
+        The nested posts of the rows by parent pk, read once for the validators and the
+        representation of a page.
+        """
+        pks = [row['pk'] for row in rows]
+        if getattr(self, '_posts_of', None) != pks:
+            self._posts_of, self._posts = pks, nested_posts(self.posts_lookup, pks, self.posts_fields)
+        return self._posts
+
+    def get_validators(self, rows):
+        validators = super(NestedPostsReader, self).get_validators(rows)
+        posts = [post for siblings in self.get_posts(rows).values() for post in siblings]
+        validators['embedded_modified'] = max((post['modified'] for post in posts), default=None)
+        validators['embedded_rows'] = [(post['pk'], post['modified']) for post in posts]
+        return validators
+
+
+class TopicListReader(NestedPostsReader):
+    """
+    Same representation as TopicSerializer.
+    """
+    fields = ('pk', 'name', 'post_count', 'published_count', 'modified')
+    posts_lookup = 'topic_id'
+    posts_fields = PostListReader.fields
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        topic_prefix, topic_suffix = self.url_template('topic-detail')
+        posts_url = list_url('post-list', self.request)
+        posts = self.get_posts(rows)
+        # TopicSerializer hands only the request to the nested PostSerializer, so the
+        # nested hyperlinks have no format suffix.
+        post_reader = PostListReader(self.request)
+        return [OrderedDict((
+            ('url', '{}{}{}'.format(topic_prefix, row['pk'], topic_suffix)),
+            ('name', row['name']),
+            ('post_count', row['post_count']),
+            ('published_count', row['published_count']),
+            ('posts', post_reader.to_representation(posts[row['pk']])),
+            ('posts_url', '{}?topic={}'.format(posts_url, row['pk'])),
+        )) for row in rows]
+
+
+class UserListReader(NestedPostsReader):
+    """
+    Same representation as UserSerializer.
+    """
+    fields = ('pk', 'first_name', 'last_name', 'email', 'post_count', 'published_count', 'created', 'modified')
+    posts_lookup = 'user_id'
+    posts_fields = ('pk', 'title', 'topic_id', 'modified')
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        user_prefix, user_suffix = self.url_template('user-detail')
+        topic_prefix, topic_suffix = self.url_template('topic-detail')
+        posts_url = list_url('post-list', self.request)
+        posts = self.get_posts(rows)
+        return [OrderedDict((
+            ('url', '{}{}{}'.format(user_prefix, row['pk'], user_suffix)),
+            ('first_name', row['first_name']),
+            ('last_name', row['last_name']),
+            ('email', row['email']),
+            ('post_count', row['post_count']),
+            ('published_count', row['published_count']),
+            ('posts', [OrderedDict((
+                ('title', post['title']),
+                ('topic', '{}{}{}'.format(topic_prefix, post['topic_id'], topic_suffix)),
+            )) for post in posts[row['pk']]]),
+            ('posts_url', '{}?user={}'.format(posts_url, row['pk'])),
+        )) for row in rows]
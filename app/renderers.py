@@ -0,0 +1,35 @@
+"""
+JSON rendering with orjson when it is installed.
+
+orjson encodes straight to UTF-8 bytes, without the intermediate str of ``json.dumps``.
+The output is the same as DRF's JSONRenderer: values orjson does not handle the same way
+(dates and times, decimals, ...) go through DRF's JSONEncoder, and anything orjson cannot
+encode at all, or an indented rendering, falls back to DRF's renderer.
+"""
+from rest_framework import renderers
+
+from app.profiling import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class JSONRenderer(renderers.JSONRenderer):
+
+    @phase('render')
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super(JSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super(JSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+        # Escaped like DRF does, so the output is also valid JavaScript.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
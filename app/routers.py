@@ -0,0 +1,110 @@
+"""
+Read replica routing.
+
+Reads go to the primary (``default``) unless the view handling the request sends them to
+a replica with ``use_replica()``, as ReplicaReadMixin does for the list and retrieve
+actions open to everybody. The replica is picked once per request among the aliases of
+DATABASE_REPLICAS, at random by weight, skipping the ones that failed to connect in the
+last REPLICA_RETRY_SECONDS seconds; with none left the primary is read.
+
+Reads that follow a write see it: a write sends the rest of the request to the primary,
+and ReplicaRoutingMiddleware then sets the REPLICA_PIN_COOKIE cookie, which keeps the
+requests of that client on the primary for REPLICA_PIN_SECONDS seconds, i.e. for longer
+than the replication lag. Writes always go to the primary.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_local = threading.local()
+
+# Alias of a replica that failed to connect -> time.monotonic() until which it is skipped.
+_down = {}
+
+
+class RequestRouting(object):
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', {})
+
+
+def choose_replica():
+    now = time.monotonic()
+    weights = {alias: weight for alias, weight in get_replicas().items() if weight > 0 and _down.get(alias, 0) <= now}
+    while weights:
+        alias = random.choices(list(weights), list(weights.values()))[0]
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            _down[alias] = now + settings.REPLICA_RETRY_SECONDS
+            del weights[alias]
+        else:
+            return alias
+    return None
+
+
+def use_replica():
+    """
+    Sends the reads of the rest of the current request to a replica, unless the request
+    is pinned to the primary. Returns the replica alias, or None for the primary.
+    Outside of requests (management commands, the shell) everything stays on the primary.
+    """
+    routing = getattr(_local, 'routing', None)
+    if routing is None or routing.pinned:
+        return None
+    if routing.replica is None:
+        routing.replica = choose_replica()
+    return routing.replica
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        routing = getattr(_local, 'routing', None)
+        if routing is not None and not routing.pinned and routing.replica is not None:
+            return routing.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        routing = getattr(_local, 'routing', None)
+        if routing is not None:
+            routing.pinned = routing.wrote = True
+        # Explicitly, objects read from a replica would be saved to it otherwise.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS} | set(get_replicas())
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware(object):
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie = settings.REPLICA_PIN_COOKIE
+        routing = _local.routing = RequestRouting(pinned=cookie in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.routing = None
+        if routing.wrote:
+            response.set_cookie(cookie, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True)
+        return response
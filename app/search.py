@@ -0,0 +1,51 @@
+"""
+Full-text search over posts.
+
+SQLite uses the FTS5 table ``app_post_fts`` (external content on ``app_post``, kept in
+sync by triggers) and Postgres a GIN index on POSTGRES_DOCUMENT, both created by
+migration 0004. Results are ranked by relevance, best match first.
+"""
+from django.db import connections
+from django.db.models import Q
+
+# Must match the expression of the GIN index created by migration 0004 (column names are
+# qualified here because the query may join other tables), otherwise Postgres can not use
+# the index.
+POSTGRES_DOCUMENT = "to_tsvector('english', coalesce(app_post.title, '') || ' ' || coalesce(app_post.content, ''))"
+
+
+def fts5_query(query):
+    """
+    Turns user input into an FTS5 query: every word is matched as a quoted prefix, so
+    search operators and punctuation can never make the query invalid.
+    """
+    terms = ['"{}"*'.format(term.replace('"', '""')) for term in query.split()]
+    return ' '.join(terms)
+
+
+def search_posts(queryset, query):
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return queryset.none()
+        return queryset.extra(
+            select={'search_rank': 'app_post_fts.rank'},
+            tables=['app_post_fts'],
+            where=['app_post_fts.rowid = app_post.id', 'app_post_fts MATCH %s'],
+            params=[match],
+            order_by=['search_rank', 'id'],
+        )
+
+    if vendor == 'postgresql':
+        return queryset.extra(
+            select={'search_rank': "ts_rank({}, plainto_tsquery('english', %s))".format(POSTGRES_DOCUMENT)},
+            select_params=[query],
+            where=["{} @@ plainto_tsquery('english', %s)".format(POSTGRES_DOCUMENT)],
+            params=[query],
+            order_by=['-search_rank', 'id'],
+        )
+
+    # No full-text index on other backends.
+    return queryset.filter(Q(title__icontains=query) | Q(content__icontains=query))
@@ -1,51 +1,121 @@
+from contextlib import contextmanager
+
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from rest_framework.fields import SerializerMethodField
 
+from app import hyperlinks
+from app.hashers import make_password
 from app.models import User, Post, Topic
+from app.pagination import NestedPostsListSerializer, first_nested_posts
+from app.profiling import phase
+
+
+class PkOnlyHyperlinkedRelatedField(hyperlinks.HyperlinkedRelatedField):
+    """
+    Resolves a hyperlink to an unsaved instance that only carries the pk, without a query.
+    Whoever uses it checks that the objects exist, in one query for a whole batch.
+    """
+
+    def get_object(self, view_name, view_args, view_kwargs):
+        model = self.get_queryset().model
+        try:
+            pk = model._meta.pk.to_python(view_kwargs[self.lookup_url_kwarg])
+        except DjangoValidationError:
+            raise ObjectDoesNotExist
+        return model(pk=pk)
+
+
+class ProfiledRepresentationMixin(object):
+    """
+    Times ``data`` as the serialize phase of profiled requests (see app.profiling). List
+    pages are timed by ReaderListMixin.
+    """
+
+    @property
+    def data(self):
+        with phase('serialize'):
+            return super(ProfiledRepresentationMixin, self).data
+
+
+@contextmanager
+def raise_unique_errors(serializer, validated_data):
+    """
+    Uniqueness is left to the unique constraints of the database instead of being checked
+    before every write. When a write violates one, ``serializer.unique_error`` queries
+    which value is taken and returns the validation error to raise instead.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError:
+        error = serializer.unique_error(validated_data)
+        if error is None:
+            raise
+        raise error
 
 
 class UserPostSerializer(serializers.ModelSerializer):
-    topic = serializers.HyperlinkedIdentityField(view_name='topic-detail')
+    topic = hyperlinks.HyperlinkedRelatedField(view_name='topic-detail', read_only=True)
 
     class Meta:
         model = Post
         fields = ('title', 'topic', )
+        list_serializer_class = NestedPostsListSerializer
+        # Columns read by NestedPostsListSerializer when the posts are not prefetched.
+        nested_only = ('pk', 'title', 'user_id', 'topic_id')
 
 
-class UserSerializer(serializers.HyperlinkedModelSerializer):
-    url = serializers.HyperlinkedIdentityField(view_name="user-detail")
+class UserSerializer(ProfiledRepresentationMixin, serializers.HyperlinkedModelSerializer):
+    url = hyperlinks.HyperlinkedIdentityField(view_name="user-detail")
     password = serializers.CharField(write_only=True)
     email = serializers.EmailField()
-    posts = SerializerMethodField()
+    posts = UserPostSerializer(many=True, read_only=True)
+    posts_url = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ('url', 'first_name', 'last_name', 'email', 'password', 'posts',)
+        fields = ('url', 'first_name', 'last_name', 'email', 'password', 'post_count', 'published_count', 'posts',
+                  'posts_url',)
 
     def __init__(self, *args, **kwargs):
         super(UserSerializer, self).__init__(*args, **kwargs)
         self.request = self.context.get('request', None)
 
-    def get_posts(self, obj):
-        posts = obj.posts.all()
-        return UserPostSerializer(posts, many=True, context={'request': self.request}).data
-
-    def validate_email(self, email):
-        user = User.objects.filter(email=email).exists()
-        if user:
-            raise serializers.ValidationError("User with email {} already exists.".format(email))
-        return email
+    def get_posts_url(self, obj):
+        return '{}?user={}'.format(hyperlinks.list_url('post-list', self.request), obj.pk)
+
+    def unique_error(self, validated_data):
+        email = validated_data.get('email')
+        if email is None:
+            return None
+        others = User.objects.exclude(pk=getattr(self.instance, 'pk', None))
+        if others.filter(email__iexact=email).exists():
+            return serializers.ValidationError({'email': ["User with email {} already exists.".format(email)]})
+        # The username is derived from the email, which is the only field to blame.
+        username = validated_data.get('username')
+        if username is not None and others.filter(username=username).exists():
+            return serializers.ValidationError({'email': ["User with username {} already exists.".format(username)]})
 
     def create(self, validated_data):
-        user = super(UserSerializer, self).create(validated_data)
-        user.set_password(validated_data['password'])
-        user.is_active = True
-        user.save()
-        return user
+        # Hashed before the INSERT, so the user is written once.
+        validated_data['password'] = make_password(validated_data['password'])
+        validated_data['is_active'] = True
+        # The API has no usernames, but the column is unique: every user would get ''.
+        validated_data.setdefault('username', validated_data['email'][:User._meta.get_field('username').max_length])
+        with raise_unique_errors(self, validated_data):
+            return super(UserSerializer, self).create(validated_data)
+
+    def update(self, instance, validated_data):
+        if 'password' in validated_data:
+            validated_data['password'] = make_password(validated_data['password'])
+        with raise_unique_errors(self, validated_data):
+            return super(UserSerializer, self).update(instance, validated_data)
 
 
-class PostSerializer(serializers.HyperlinkedModelSerializer):
-    url = serializers.HyperlinkedIdentityField(view_name="post-detail")
+class PostSerializer(ProfiledRepresentationMixin, serializers.HyperlinkedModelSerializer):
+    serializer_related_field = hyperlinks.HyperlinkedRelatedField
+    url = hyperlinks.HyperlinkedIdentityField(view_name="post-detail")
 
     class Meta:
         model = Post
@@ -66,25 +136,62 @@ class PostSerializer(serializers.HyperlinkedModelSerializer):
         return post
 
 
-class TopicSerializer(serializers.HyperlinkedModelSerializer):
-    url = serializers.HyperlinkedIdentityField(view_name="topic-detail")
+class BulkPostSerializer(PostSerializer):
+    """
+    Validates the items of the bulk post endpoints.
+    """
+    topic = PkOnlyHyperlinkedRelatedField(view_name='topic-detail', queryset=Topic.objects.all())
+
+
+class BulkPostUpdateSerializer(BulkPostSerializer):
+    url = PkOnlyHyperlinkedRelatedField(view_name='post-detail', queryset=Post.objects.all())
+
+
+class PublishFilterSerializer(serializers.Serializer):
+    """
+    Selects the posts published by the publish-filtered endpoint.
+    """
+    topic = PkOnlyHyperlinkedRelatedField(view_name='topic-detail', queryset=Topic.objects.all(), required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('Filter the posts by topic, created_after or created_before.')
+        return attrs
+
+
+class TopicSerializer(ProfiledRepresentationMixin, serializers.HyperlinkedModelSerializer):
+    url = hyperlinks.HyperlinkedIdentityField(view_name="topic-detail")
     name = serializers.CharField(max_length=128)
     posts = serializers.SerializerMethodField()
+    posts_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Topic
-        fields = ('url', 'name', 'posts')
+        fields = ('url', 'name', 'post_count', 'published_count', 'posts', 'posts_url')
 
     def __init__(self, *args, **kwargs):
         super(TopicSerializer, self).__init__(*args, **kwargs)
         self.request = self.context.get('request', None)
 
-    def validate_name(self, name):
-        topic = Topic.objects.filter(name=name).exists()
-        if topic:
-            raise serializers.ValidationError("Topic with name {} already exists.".format(name))
-        return name
+    def unique_error(self, validated_data):
+        name = validated_data.get('name')
+        if name is not None and Topic.objects.filter(name=name).exclude(pk=getattr(self.instance, 'pk', None)).exists():
+            return serializers.ValidationError({'name': ["Topic with name {} already exists.".format(name)]})
+
+    def create(self, validated_data):
+        with raise_unique_errors(self, validated_data):
+            return super(TopicSerializer, self).create(validated_data)
+
+    def update(self, instance, validated_data):
+        with raise_unique_errors(self, validated_data):
+            return super(TopicSerializer, self).update(instance, validated_data)
 
     def get_posts(self, obj):
-        posts = obj.posts.all()
+        # One LIMIT query, hyperlinks are built from the fk ids.
+        posts = first_nested_posts(obj.posts)
         return PostSerializer(posts, many=True, context={'request': self.request}).data
+
+    def get_posts_url(self, obj):
+        return '{}?topic={}'.format(hyperlinks.list_url('post-list', self.request), obj.pk)
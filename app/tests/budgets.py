@@ -0,0 +1,131 @@
+"""
+Query count and wall time budgets of API requests.
+
+BUDGETS declares, for every viewset action, the most queries and milliseconds a request
+may take. The numbers must not depend on the amount of data: tests decorated with
+``at_dataset_sizes`` run once per dataset size, so a query per object fails at the
+larger one. Wall times vary with the machine, so the time budgets are only checked when
+REQUEST_BUDGET_TIMING is set; REQUEST_BUDGET_TIME_FACTOR scales them on slow machines.
+"""
+import functools
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test.utils import CaptureQueriesContext
+
+from app.models import Post, Topic, User
+
+Budget = namedtuple('Budget', 'queries milliseconds')
+
+# Counted in the test transaction: writes in a transaction.atomic() block also run a
+# SAVEPOINT and a RELEASE SAVEPOINT.
+BUDGETS = {
+    ('post', 'list'): Budget(queries=1, milliseconds=250),
+    ('post', 'retrieve'): Budget(queries=2, milliseconds=100),
+    ('post', 'create'): Budget(queries=2, milliseconds=100),
+    ('post', 'publish'): Budget(queries=1, milliseconds=100),
+    ('topic', 'list'): Budget(queries=2, milliseconds=500),
+    ('topic', 'retrieve'): Budget(queries=3, milliseconds=100),
+    ('topic', 'create'): Budget(queries=4, milliseconds=100),
+    ('topic', 'feed'): Budget(queries=1, milliseconds=100),
+    ('user', 'list'): Budget(queries=2, milliseconds=250),
+    ('user', 'retrieve'): Budget(queries=3, milliseconds=100),
+    ('user', 'create'): Budget(queries=4, milliseconds=500),
+}
+
+
+def timing_enabled():
+    return os.environ.get('REQUEST_BUDGET_TIMING', '') not in ('', '0')
+
+
+def time_factor():
+    return float(os.environ.get('REQUEST_BUDGET_TIME_FACTOR', 1))
+
+
+class Recording(object):
+    def __init__(self):
+        self.queries = []
+        self.milliseconds = None
+
+
+@contextmanager
+def record(using=DEFAULT_DB_ALIAS):
+    """
+    Records the queries and the wall time of the block.
+    """
+    recording = Recording()
+    context = CaptureQueriesContext(connections[using])
+    start = time.perf_counter()
+    with context:
+        yield recording
+    recording.milliseconds = (time.perf_counter() - start) * 1000
+    recording.queries = context.captured_queries
+
+
+def seed_dataset(size):
+    """
+    ``size`` users and topics, ten posts each, a third of them published.
+    """
+    User.objects.bulk_create(
+        User(username='budget{}'.format(i), email='budget{}@test.com'.format(i)) for i in range(size)
+    )
+    Topic.objects.bulk_create(Topic(name='Budget topic {}'.format(i)) for i in range(size))
+    users = list(User.objects.filter(username__startswith='budget'))
+    topics = list(Topic.objects.filter(name__startswith='Budget topic'))
+    Post.objects.bulk_create(
+        Post(user=users[i % size], topic=topics[i // 10 % size], title='Post {}'.format(i), content='Content',
+             status='published' if i % 3 == 0 else 'draft')
+        for i in range(size * 10)
+    )
+    return {'users': users, 'topics': topics, 'posts': list(Post.objects.filter(title__startswith='Post '))}
+
+
+def at_dataset_sizes(*sizes):
+    """
+    Runs the test once per dataset size, as subtests, with ``self.dataset`` seeded by
+    ``seed_dataset`` and rolled back afterwards.
+    """
+    def decorator(test):
+        @functools.wraps(test)
+        def wrapper(self):
+            for size in sizes:
+                with self.subTest(dataset_size=size):
+                    savepoint = transaction.savepoint()
+                    try:
+                        self.dataset = seed_dataset(size)
+                        cache.clear()
+                        test(self)
+                    finally:
+                        transaction.savepoint_rollback(savepoint)
+        return wrapper
+    return decorator
+
+
+class BudgetAssertionsMixin(object):
+    """
+    For APITestCase: ``request_within_budget`` sends a request with ``self.client`` and
+    fails when it exceeds the budget of its action.
+    """
+
+    def request_within_budget(self, basename, action, method, path, *args, **kwargs):
+        budget = BUDGETS[(basename, action)]
+        with record() as recording:
+            response = getattr(self.client, method)(path, *args, **kwargs)
+        self.assertWithinBudget(budget, recording, '{} {}'.format(basename, action))
+        return response
+
+    def assertWithinBudget(self, budget, recording, name):
+        if len(recording.queries) > budget.queries:
+            self.fail('{} ran {} queries, the budget is {}:\n{}'.format(
+                name, len(recording.queries), budget.queries,
+                '\n'.join('{}. {}'.format(i, query['sql']) for i, query in enumerate(recording.queries, start=1)),
+            ))
+        if not timing_enabled():
+            return
+        milliseconds = budget.milliseconds * time_factor()
+        if recording.milliseconds > milliseconds:
+            self.fail('{} took {:.0f} ms, the budget is {:.0f} ms'.format(name, recording.milliseconds, milliseconds))
@@ -0,0 +1,124 @@
+import asyncio
+import base64
+import json
+import threading
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+
+from app.asgi import ASGIHandler
+from app.models import User, Post, Topic
+
+
+class TestASGIHandler(APITransactionTestCase):
+    """
+    Requests are handled in worker threads with connections of their own, so the data
+    is committed rather than kept in a test transaction.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='user', email='test@test.com')
+        self.user.set_password('secret')
+        self.user.save()
+        self.topic = Topic.objects.create(name='Dragons')
+        self.post = Post.objects.create(title='Drogon', user=self.user, topic=self.topic, status='published')
+        self.application = ASGIHandler(read_threads=2, write_threads=1)
+        self.addCleanup(self.application.shutdown)
+
+    def request(self, method, path, body=b'', headers=(), query_string=b''):
+        """
+        Sends the request in chunks of 5 bytes and returns the response messages and the
+        names of the threads that sent them.
+        """
+        received = [{'type': 'http.request', 'body': body[i:i + 5], 'more_body': i + 5 < len(body)}
+                    for i in range(0, len(body), 5)] or [{'type': 'http.request', 'body': b''}]
+        messages = []
+        threads = set()
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            messages.append(message)
+
+        def spy(function):
+            def wrapper(*args):
+                threads.add(threading.current_thread().name)
+                return function(*args)
+            return wrapper
+
+        self.application.wsgi = spy(self.application.wsgi)
+        scope = {
+            'type': 'http', 'method': method, 'path': path, 'query_string': query_string,
+            'headers': [(b'host', b'testserver')] + list(headers), 'server': ('testserver', 80),
+        }
+        asyncio.run(self.application(scope, receive, send))
+        return messages, threads
+
+    @staticmethod
+    def body(messages):
+        return b''.join(message['body'] for message in messages if message['type'] == 'http.response.body')
+
+    def test_reads_are_handled_in_the_read_pool(self):
+        messages, threads = self.request('GET', '/api/posts/{}/'.format(self.post.pk))
+        self.assertEqual(status.HTTP_200_OK, messages[0]['status'])
+        self.assertEqual([name for name in threads if not name.startswith('asgi-read')], [])
+        self.assertEqual(self.client.get('/api/posts/{}/'.format(self.post.pk)).content, self.body(messages))
+        self.assertFalse(messages[-1]['more_body'])
+
+    def test_query_string_and_headers_are_passed_on(self):
+        messages, _ = self.request('GET', '/api/posts/', query_string=b'status=draft',
+                                   headers=[(b'if-none-match', b'"nothing"')])
+        self.assertEqual(status.HTTP_200_OK, messages[0]['status'])
+        self.assertEqual([], json.loads(self.body(messages).decode('utf-8'))['results'])
+
+    def test_cookie_headers_are_joined_as_cookies(self):
+        environ = self.application.environ({
+            'type': 'http', 'method': 'GET', 'path': '/api/posts/',
+            'headers': [(b'cookie', b'sessionid=abc'), (b'cookie', b'pin_primary=1'),
+                        (b'accept', b'text/html'), (b'accept', b'application/json')],
+        }, None)
+        self.assertEqual('sessionid=abc; pin_primary=1', environ['HTTP_COOKIE'])
+        self.assertEqual('text/html,application/json', environ['HTTP_ACCEPT'])
+
+    def test_writes_are_handled_in_the_write_pool(self):
+        credentials = base64.b64encode(b'user:secret')
+        body = json.dumps({
+            'title': 'Rhaegal', 'content': 'Green', 'topic': 'http://testserver/api/topics/{}/'.format(self.topic.pk),
+        }).encode('utf-8')
+        messages, threads = self.request('POST', '/api/posts/', body, headers=[
+            (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode('ascii')),
+            (b'authorization', b'Basic ' + credentials),
+        ])
+        self.assertEqual(status.HTTP_201_CREATED, messages[0]['status'])
+        self.assertEqual([name for name in threads if not name.startswith('asgi-write')], [])
+        self.assertTrue(Post.objects.filter(title='Rhaegal', user=self.user).exists())
+
+    def test_client_gone_before_the_body_is_not_handled(self):
+        received = [{'type': 'http.disconnect'}]
+        messages = []
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/posts/', 'headers': []}
+        asyncio.run(self.application(scope, receive, send))
+        self.assertEqual([], messages)
+
+    def test_lifespan(self):
+        received = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        messages = []
+
+        async def receive():
+            return received.pop(0)
+
+        async def send(message):
+            messages.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(['lifespan.startup.complete', 'lifespan.shutdown.complete'], messages)
@@ -0,0 +1,66 @@
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from app.models import User
+from app.tests.budgets import BudgetAssertionsMixin, at_dataset_sizes
+
+DATASET_SIZES = (5, 60)
+
+
+class TestRequestBudgets(BudgetAssertionsMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com', is_staff=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def topic_url(self):
+        return 'http://testserver{}'.format(reverse('topic-detail', kwargs={'pk': self.dataset['topics'][0].pk}))
+
+    @at_dataset_sizes(*DATASET_SIZES)
+    def test_list(self):
+        for basename in ['post', 'topic', 'user']:
+            response = self.request_within_budget(basename, 'list', 'get', reverse('{}-list'.format(basename)))
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    @at_dataset_sizes(*DATASET_SIZES)
+    def test_retrieve(self):
+        for basename, obj in [('post', self.dataset['posts'][-1]), ('topic', self.dataset['topics'][-1]),
+                              ('user', self.dataset['users'][-1])]:
+            url = reverse('{}-detail'.format(basename), kwargs={'pk': obj.pk})
+            response = self.request_within_budget(basename, 'retrieve', 'get', url)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    @at_dataset_sizes(*DATASET_SIZES)
+    def test_feed(self):
+        url = reverse('topic-feed', kwargs={'pk': self.dataset['topics'][0].pk})
+        response = self.request_within_budget('topic', 'feed', 'get', url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.data['results'])
+
+    @at_dataset_sizes(*DATASET_SIZES)
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_create(self):
+        response = self.request_within_budget('post', 'create', 'post', reverse('post-list'), {
+            'title': 'Drogon', 'content': 'Black', 'topic': self.topic_url(),
+        })
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        response = self.request_within_budget('topic', 'create', 'post', reverse('topic-list'), {'name': 'Dragons'})
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        response = self.request_within_budget('user', 'create', 'post', reverse('user-list'), {
+            'first_name': 'Jon', 'last_name': 'Snow', 'email': 'jon@test.com', 'password': 'Ghost',
+        })
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+
+    @at_dataset_sizes(*DATASET_SIZES)
+    def test_publish(self):
+        post = self.dataset['posts'][-1]
+        post.user = self.user
+        post.status = 'draft'
+        post.save()
+        url = reverse('post-publish', kwargs={'pk': post.pk})
+        response = self.request_within_budget('post', 'publish', 'post', url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
@@ -0,0 +1,124 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.db import IntegrityError, connection, connections, models, transaction
+from django.db.utils import load_backend
+from rest_framework.test import APITestCase
+
+from app.models import Post, Topic, User
+
+
+class TestSQLitePragmas(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def wrapper(self, pragmas, **options):
+        settings_dict = dict(connection.settings_dict, NAME=os.path.join(self.directory, 'tuned.sqlite3'),
+                             PRAGMAS=pragmas, POOL={'SIZE': 0}, **options)
+        wrapper = load_backend('app.db.backends.sqlite3').DatabaseWrapper(settings_dict, 'tuned')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragmas(self, pragmas, *names):
+        with self.wrapper(pragmas).cursor() as cursor:
+            values = []
+            for name in names:
+                cursor.execute('PRAGMA {}'.format(name))
+                values.append(cursor.fetchone()[0])
+        return values
+
+    def test_tuned_profile(self):
+        self.assertEqual(
+            ['wal', 1, 5000, -64000, 256 * 1024 * 1024, 2],
+            self.pragmas('tuned', 'journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size',
+                         'temp_store'),
+        )
+
+    def test_pragmas_given_as_a_dict(self):
+        self.assertEqual(['delete', 250], self.pragmas({'busy_timeout': 250}, 'journal_mode', 'busy_timeout'))
+
+    def holds_write_lock_in_atomic_block(self, wrapper):
+        """
+        Whether another connection can start writing while ``wrapper`` is in an atomic
+        block that did not write yet.
+        """
+        connections['tuned'] = wrapper
+        self.addCleanup(delattr, connections._connections, 'tuned')
+        other = sqlite3.connect(wrapper.settings_dict['NAME'], timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with transaction.atomic(using='tuned'):
+            try:
+                other.execute('BEGIN IMMEDIATE')
+            except sqlite3.OperationalError:
+                return True
+            other.execute('ROLLBACK')
+            return False
+
+    def test_tuned_profile_begins_immediate_transactions(self):
+        self.assertTrue(self.holds_write_lock_in_atomic_block(self.wrapper('tuned')))
+
+    def test_default_profile_defers_transactions(self):
+        self.assertFalse(self.holds_write_lock_in_atomic_block(self.wrapper('default')))
+
+    def test_transaction_mode_setting(self):
+        self.assertFalse(self.holds_write_lock_in_atomic_block(self.wrapper('tuned', TRANSACTION_MODE='DEFERRED')))
+
+
+class TestSQLiteTableRebuilds(APITestCase):
+    """
+    A scratch database with the trigger of a post counter and an expression index, like
+    migrations 0008 and 0009, whose tables are rebuilt by field changes.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_dict = dict(connection.settings_dict, NAME=os.path.join(directory, 'rebuilt.sqlite3'),
+                             POOL={'SIZE': 0})
+        self.wrapper = load_backend('app.db.backends.sqlite3').DatabaseWrapper(settings_dict, 'rebuilt')
+        self.addCleanup(self.wrapper.close)
+        with self.wrapper.schema_editor(atomic=False) as editor:
+            for model in (User, Topic, Post):
+                editor.create_model(model)
+            editor.execute('CREATE UNIQUE INDEX topic_name_lower_uniq ON app_topic (LOWER(name))')
+            editor.execute('CREATE TRIGGER app_post_counts_insert AFTER INSERT ON app_post BEGIN '
+                           'UPDATE app_topic SET post_count = post_count + 1 WHERE id = new.topic_id; END')
+
+    def alter(self, model, name, new_field):
+        old_field = model._meta.get_field(name)
+        new_field.set_attributes_from_name(name)
+        new_field.model = model
+        with self.wrapper.schema_editor(atomic=False) as editor:
+            editor.alter_field(model, old_field, new_field)
+
+    def schema_objects(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger') "
+                           "AND name NOT LIKE 'sqlite_%' ORDER BY name")
+            return cursor.fetchall()
+
+    def test_triggers_and_expression_indexes_are_kept(self):
+        objects = self.schema_objects()
+        self.alter(Topic, 'post_count', models.BigIntegerField(default=0))
+        self.alter(Post, 'title', models.CharField(max_length=300))
+        self.assertEqual(objects, self.schema_objects())
+
+        # No user in the scratch database.
+        self.wrapper.disable_constraint_checking()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("INSERT INTO app_topic (name, post_count, published_count, modified) "
+                           "VALUES ('Dragons', 0, 0, '2020-01-01')")
+            cursor.execute("INSERT INTO app_post (user_id, topic_id, title, content, created, modified, status) "
+                           "VALUES (1, 1, 'Drogon', '', '2020-01-01', '2020-01-01', 'draft')")
+            cursor.execute('SELECT post_count FROM app_topic')
+            self.assertEqual((1,), cursor.fetchone())
+            with self.assertRaises(IntegrityError):
+                cursor.execute("INSERT INTO app_topic (name, post_count, published_count, modified) "
+                               "VALUES ('DRAGONS', 0, 0, '2020-01-01')")
+
+    def test_expression_indexes_of_an_altered_column_are_dropped(self):
+        self.alter(Topic, 'name', models.CharField(max_length=200, unique=True))
+        self.assertNotIn(('index', 'topic_name_lower_uniq'), self.schema_objects())
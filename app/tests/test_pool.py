@@ -0,0 +1,92 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+from django.db import OperationalError, connection
+from django.db.utils import load_backend
+from rest_framework.test import APITestCase
+
+from app import metrics
+from app.db.pool import ConnectionPool
+
+
+class TestConnectionPool(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.name = os.path.join(self.directory, 'pooled.sqlite3')
+
+    def connect(self):
+        return sqlite3.connect(self.name, check_same_thread=False)
+
+    def pool(self, **kwargs):
+        pool = ConnectionPool('pooled', **dict({'size': 2}, **kwargs))
+        self.addCleanup(pool.close)
+        return pool
+
+    @staticmethod
+    def events(event):
+        return metrics.DB_POOL_CONNECTIONS.values.get(('pooled', event), 0)
+
+    def test_connections_of_a_database_wrapper_are_reused(self):
+        settings_dict = dict(connection.settings_dict, NAME=self.name, POOL={'SIZE': 2})
+        wrapper = load_backend('app.db.backends.sqlite3').DatabaseWrapper(settings_dict, 'pooled')
+        opened, reused = self.events('opened'), self.events('reused')
+
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        wrapper.ensure_connection()
+        self.assertIs(raw, wrapper.connection)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        wrapper.close()
+        wrapper.get_pool().close()
+
+        self.assertEqual(opened + 1, self.events('opened'))
+        self.assertEqual(reused + 1, self.events('reused'))
+
+    def test_uncommitted_work_is_rolled_back(self):
+        pool = self.pool()
+        raw, created = pool.acquire(self.connect)
+        raw.execute('CREATE TABLE item (name TEXT)')
+        raw.execute("INSERT INTO item VALUES ('left over')")
+        pool.release(raw, created)
+
+        raw, created = pool.acquire(self.connect)
+        self.assertEqual([(0,)], raw.execute('SELECT COUNT(*) FROM item').fetchall())
+        pool.release(raw, created)
+
+    def test_waits_for_a_released_connection(self):
+        pool = self.pool(size=1, timeout=5)
+        raw, created = pool.acquire(self.connect)
+        threading.Timer(0.05, pool.release, (raw, created)).start()
+        self.assertIs(raw, pool.acquire(self.connect)[0])
+
+    def test_gives_up_waiting_after_the_timeout(self):
+        pool = self.pool(size=1, timeout=0.05)
+        timeouts = self.events('timeout')
+        pool.acquire(self.connect)
+        with self.assertRaises(OperationalError):
+            pool.acquire(self.connect)
+        self.assertEqual(timeouts + 1, self.events('timeout'))
+
+    def test_expired_connections_are_replaced(self):
+        pool = self.pool(max_lifetime=0)
+        raw, created = pool.acquire(self.connect)
+        pool.release(raw, created)
+        self.assertEqual([], pool.idle)
+        self.assertEqual(0, pool.opened)
+
+    def test_unhealthy_idle_connections_are_replaced(self):
+        pool = self.pool(check_idle=0)
+        raw, created = pool.acquire(self.connect)
+        pool.release(raw, created)
+        raw.close()
+
+        replacement, _ = pool.acquire(self.connect)
+        self.assertIsNot(raw, replacement)
+        self.assertEqual([(1,)], replacement.execute('SELECT 1').fetchall())
+        self.assertEqual(1, pool.opened)
@@ -0,0 +1,52 @@
+import io
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+import pytz
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.relations import Hyperlink
+from rest_framework.test import APITestCase
+
+from app.parsers import JSONParser
+from app.renderers import JSONRenderer
+
+
+class TestJSONRenderer(APITestCase):
+    data = OrderedDict([
+        ('url', Hyperlink('http://testserver/api/posts/1/', None)),
+        ('title', 'Zoë \u2028 "quoted" \u2029'),
+        ('created', datetime(2020, 1, 2, 3, 4, 5, 678901, tzinfo=pytz.utc)),
+        ('day', date(2020, 1, 2)),
+        ('duration', timedelta(seconds=90)),
+        ('price', Decimal('1.10')),
+        ('id', UUID('12345678-1234-5678-1234-567812345678')),
+        ('posts', [{'count': 1, 'ratio': 0.5, 'published': True, 'topic': None}]),
+        (1, 'key'),
+    ])
+
+    def test_output_matches_drf_renderer(self):
+        self.assertEqual(JSONRenderer().render(self.data), renderers.JSONRenderer().render(self.data))
+
+    def test_indented_output_matches_drf_renderer(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            JSONRenderer().render(self.data, media_type),
+            renderers.JSONRenderer().render(self.data, media_type),
+        )
+
+    def test_integers_out_of_range_fall_back_to_drf_renderer(self):
+        data = {'big': 2 ** 70}
+        self.assertEqual(JSONRenderer().render(data), renderers.JSONRenderer().render(data))
+
+
+class TestJSONParser(APITestCase):
+    def test_parses_like_drf_parser(self):
+        body = '{"title": "Zoë", "posts": [1, 2.5, null, true]}'.encode('utf-8')
+        self.assertEqual(JSONParser().parse(io.BytesIO(body)), parsers.JSONParser().parse(io.BytesIO(body)))
+
+    def test_invalid_json_raises_parse_error(self):
+        with self.assertRaises(ParseError):
+            JSONParser().parse(io.BytesIO(b'{"title": '))
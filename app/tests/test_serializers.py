@@ -1,6 +1,14 @@
+from django.db.models import Prefetch
+from django.test import override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase, APIRequestFactory
+from app import hyperlinks
 from app.models import User, Topic, Post
+from app.pagination import NESTED_POSTS_LIMIT
+from app.readers import PostListReader, TopicListReader, UserListReader
 from app.serializers import TopicSerializer, UserSerializer, PostSerializer
 
 
@@ -49,10 +57,13 @@ class TestTopicSerializer(APITestCase):
         request = factory.get(self.list_url())
         request.user = self.user
 
+        # Left to the unique constraint, the error is raised on save.
         serializer = TopicSerializer(data=data, context={'request': request})
-        self.assertFalse(serializer.is_valid())
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(ValidationError) as raised:
+            serializer.save()
         self.assertEqual(
-            serializer.errors, {'name': [u'Topic with name {} already exists.'.format(topic.name)]}
+            raised.exception.detail, {'name': [u'Topic with name {} already exists.'.format(topic.name)]}
         )
 
 
@@ -112,11 +123,16 @@ class TestUserSerializer(APITestCase):
         request = factory.get(self.list_url())
         request.user = self.user
 
-        serializer = UserSerializer(data=data, context={'request': request})
-        self.assertFalse(serializer.is_valid())
-        self.assertEqual(
-            serializer.errors, {'email': [u'User with email author@email.com already exists.']}
-        )
+        # Left to the unique constraints, the error is raised on save, whatever the case.
+        for email in ['author@email.com', 'Author@Email.com']:
+            data['email'] = email
+            serializer = UserSerializer(data=data, context={'request': request})
+            self.assertTrue(serializer.is_valid())
+            with self.assertRaises(ValidationError) as raised:
+                serializer.save()
+            self.assertEqual(
+                raised.exception.detail, {'email': [u'User with email {} already exists.'.format(email)]}
+            )
 
 
 class TestPostSerializer(APITestCase):
@@ -257,3 +273,85 @@ class TestPostSerializer(APITestCase):
         self.assertEqual(
             serializer.errors, {'status': [u'"" is not a valid choice.']}
         )
+
+
+class TestListReaders(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='User', email='test@test.com')
+        cls.other_user = User.objects.create(username='Other', first_name='Zoë', email='other@test.com')
+        cls.topic = Topic.objects.create(name='Test Topic')
+        cls.other_topic = Topic.objects.create(name='Other Topic')
+        for number in range(12):
+            Post.objects.create(
+                topic=cls.topic, user=cls.user, title='Post {}'.format(number), content='Çontent "{}"'.format(number)
+            )
+        Post.objects.create(topic=cls.other_topic, user=cls.other_user, title='Other', content='', status='published')
+
+    def render_both(self, serializer_class, reader_class, queryset, format=None):
+        request = Request(APIRequestFactory().get('/api/'))
+        serializer = serializer_class(queryset, many=True, context={'request': request, 'format': format})
+        reader = reader_class(request, format=format)
+        rows = reader.get_queryset(queryset)
+        return JSONRenderer().render(serializer.data), JSONRenderer().render(reader.to_representation(rows))
+
+    def test_post_reader_output_matches_serializer(self):
+        expected, actual = self.render_both(PostSerializer, PostListReader, Post.objects.order_by('created', 'pk'))
+        self.assertEqual(actual, expected)
+
+    def test_topic_reader_output_matches_serializer(self):
+        queryset = Topic.objects.prefetch_related(Prefetch('posts', queryset=Post.objects.order_by('created', 'pk')))
+        expected, actual = self.render_both(TopicSerializer, TopicListReader, queryset.order_by('pk'))
+        self.assertEqual(actual, expected)
+
+    def test_user_reader_output_matches_serializer(self):
+        queryset = User.objects.prefetch_related(Prefetch('posts', queryset=Post.objects.order_by('created', 'pk')))
+        expected, actual = self.render_both(UserSerializer, UserListReader, queryset.order_by('created', 'pk'))
+        self.assertEqual(actual, expected)
+
+    def test_reader_output_matches_serializer_with_format_suffix(self):
+        queryset = User.objects.prefetch_related(Prefetch('posts', queryset=Post.objects.order_by('created', 'pk')))
+        for serializer_class, reader_class, queryset in [
+            (PostSerializer, PostListReader, Post.objects.order_by('created', 'pk')),
+            (TopicSerializer, TopicListReader, Topic.objects.order_by('pk')),
+            (UserSerializer, UserListReader, queryset.order_by('created', 'pk')),
+        ]:
+            expected, actual = self.render_both(serializer_class, reader_class, queryset, format='json')
+            self.assertEqual(actual, expected)
+
+    def test_topic_reader_reads_nested_posts_with_one_query(self):
+        request = Request(APIRequestFactory().get('/api/'))
+        reader = TopicListReader(request)
+        with self.assertNumQueries(2):
+            data = reader.to_representation(reader.get_queryset(Topic.objects.order_by('pk')))
+        self.assertEqual(len(data[0]['posts']), NESTED_POSTS_LIMIT)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver', 'other.test'])
+class TestHyperlinkTemplates(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='User', email='test@test.com')
+        cls.topic = Topic.objects.create(name='Test Topic')
+        cls.post = Post.objects.create(topic=cls.topic, user=cls.user, title='Title', content='Content')
+
+    def setUp(self):
+        hyperlinks._templates.clear()
+
+    def test_field_builds_the_url_reverse_builds(self):
+        for host, secure, format in [('testserver', False, None), ('other.test', True, 'json')]:
+            request = Request(APIRequestFactory().get('/api/', HTTP_HOST=host, secure=secure))
+            field = hyperlinks.HyperlinkedIdentityField(view_name='post-detail')
+            field.bind('url', PostSerializer(context={'request': request, 'format': format}))
+            self.assertEqual(
+                field.to_representation(self.post),
+                reverse('post-detail', kwargs={'pk': self.post.pk}, request=request, format=format),
+            )
+
+    def test_template_is_reversed_once_per_host(self):
+        requests = [Request(APIRequestFactory().get('/api/', HTTP_HOST=host)) for host in ('testserver', 'other.test')]
+        for request in requests + requests:
+            PostSerializer([self.post, self.post], many=True, context={'request': request}).data
+        hosts = {key[-1] for key in hyperlinks._templates}
+        self.assertEqual(hosts, {'testserver', 'other.test'})
+        self.assertEqual(len(hyperlinks._templates), 6)
@@ -1,10 +1,28 @@
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
 from collections import OrderedDict
+from unittest import mock
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.reverse import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 
+from app import hashers, metrics, routers
+from app.cache import get_generation
 from app.models import User, Post, Topic
+from app.pagination import NESTED_POSTS_LIMIT
 
 
 class TestPostViewSet(APITestCase):
@@ -34,6 +52,10 @@ class TestPostViewSet(APITestCase):
             status='published'
         )
 
+    def setUp(self):
+        # Rendered detail responses are cached outside of the test transaction.
+        cache.clear()
+
     @staticmethod
     def list_url():
         return reverse('post-list')
@@ -92,8 +114,8 @@ class TestPostViewSet(APITestCase):
         ]
 
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(len(response.data), 3)
-        actual_items = [dict(item) for item in response.data]
+        self.assertEqual(len(response.data['results']), 3)
+        actual_items = [dict(item) for item in response.data['results']]
         self.assertEqual(expected_items, actual_items)
 
     def test_list_with_authenticated_user(self):
@@ -146,8 +168,8 @@ class TestPostViewSet(APITestCase):
         ]
 
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(len(response.data), 3)
-        actual_items = [dict(item) for item in response.data]
+        self.assertEqual(len(response.data['results']), 3)
+        actual_items = [dict(item) for item in response.data['results']]
         self.assertEqual(expected_items, actual_items)
 
     def test_list_with_search_query(self):
@@ -169,10 +191,76 @@ class TestPostViewSet(APITestCase):
             },
         ]
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(len(response.data), 1)
-        actual_items = [dict(item) for item in response.data]
+        self.assertEqual(len(response.data['results']), 1)
+        actual_items = [dict(item) for item in response.data['results']]
         self.assertEqual(expected_items, actual_items)
 
+    def test_list_is_paginated_with_cursor(self):
+        response = self.client.get(self.list_url(), {'page_size': 2})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(['Drogon', 'Vizerion'], [item['title'] for item in response.data['results']])
+        self.assertIsNone(response.data['previous'])
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(['Rhaegal'], [item['title'] for item in response.data['results']])
+        self.assertIsNone(response.data['next'])
+
+    def test_list_filtered_by_topic_and_user(self):
+        other_topic = Topic.objects.create(name='Wolves')
+        Post.objects.create(title='Ghost', user=self.user1, topic=other_topic)
+
+        response = self.client.get(self.list_url(), {'topic': other_topic.pk})
+        self.assertEqual(['Ghost'], [item['title'] for item in response.data['results']])
+
+        response = self.client.get(self.list_url(), {'user': self.user1.pk})
+        self.assertEqual(['Drogon', 'Ghost'], [item['title'] for item in response.data['results']])
+
+        for value in ['dragons', '\u00b2', '']:
+            response = self.client.get(self.list_url(), {'topic': value})
+            self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_list_filtered_by_status(self):
+        response = self.client.get(self.list_url(), {'status': 'published'})
+        self.assertEqual(['Rhaegal'], [item['title'] for item in response.data['results']])
+
+        response = self.client.get(self.list_url(), {'status': 'draft'})
+        self.assertEqual(['Drogon', 'Vizerion'], [item['title'] for item in response.data['results']])
+
+        response = self.client.get(self.list_url(), {'status': 'publish'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_search_ranks_by_relevance(self):
+        Post.objects.create(title='Dragons', content='Once upon a time', user=self.user, topic=self.topic)
+        Post.objects.create(title='Dragons', content='Dragons and more dragons', user=self.user, topic=self.topic)
+
+        response = self.client.get(self.list_url(), {'q': 'dragons'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(
+            ['Dragons and more dragons', 'Once upon a time'],
+            [item['content'] for item in response.data['results']]
+        )
+
+    def test_search_matches_word_prefixes(self):
+        response = self.client.get(self.list_url(), {'q': 'drog'})
+        self.assertEqual(['Drogon'], [item['title'] for item in response.data['results']])
+
+    def test_search_follows_updates_and_deletes(self):
+        Post.objects.filter(pk=self.post1.pk).update(title='Balerion')
+        self.post2.delete()
+
+        response = self.client.get(self.list_url(), {'q': 'Drogon'})
+        self.assertEqual([], response.data['results'])
+        response = self.client.get(self.list_url(), {'q': 'Vizerion'})
+        self.assertEqual([], response.data['results'])
+        response = self.client.get(self.list_url(), {'q': 'Balerion'})
+        self.assertEqual(['Balerion'], [item['title'] for item in response.data['results']])
+
+    def test_search_with_query_syntax_characters(self):
+        response = self.client.get(self.list_url(), {'q': '"Drogon" OR (NEAR* -'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([], response.data['results'])
+
     # GET (detail) method
     def test_retrieve_existing_post(self):
         expected_data = {
@@ -331,6 +419,10 @@ class TestUserViewSet(APITestCase):
             topic=cls.topic
         )
 
+    def setUp(self):
+        # Rendered detail responses are cached outside of the test transaction.
+        cache.clear()
+
     @staticmethod
     def list_url():
         return reverse('user-list')
@@ -354,14 +446,30 @@ class TestUserViewSet(APITestCase):
             ('url', 'http://testserver/api/users/1/'),
             ('first_name', ''), ('last_name', ''),
             ('email', 'test@test.com'),
+            ('post_count', 1), ('published_count', 0),
             ('posts', [OrderedDict([('title', 'Rhaegal'),
-            ('topic', 'http://testserver/api/topics/1/')])])
+            ('topic', 'http://testserver/api/topics/1/')])]),
+            ('posts_url', 'http://testserver/api/posts/?user=1'),
         ])]
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(len(response.data), 1)
-        actual_items = [dict(item) for item in response.data]
+        self.assertEqual(len(response.data['results']), 1)
+        actual_items = [dict(item) for item in response.data['results']]
         self.assertEqual(expected_items, actual_items)
 
+    def test_list_query_count_does_not_depend_on_number_of_users(self):
+        # users + nested posts, read once for the conditional GET validators and the page
+        with self.assertNumQueries(2):
+            self.client.get(self.list_url())
+
+        for i in range(5):
+            user = User.objects.create(username='user{}'.format(i), email='test{}@test.com'.format(i))
+            for j in range(3):
+                Post.objects.create(title='Post {}'.format(j), user=user, topic=self.topic)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url())
+        self.assertEqual(len(response.data['results']), 6)
+
     # GET (retrieve) method
     def test_retrieve_with_authenticated_user(self):
         self.client.force_authenticate(self.user)
@@ -372,12 +480,14 @@ class TestUserViewSet(APITestCase):
             'first_name': '',
             'last_name': '',
             'email': 'test@test.com',
-            'posts': [OrderedDict([('title', 'Rhaegal'), ('topic', 'http://testserver/api/topics/1/')])]
-
+            'post_count': 1,
+            'published_count': 0,
+            'posts': [OrderedDict([('title', 'Rhaegal'), ('topic', 'http://testserver/api/topics/1/')])],
+            'posts_url': 'http://testserver/api/posts/?user=1',
         }
 
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(response.data), 8)
         actual_data = dict(response.data)
         self.assertDictEqual(expected_data, actual_data)
 
@@ -391,6 +501,65 @@ class TestUserViewSet(APITestCase):
         response = self.client.get(self.detail_url(pk=self.user.pk))
         self.assertEqual(status.HTTP_200_OK, response.status_code)
 
+    # POST (create) method
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_signup_hashes_before_a_single_insert(self):
+        data = {'first_name': 'Daenerys', 'last_name': 'Targaryen', 'email': 'dany@test.com', 'password': 'Dracarys'}
+        # savepoint + insert + release + posts of the response
+        with self.assertNumQueries(4):
+            response = self.client.post(self.list_url(), data)
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        user = User.objects.get(email='dany@test.com')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(user.check_password('Dracarys'))
+        self.assertTrue(user.is_active)
+        self.assertEqual('dany@test.com', user.username)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000, PASSWORD_HASH_CONCURRENCY=2)
+    def test_signup_with_bounded_hash_concurrency(self):
+        data = {'first_name': 'Jon', 'last_name': 'Snow', 'email': 'jon@test.com', 'password': 'Ghost'}
+        response = self.client.post(self.list_url(), data)
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertTrue(User.objects.get(email='jon@test.com').check_password('Ghost'))
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=2)
+    def test_hash_concurrency_is_bounded(self):
+        running, most = [0], [0]
+        lock = threading.Lock()
+
+        def slow_hash(password):
+            with lock:
+                running[0] += 1
+                most[0] = max(most[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return password
+
+        with mock.patch('django.contrib.auth.hashers.make_password', slow_hash):
+            threads = [threading.Thread(target=hashers.make_password, args=('Ghost',)) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(2, most[0])
+        self.assertIs(hashers.get_slots(), hashers.get_slots())
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_signup_with_email_taken_as_username(self):
+        User.objects.create(username='dany@test.com', email='khaleesi@test.com')
+        data = {'first_name': 'Daenerys', 'last_name': 'Targaryen', 'email': 'dany@test.com', 'password': 'Dracarys'}
+        response = self.client.post(self.list_url(), data)
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual({'email': ['User with username dany@test.com already exists.']}, response.data)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_update_hashes_password(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.patch(self.detail_url(pk=self.user.pk), {'password': 'Drogon'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('Drogon'))
+
 
 class TestTopicViewSet(APITestCase):
     @classmethod
@@ -405,6 +574,10 @@ class TestTopicViewSet(APITestCase):
             topic=cls.topic
         )
 
+    def setUp(self):
+        # Rendered detail responses are cached outside of the test transaction.
+        cache.clear()
+
     @staticmethod
     def list_url():
         return reverse('topic-list')
@@ -427,19 +600,59 @@ class TestTopicViewSet(APITestCase):
         expected_items = [OrderedDict([
             ('url', 'http://testserver/api/topics/1/'),
             ('name', 'Dragons'),
+            ('post_count', 1),
+            ('published_count', 0),
             ('posts', [OrderedDict([
                 ('url', 'http://testserver/api/posts/1/'),
                 ('topic', 'http://testserver/api/topics/1/'),
                 ('user', 'http://testserver/api/users/1/'),
                 ('title', 'Rhaegal'),
                 ('content', ''),
-                ('status', 'draft')])])])]
+                ('status', 'draft')])]),
+            ('posts_url', 'http://testserver/api/posts/?topic=1')])]
 
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(len(response.data), 1)
-        actual_items = [dict(item) for item in response.data]
+        self.assertEqual(len(response.data['results']), 1)
+        actual_items = [dict(item) for item in response.data['results']]
         self.assertEqual(expected_items, actual_items)
 
+    def test_list_query_count_does_not_depend_on_number_of_topics(self):
+        # topics + nested posts, read once for the conditional GET validators and the page
+        with self.assertNumQueries(2):
+            self.client.get(self.list_url())
+
+        for i in range(5):
+            topic = Topic.objects.create(name='Topic {}'.format(i))
+            for j in range(3):
+                Post.objects.create(title='Post {}'.format(j), user=self.user, topic=topic)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url())
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_nested_posts_are_capped(self):
+        for i in range(NESTED_POSTS_LIMIT):
+            Post.objects.create(title='Post {}'.format(i), user=self.user, topic=self.topic)
+
+        response = self.client.get(self.detail_url(pk=self.topic.pk))
+        self.assertEqual(NESTED_POSTS_LIMIT, len(response.data['posts']))
+        self.assertEqual('Rhaegal', response.data['posts'][0]['title'])
+
+        response = self.client.get(response.data['posts_url'])
+        self.assertEqual(NESTED_POSTS_LIMIT + 1, len(response.data['results']))
+
+    def test_nested_posts_of_a_full_page(self):
+        # One LIMIT subquery per topic of the page, up to the largest page size.
+        Topic.objects.bulk_create(Topic(name='Topic {}'.format(i)) for i in range(499))
+        topics = Topic.objects.exclude(pk=self.topic.pk).order_by('pk')
+        Post.objects.bulk_create(
+            Post(title='Post {}'.format(i), user=self.user, topic=topic) for topic in topics[:3] for i in range(12)
+        )
+        response = self.client.get(self.list_url(), {'page_size': 500})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        counts = [len(topic['posts']) for topic in response.data['results']]
+        self.assertEqual([1] + [NESTED_POSTS_LIMIT] * 3 + [0] * 496, counts)
+
     # GET (detail) method
     def test_retrieve_with_authenticated_user(self):
         self.client.force_authenticate(self.user)
@@ -449,17 +662,20 @@ class TestTopicViewSet(APITestCase):
         expected_data = {
                 'url': 'http://testserver/api/topics/1/',
                 'name': 'Dragons',
+                'post_count': 1,
+                'published_count': 0,
                 'posts': [OrderedDict(
                     [('url', 'http://testserver/api/posts/1/'),
                      ('topic', 'http://testserver/api/topics/1/'),
                      ('user', 'http://testserver/api/users/1/'),
                      ('title', 'Rhaegal'),
                      ('content', ''),
-                     ('status', 'draft')])]
+                     ('status', 'draft')])],
+                'posts_url': 'http://testserver/api/posts/?topic=1',
             }
 
         self.assertEqual(status.HTTP_200_OK, response.status_code)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data), 6)
         actual_data = dict(response.data)
         self.assertDictEqual(expected_data, actual_data)
 
@@ -472,3 +688,865 @@ class TestTopicViewSet(APITestCase):
     def test_retrieve_without_authenticated_user(self):
         response = self.client.get(self.detail_url(pk=self.user.pk))
         self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    # POST (create) method
+    def test_create_checks_name_with_unique_constraint(self):
+        self.client.force_authenticate(self.user)
+        # savepoint + insert + release + posts of the response, no query checking the name
+        with self.assertNumQueries(4):
+            response = self.client.post(self.list_url(), {'name': 'Wolves'})
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+
+        response = self.client.post(self.list_url(), {'name': 'Dragons'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual({'name': ['Topic with name Dragons already exists.']}, response.data)
+
+    def test_update_keeps_own_name(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.put(self.detail_url(pk=self.topic.pk), {'name': 'Dragons'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+
+class TestDetailResponseCache(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com')
+        cls.topic = Topic.objects.create(name='Dragons')
+        cls.post = Post.objects.create(title='Rhaegal', user=cls.user, topic=cls.topic)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_json(self, view_name, pk):
+        response = self.client.get(reverse(view_name, kwargs={'pk': pk}))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return json.loads(response.content.decode('utf-8'))
+
+    def test_retrieve_is_served_from_cache(self):
+        for view_name, pk in (('post-detail', self.post.pk), ('topic-detail', self.topic.pk),
+                              ('user-detail', self.user.pk)):
+            first = self.get_json(view_name, pk)
+            # Only the conditional GET validators are read from the db.
+            with self.assertNumQueries(1):
+                second = self.get_json(view_name, pk)
+            self.assertEqual(first, second)
+
+    def test_cache_is_keyed_by_url_base(self):
+        self.get_json('post-detail', self.post.pk)
+        response = self.client.get(reverse('post-detail', kwargs={'pk': self.post.pk}), secure=True)
+        self.assertEqual('https://testserver/api/posts/{}/'.format(self.post.pk), response.data['url'])
+
+    def test_saving_a_post_evicts_its_topic_and_author(self):
+        self.get_json('post-detail', self.post.pk)
+        self.get_json('topic-detail', self.topic.pk)
+        self.get_json('user-detail', self.user.pk)
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.title = 'Drogon'
+        post.save()
+
+        self.assertEqual('Drogon', self.get_json('post-detail', self.post.pk)['title'])
+        self.assertEqual('Drogon', self.get_json('topic-detail', self.topic.pk)['posts'][0]['title'])
+        self.assertEqual('Drogon', self.get_json('user-detail', self.user.pk)['posts'][0]['title'])
+
+    def test_moving_a_post_evicts_its_previous_topic(self):
+        other_topic = Topic.objects.create(name='Wolves')
+        self.get_json('topic-detail', self.topic.pk)
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.topic = other_topic
+        post.save()
+
+        self.assertEqual([], self.get_json('topic-detail', self.topic.pk)['posts'])
+
+    def test_deleting_a_topic_evicts_its_posts(self):
+        self.get_json('post-detail', self.post.pk)
+        Topic.objects.get(pk=self.topic.pk).delete()
+
+        response = self.client.get(reverse('post-detail', kwargs={'pk': self.post.pk}))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+
+class TestCacheInvalidationOnCommit(APITransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='user', email='test@test.com')
+        self.topic = Topic.objects.create(name='Dragons')
+        self.post = Post.objects.create(title='Rhaegal', user=self.user, topic=self.topic)
+
+    def generations(self):
+        return [get_generation(model_name, pk) for model_name, pk in
+                (('post', self.post.pk), ('topic', self.topic.pk), ('user', self.user.pk))]
+
+    def test_generations_are_dropped_when_the_transaction_commits(self):
+        before = self.generations()
+        with transaction.atomic():
+            self.post.title = 'Drogon'
+            self.post.save()
+            # Requests still read the old post until the commit.
+            self.assertEqual(before, self.generations())
+        after = self.generations()
+        self.assertTrue(all(old != new for old, new in zip(before, after)))
+
+    def test_publish_filtered_drops_every_generation(self):
+        before = self.generations()
+        self.client.force_authenticate(self.user)
+        data = {'topic': 'http://testserver/api/topics/{}/'.format(self.topic.pk)}
+        response = self.client.post(reverse('post-publish-filtered'), data, format='json')
+        self.assertEqual({'published': 1}, response.data)
+        after = self.generations()
+        self.assertTrue(all(old != new for old, new in zip(before, after)))
+
+    def test_rolled_back_writes_keep_the_generations(self):
+        before = self.generations()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.post.save()
+            raise RuntimeError
+        self.assertEqual(before, self.generations())
+
+
+class TestConditionalGet(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com')
+        cls.topic = Topic.objects.create(name='Dragons')
+        cls.post = Post.objects.create(title='Rhaegal', user=cls.user, topic=cls.topic)
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        return [
+            reverse('post-list'), reverse('post-detail', kwargs={'pk': self.post.pk}),
+            reverse('topic-list'), reverse('topic-detail', kwargs={'pk': self.topic.pk}),
+            reverse('user-list'), reverse('user-detail', kwargs={'pk': self.user.pk}),
+        ]
+
+    def test_responses_carry_validators(self):
+        for url in self.urls():
+            response = self.client.get(url)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertTrue(response.has_header('ETag'), url)
+            self.assertTrue(response.has_header('Last-Modified'), url)
+
+    def test_if_none_match_answers_not_modified(self):
+        for url in self.urls():
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code, url)
+            self.assertEqual(b'', response.content)
+
+    def test_not_modified_is_answered_before_serialization(self):
+        url = reverse('topic-list')
+        etag = self.client.get(url)['ETag']
+        # Only the rows of the page (topics, nested posts) are read.
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+    def test_if_modified_since_answers_not_modified(self):
+        url = reverse('post-detail', kwargs={'pk': self.post.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+    def test_changing_an_embedded_post_changes_the_etag(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        Post.objects.create(title='Drogon', user=self.user, topic=self.topic)
+
+        for url in [reverse('post-list'), reverse('topic-list'), reverse('user-list'),
+                    reverse('topic-detail', kwargs={'pk': self.topic.pk}),
+                    reverse('user-detail', kwargs={'pk': self.user.pk})]:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(status.HTTP_200_OK, response.status_code, url)
+            self.assertNotEqual(etags[url], response['ETag'])
+
+    def test_etag_depends_on_query(self):
+        url = reverse('post-list')
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url, {'status': 'draft'})['ETag'])
+
+    def test_list_etag_only_depends_on_the_page(self):
+        other = Post.objects.create(title='Drogon', user=self.user, topic=self.topic)
+        url = reverse('post-list')
+        etag = self.client.get(url, {'page_size': 1})['ETag']
+
+        other.title = 'Viserion'
+        other.save()
+        response = self.client.get(url, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+
+        Post.objects.filter(pk=other.pk).delete()
+        # The page lost its next link.
+        response = self.client.get(url, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_counters_change_the_list_etag(self):
+        url = reverse('topic-list')
+        etag = self.client.get(url)['ETag']
+        Topic.objects.filter(pk=self.topic.pk).update(published_count=1)
+        self.assertEqual(status.HTTP_200_OK, self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code)
+
+
+class TestBulkPostEndpoints(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com')
+        cls.other_user = User.objects.create(username='other', email='other@test.com')
+        cls.topic = Topic.objects.create(name='Dragons')
+        cls.post = Post.objects.create(title='Rhaegal', user=cls.user, topic=cls.topic)
+        cls.other_post = Post.objects.create(title='Ghost', user=cls.other_user, topic=cls.topic)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def topic_url(pk):
+        return 'http://testserver/api/topics/{}/'.format(pk)
+
+    @staticmethod
+    def post_url(pk):
+        return 'http://testserver/api/posts/{}/'.format(pk)
+
+    def test_bulk_create(self):
+        data = [
+            {'title': 'Drogon', 'content': 'Black', 'topic': self.topic_url(self.topic.pk)},
+            {'title': '', 'content': 'Green', 'topic': self.topic_url(self.topic.pk)},
+            {'title': 'Viserion', 'content': 'White', 'topic': self.topic_url(-1), 'status': 'published'},
+            {'title': 'Viserion', 'content': 'White', 'topic': self.topic_url(self.topic.pk), 'status': 'published'},
+        ]
+        # topics check + insert + pks of the inserted rows, in a savepoint
+        with self.assertNumQueries(3 + 2):
+            response = self.client.post(reverse('post-bulk'), data, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+        results = response.data['results']
+        self.assertEqual([201, 400, 400, 201], [result['status'] for result in results])
+        self.assertEqual({'title': ['This field may not be blank.']}, results[1]['errors'])
+        self.assertEqual({'topic': ['Invalid hyperlink - Object does not exist.']}, results[2]['errors'])
+
+        drogon = Post.objects.get(title='Drogon')
+        viserion = Post.objects.get(title='Viserion')
+        self.assertEqual(self.post_url(drogon.pk), results[0]['url'])
+        self.assertEqual(self.post_url(viserion.pk), results[3]['url'])
+        self.assertEqual((self.user, 'draft'), (drogon.user, drogon.status))
+        self.assertEqual('published', viserion.status)
+
+    def test_bulk_create_reports_the_pks_of_every_insert_batch(self):
+        # SQLite inserts this many rows in several INSERT statements.
+        data = [{'title': 'Dragon {}'.format(i), 'content': 'Red', 'topic': self.topic_url(self.topic.pk)}
+                for i in range(300)]
+        response = self.client.post(reverse('post-bulk'), data, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        titles = dict(Post.objects.filter(title__startswith='Dragon ').values_list('pk', 'title'))
+        self.assertEqual([item['title'] for item in data],
+                         [titles[int(result['url'].rstrip('/').rsplit('/', 1)[1])] for result in response.data['results']])
+
+    def test_bulk_create_requires_a_list(self):
+        response = self.client.post(reverse('post-bulk'), {'title': 'Drogon'}, format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def test_bulk_create_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(reverse('post-bulk'), [], format='json')
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+    def test_bulk_update(self):
+        other_topic = Topic.objects.create(name='Wolves')
+        data = [
+            {'url': self.post_url(self.post.pk), 'title': 'Drogon', 'topic': self.topic_url(other_topic.pk)},
+            {'url': self.post_url(self.other_post.pk), 'title': 'Nymeria'},
+            {'url': self.post_url(-1), 'title': 'Balerion'},
+            {'title': 'Balerion'},
+        ]
+        response = self.client.patch(reverse('post-bulk'), data, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+        results = response.data['results']
+        self.assertEqual([200, 403, 404, 400], [result['status'] for result in results])
+        self.assertEqual({'url': ['This field is required.']}, results[3]['errors'])
+
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(('Drogon', other_topic), (post.title, post.topic))
+        self.assertGreater(post.modified, self.post.modified)
+        self.assertEqual('Ghost', Post.objects.get(pk=self.other_post.pk).title)
+
+    def test_bulk_update_by_admin(self):
+        self.client.force_authenticate(User.objects.create(username='admin', email='admin@test.com', is_staff=True))
+        data = [{'url': self.post_url(self.other_post.pk), 'title': 'Nymeria'}]
+        response = self.client.patch(reverse('post-bulk'), data, format='json')
+        self.assertEqual([200], [result['status'] for result in response.data['results']])
+        self.assertEqual('Nymeria', Post.objects.get(pk=self.other_post.pk).title)
+
+    def test_bulk_update_evicts_cached_representations(self):
+        self.client.get(reverse('topic-detail', kwargs={'pk': self.topic.pk}))
+        data = [{'url': self.post_url(self.post.pk), 'title': 'Drogon'}]
+        self.client.patch(reverse('post-bulk'), data, format='json')
+
+        response = self.client.get(reverse('topic-detail', kwargs={'pk': self.topic.pk}))
+        content = json.loads(response.content.decode('utf-8'))
+        self.assertEqual('Drogon', content['posts'][0]['title'])
+
+    def test_bulk_publish(self):
+        published = Post.objects.create(title='Drogon', user=self.user, topic=self.topic, status='published')
+        data = [
+            {'url': self.post_url(self.post.pk)},
+            {'url': self.post_url(self.other_post.pk)},
+            {'url': self.post_url(published.pk)},
+        ]
+        # posts + update, in a savepoint
+        with self.assertNumQueries(2 + 2):
+            response = self.client.post(reverse('post-bulk-publish'), data, format='json')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([200, 403, 400], [result['status'] for result in response.data['results']])
+        self.assertEqual('published', Post.objects.get(pk=self.post.pk).status)
+        self.assertEqual('draft', Post.objects.get(pk=self.other_post.pk).status)
+
+
+class TestPublish(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com')
+        cls.other_user = User.objects.create(username='other', email='other@test.com')
+        cls.topic = Topic.objects.create(name='Dragons')
+        cls.other_topic = Topic.objects.create(name='Wolves')
+        cls.post = Post.objects.create(title='Rhaegal', user=cls.user, topic=cls.topic)
+        cls.other_post = Post.objects.create(title='Ghost', user=cls.other_user, topic=cls.topic)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def publish_url(pk):
+        return reverse('post-publish', kwargs={'pk': pk})
+
+    def test_publish_is_a_single_statement(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(self.publish_url(self.post.pk))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual('published', Post.objects.get(pk=self.post.pk).status)
+
+    def test_publish_already_published_post(self):
+        self.client.post(self.publish_url(self.post.pk))
+        response = self.client.post(self.publish_url(self.post.pk))
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual(['This post is already published'], response.data)
+
+    def test_publish_post_of_another_user(self):
+        response = self.client.post(self.publish_url(self.other_post.pk))
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual(['You can not publish posts that are not yours'], response.data)
+        self.assertEqual('draft', Post.objects.get(pk=self.other_post.pk).status)
+
+    def test_publish_non_existing_post(self):
+        self.assertEqual(status.HTTP_404_NOT_FOUND, self.client.post(self.publish_url(-1)).status_code)
+        self.assertEqual(status.HTTP_404_NOT_FOUND, self.client.post('/api/posts/abc/publish/').status_code)
+
+    def test_publish_is_visible_in_cached_topic(self):
+        url = reverse('topic-detail', kwargs={'pk': self.topic.pk})
+        self.client.get(url)
+        self.client.post(self.publish_url(self.post.pk))
+
+        content = json.loads(self.client.get(url).content.decode('utf-8'))
+        self.assertEqual('published', content['posts'][0]['status'])
+
+    def test_publish_filtered_by_topic(self):
+        post = Post.objects.create(title='Nymeria', user=self.user, topic=self.other_topic)
+        data = {'topic': 'http://testserver/api/topics/{}/'.format(self.topic.pk)}
+        response = self.client.post(reverse('post-publish-filtered'), data, format='json')
+
+        self.assertEqual({'published': 1}, response.data)
+        self.assertEqual('published', Post.objects.get(pk=self.post.pk).status)
+        self.assertEqual('draft', Post.objects.get(pk=post.pk).status)
+        # Only the own posts of a user are published.
+        self.assertEqual('draft', Post.objects.get(pk=self.other_post.pk).status)
+
+    def test_publish_filtered_is_a_single_update(self):
+        data = {'topic': 'http://testserver/api/topics/{}/'.format(self.topic.pk)}
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('post-publish-filtered'), data, format='json')
+        self.assertEqual({'published': 1}, response.data)
+
+    def test_publish_filtered_by_date_range(self):
+        created = Post.objects.get(pk=self.post.pk).created
+        data = {'created_after': created.isoformat(), 'created_before': (created + timedelta(seconds=1)).isoformat()}
+        response = self.client.post(reverse('post-publish-filtered'), data, format='json')
+        self.assertEqual({'published': 1}, response.data)
+
+        data = {'created_before': created.isoformat()}
+        response = self.client.post(reverse('post-publish-filtered'), data, format='json')
+        self.assertEqual({'published': 0}, response.data)
+
+    def test_publish_filtered_by_admin(self):
+        self.client.force_authenticate(User.objects.create(username='admin', email='admin@test.com', is_staff=True))
+        data = {'topic': 'http://testserver/api/topics/{}/'.format(self.topic.pk)}
+        response = self.client.post(reverse('post-publish-filtered'), data, format='json')
+        self.assertEqual({'published': 2}, response.data)
+
+    def test_publish_filtered_requires_a_filter(self):
+        response = self.client.post(reverse('post-publish-filtered'), {}, format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+
+class TestPostExport(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com')
+        cls.topic = Topic.objects.create(name='Dragons')
+        cls.post = Post.objects.create(title='Rhaegal', content='Green, "big"', user=cls.user, topic=cls.topic)
+        cls.published = Post.objects.create(title='Drogon', user=cls.user, topic=cls.topic, status='published')
+
+    def export(self, **params):
+        response = self.client.get(reverse('post-export'), params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_export_ndjson(self):
+        response, content = self.export()
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+        rows = [json.loads(line) for line in content.splitlines()]
+
+        self.assertEqual(['Rhaegal', 'Drogon'], [row['title'] for row in rows])
+        listed = self.client.get(reverse('post-detail', kwargs={'pk': self.post.pk})).data
+        for field in ('url', 'topic', 'user', 'title', 'content', 'status'):
+            self.assertEqual(listed[field], rows[0][field])
+        self.assertTrue(rows[0]['modified'].endswith('Z'))
+
+    def test_export_csv(self):
+        response, content = self.export(output='csv')
+        self.assertEqual('text/csv; charset=utf-8', response['Content-Type'])
+        lines = content.splitlines()
+        self.assertEqual('url,topic,user,title,content,status,created,modified', lines[0])
+        self.assertIn('Rhaegal,"Green, ""big""",draft', lines[1])
+        self.assertEqual(3, len(lines))
+
+    def test_export_filters(self):
+        _, content = self.export(status='published')
+        self.assertEqual(['Drogon'], [json.loads(line)['title'] for line in content.splitlines()])
+
+        modified = Post.objects.get(pk=self.published.pk).modified
+        _, content = self.export(modified_after=modified.isoformat())
+        self.assertEqual(['Drogon'], [json.loads(line)['title'] for line in content.splitlines()])
+        _, content = self.export(modified_before=modified.isoformat())
+        self.assertEqual(['Rhaegal'], [json.loads(line)['title'] for line in content.splitlines()])
+
+    def test_export_with_invalid_parameters(self):
+        for params in ({'output': 'xml'}, {'modified_after': 'yesterday'}):
+            response = self.client.get(reverse('post-export'), params)
+            self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+
+class TestPostCounters(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com')
+        cls.other_user = User.objects.create(username='other', email='other@test.com')
+        cls.topic = Topic.objects.create(name='Dragons')
+        cls.other_topic = Topic.objects.create(name='Wolves')
+        cls.post = Post.objects.create(title='Rhaegal', user=cls.user, topic=cls.topic)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def assertCounts(self, instance, post_count, published_count):
+        counts = type(instance).objects.values('post_count', 'published_count').get(pk=instance.pk)
+        self.assertEqual({'post_count': post_count, 'published_count': published_count}, counts)
+
+    @staticmethod
+    def topic_url(pk):
+        return 'http://testserver/api/topics/{}/'.format(pk)
+
+    def test_counts_follow_create_publish_move_and_delete(self):
+        response = self.client.post(reverse('post-list'), {
+            'title': 'Drogon', 'content': 'Black', 'topic': self.topic_url(self.topic.pk)
+        })
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertCounts(self.topic, 2, 0)
+        self.assertCounts(self.user, 2, 0)
+
+        self.client.post(reverse('post-publish', kwargs={'pk': self.post.pk}))
+        self.assertCounts(self.topic, 2, 1)
+        self.assertCounts(self.user, 2, 1)
+
+        response = self.client.patch(
+            reverse('post-detail', kwargs={'pk': self.post.pk}), {'topic': self.topic_url(self.other_topic.pk)}
+        )
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertCounts(self.topic, 1, 0)
+        self.assertCounts(self.other_topic, 1, 1)
+
+        self.client.delete(reverse('post-detail', kwargs={'pk': self.post.pk}))
+        self.assertCounts(self.other_topic, 0, 0)
+        self.assertCounts(self.user, 1, 0)
+
+    def test_counts_follow_bulk_writes(self):
+        data = [{'title': str(number), 'content': 'Black', 'topic': self.topic_url(self.topic.pk)} for number in range(3)]
+        self.client.post(reverse('post-bulk'), data, format='json')
+        self.assertCounts(self.topic, 4, 0)
+
+        response = self.client.post(reverse('post-publish-filtered'), {'topic': self.topic_url(self.topic.pk)})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertCounts(self.topic, 4, 4)
+        self.assertCounts(self.user, 4, 4)
+
+    def test_counts_are_exposed(self):
+        response = self.client.get(reverse('topic-detail', kwargs={'pk': self.topic.pk}))
+        self.assertEqual((1, 0), (response.data['post_count'], response.data['published_count']))
+        response = self.client.get(reverse('user-detail', kwargs={'pk': self.user.pk}))
+        self.assertEqual((1, 0), (response.data['post_count'], response.data['published_count']))
+
+    def test_saving_a_stale_instance_keeps_counts(self):
+        topic = Topic.objects.get(pk=self.topic.pk)
+        Post.objects.create(title='Drogon', user=self.user, topic=self.topic)
+        topic.name = 'Big dragons'
+        topic.save()
+        self.assertCounts(self.topic, 2, 0)
+
+    def test_saving_a_deferred_instance_updates_its_loaded_fields(self):
+        topic = Topic.objects.only('name', 'post_count').get(pk=self.topic.pk)
+        Post.objects.create(title='Drogon', user=self.user, topic=self.topic)
+        topic.name = 'Big dragons'
+        # A single UPDATE, without loading the deferred fields first.
+        with self.assertNumQueries(1):
+            topic.save()
+        self.assertEqual('Big dragons', Topic.objects.get(pk=self.topic.pk).name)
+        self.assertCounts(self.topic, 2, 0)
+
+    def test_saving_a_deleted_instance_inserts_it(self):
+        topic = Topic.objects.create(name='Direwolves')
+        Topic.objects.filter(pk=topic.pk).delete()
+        topic.save()
+        self.assertTrue(Topic.objects.filter(pk=topic.pk, name='Direwolves').exists())
+
+    def test_reconcile_post_counts(self):
+        Topic.objects.filter(pk=self.topic.pk).update(post_count=7)
+        User.objects.filter(pk=self.other_user.pk).update(published_count=3)
+        output = io.StringIO()
+        call_command('reconcile_post_counts', stdout=output)
+        self.assertIn('Topics: 1 row drifted, reconciled', output.getvalue())
+        self.assertIn('Users: 1 row drifted, reconciled', output.getvalue())
+        self.assertCounts(self.topic, 1, 0)
+        self.assertCounts(self.other_user, 0, 0)
+
+
+class TestProfilingMiddleware(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com')
+        cls.topic = Topic.objects.create(name='Dragons')
+        cls.post = Post.objects.create(title='Rhaegal', user=cls.user, topic=cls.topic)
+
+    def setUp(self):
+        cache.clear()
+
+    def server_timing(self, response):
+        timings = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, duration = entry.split(';')[:2]
+            timings[name] = float(duration[len('dur='):])
+        return timings
+
+    @override_settings(PROFILING_SECRET='Valyrian')
+    def test_profiled_on_request_header(self):
+        with self.assertLogs('app.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('topic-list'), HTTP_X_PROFILE='Valyrian')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        timings = self.server_timing(response)
+        self.assertEqual(['sql', 'serialize', 'reverse', 'render', 'total'], list(timings))
+        self.assertLessEqual(sum(timings[name] for name in ['sql', 'serialize', 'reverse', 'render']),
+                             timings['total'])
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(('GET', '/api/topics/', 200), (entry['method'], entry['path'], entry['status']))
+        self.assertEqual(2, len(entry['queries']))
+        self.assertIn('app_topic', entry['queries'][-2]['sql'])
+
+    def test_not_profiled_by_default(self):
+        response = self.client.get(reverse('topic-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_profiled_when_sampled(self):
+        with self.assertLogs('app.profiling', 'INFO'):
+            response = self.client.get(reverse('post-detail', kwargs={'pk': self.post.pk}))
+        self.assertTrue(response.has_header('Server-Timing'))
+
+    @override_settings(PROFILING_HEADER=None, PROFILING_SECRET='Valyrian')
+    def test_header_can_be_ignored(self):
+        response = self.client.get(reverse('topic-list'), HTTP_X_PROFILE='Valyrian')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PROFILING_SECRET='Valyrian')
+    def test_header_needs_the_secret(self):
+        for value in ['1', 'valyrian']:
+            response = self.client.get(reverse('topic-list'), HTTP_X_PROFILE=value)
+            self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_header_without_secret_is_ignored(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('topic-list'), HTTP_X_PROFILE='1')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_header_of_staff_users(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.client.force_login(self.user)
+        with self.assertLogs('app.profiling', 'INFO'):
+            response = self.client.get(reverse('topic-list'), HTTP_X_PROFILE='1')
+        self.assertTrue(response.has_header('Server-Timing'))
+
+
+class TestMetrics(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com')
+        cls.topic = Topic.objects.create(name='Dragons')
+
+    def setUp(self):
+        cache.clear()
+
+    def scrape(self):
+        with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(metrics.CONTENT_TYPE, response['Content-Type'])
+        return response.content.decode('utf-8')
+
+    @staticmethod
+    def sample(text, name):
+        for line in text.splitlines():
+            if line.startswith(name + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+
+    def test_requests_are_counted_by_viewset_action_and_status(self):
+        name = 'api_requests_total{viewset="TopicViewSet",action="list",status="200"}'
+        before = self.sample(self.scrape(), name)
+        self.client.get(reverse('topic-list'))
+        self.client.get(reverse('topic-list'))
+        text = self.scrape()
+        self.assertEqual(before + 2, self.sample(text, name))
+        self.assertIn('# TYPE api_request_duration_seconds histogram', text)
+        self.assertIn('api_request_duration_seconds_bucket{viewset="TopicViewSet",action="list",le="+Inf"}', text)
+        self.assertIn('api_request_queries_bucket{viewset="TopicViewSet",action="list",le="5"}', text)
+        self.assertIn('api_request_query_duration_seconds_count{viewset="TopicViewSet",action="list"}', text)
+
+    def test_cache_lookups(self):
+        text = self.scrape()
+        hits = self.sample(text, 'api_cache_lookups_total{model="topic",result="hit"}')
+        misses = self.sample(text, 'api_cache_lookups_total{model="topic",result="miss"}')
+        self.client.get(reverse('topic-detail', kwargs={'pk': self.topic.pk}))
+        self.client.get(reverse('topic-detail', kwargs={'pk': self.topic.pk}))
+        text = self.scrape()
+        self.assertEqual(hits + 1, self.sample(text, 'api_cache_lookups_total{model="topic",result="hit"}'))
+        self.assertEqual(misses + 1, self.sample(text, 'api_cache_lookups_total{model="topic",result="miss"}'))
+
+    def test_processes_are_added_up_from_files(self):
+        processes = []
+        for _ in range(2):
+            registry = metrics.Registry()
+            counter = registry.counter('jobs_total', 'Jobs "done".\nPer queue.', ('queue',))
+            histogram = registry.histogram('job_seconds', 'Job duration.', buckets=(0.1, 1.0))
+            counter.inc(('a\\b "c"',), 2)
+            histogram.observe((), 0.5)
+            processes.append(registry)
+        processes[1].counter('only_here_total', 'Only in one process.').inc()
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROCESS_DIR=directory):
+            for registry in processes:
+                registry.flush(force=True)
+            text = processes[0].exposition()
+
+        self.assertIn('# HELP jobs_total Jobs "done".\\nPer queue.\n', text)
+        self.assertIn('jobs_total{queue="a\\\\b \\"c\\""} 4\n', text)
+        self.assertIn('job_seconds_bucket{le="0.1"} 0\n', text)
+        self.assertIn('job_seconds_bucket{le="1.0"} 2\n', text)
+        self.assertIn('job_seconds_bucket{le="+Inf"} 2\n', text)
+        self.assertIn('job_seconds_sum 1.0\n', text)
+        self.assertIn('job_seconds_count 2\n', text)
+        self.assertIn('only_here_total 1\n', text)
+
+    def test_scrape_is_limited_to_allowed_addresses_and_staff(self):
+        # No address is allowed by default, not even local ones: they may be a proxy's.
+        for address in ['127.0.0.1', '203.0.113.7']:
+            response = self.client.get(reverse('metrics'), REMOTE_ADDR=address)
+            self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    @override_settings(METRICS_ALLOWED_IPS=['203.0.113.7'])
+    def test_scrape_from_an_allowed_address(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+    def test_flush_failure_does_not_fail_the_request(self):
+        with tempfile.TemporaryDirectory() as directory:
+            missing = os.path.join(directory, 'missing')
+            with override_settings(METRICS_MULTIPROCESS_DIR=missing), self.assertLogs('app.metrics', 'ERROR'):
+                metrics.registry.flushed = 0.0
+                response = self.client.get(reverse('topic-list'))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    def test_flush_leaves_no_temporary_file(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROCESS_DIR=directory):
+            registry = metrics.Registry()
+            registry.counter('jobs_total', 'Jobs done.').inc()
+            registry.flush(force=True)
+            registry.flush(force=True)
+            self.assertEqual([os.path.basename(registry.path)], os.listdir(directory))
+
+
+class TestReplicaRouting(APITransactionTestCase):
+    """
+    The replica is an SQLite file copied from the primary when the test starts, so rows
+    created afterwards tell which database served a request.
+    """
+
+    def setUp(self):
+        cache.clear()
+        routers._down.clear()
+        self.user = User.objects.create(username='user', email='test@test.com')
+        self.topic = Topic.objects.create(name='Dragons')
+        self.post = Post.objects.create(title='Drogon', user=self.user, topic=self.topic, status='published')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def add_replica(self, name=None, weight=1):
+        if name is None:
+            name = os.path.join(self.directory, 'replica.sqlite3')
+            replica = sqlite3.connect(name)
+            connection.ensure_connection()
+            connection.connection.backup(replica)
+            replica.close()
+        connections.databases['replica'] = dict(connections.databases['default'], NAME=name)
+        self.addCleanup(self.remove_replica)
+        replicas = override_settings(DATABASE_REPLICAS={'replica': weight})
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+
+    @staticmethod
+    def remove_replica():
+        connections['replica'].close()
+        del connections._connections.replica
+        del connections.databases['replica']
+
+    def test_reads_open_to_everybody_go_to_the_replica(self):
+        self.add_replica()
+        post = Post.objects.create(title='Rhaegal', user=self.user, topic=self.topic)
+
+        self.assertEqual(status.HTTP_404_NOT_FOUND, self.client.get(reverse('post-detail', args=[post.pk])).status_code)
+        response = self.client.get(reverse('post-list'))
+        self.assertEqual(['Drogon'], [item['title'] for item in response.data['results']])
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_reads_after_a_write_go_to_the_primary(self):
+        self.add_replica()
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('post-list'), {
+            'title': 'Rhaegal', 'content': 'Green', 'topic': reverse('topic-detail', args=[self.topic.pk]),
+        }, format='json')
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(settings.REPLICA_PIN_SECONDS, cookie['max-age'])
+
+        url = response.data['url']
+        self.assertEqual(status.HTTP_200_OK, self.client.get(url).status_code)
+        self.assertEqual(2, len(self.client.get(reverse('post-list')).data['results']))
+
+        # Once the cookie expired, reads go to the replica again.
+        del self.client.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(status.HTTP_404_NOT_FOUND, self.client.get(url).status_code)
+
+    def test_unreachable_replica_is_skipped(self):
+        self.add_replica(name=os.path.join(self.directory, 'missing', 'replica.sqlite3'))
+        post = Post.objects.create(title='Rhaegal', user=self.user, topic=self.topic)
+
+        self.assertEqual(status.HTTP_200_OK, self.client.get(reverse('post-detail', args=[post.pk])).status_code)
+        self.assertIn('replica', routers._down)
+
+    def test_replica_without_weight_is_not_read(self):
+        self.add_replica(weight=0)
+        post = Post.objects.create(title='Rhaegal', user=self.user, topic=self.topic)
+
+        self.assertEqual(status.HTTP_200_OK, self.client.get(reverse('post-detail', args=[post.pk])).status_code)
+
+
+class TestTopicFeed(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='test@test.com')
+        cls.topic = Topic.objects.create(name='Dragons')
+        cls.other_topic = Topic.objects.create(name='Wolves')
+        cls.drogon = Post.objects.create(title='Drogon', content='Black', user=cls.user, topic=cls.topic,
+                                         status='published')
+        cls.rhaegal = Post.objects.create(title='Rhaegal', content='Green', user=cls.user, topic=cls.topic,
+                                          status='published')
+        cls.draft = Post.objects.create(title='Viserion', content='White', user=cls.user, topic=cls.topic)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def feed(self, topic=None, **params):
+        response = self.client.get(reverse('topic-feed', kwargs={'pk': (topic or self.topic).pk}), params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return response
+
+    def titles(self, topic=None):
+        return [item['title'] for item in self.feed(topic).data['results']]
+
+    def test_published_posts_newest_first(self):
+        response = self.feed()
+        self.assertEqual(['Rhaegal', 'Drogon'], [item['title'] for item in response.data['results']])
+        self.assertEqual(
+            self.client.get(reverse('post-detail', kwargs={'pk': self.rhaegal.pk})).data, response.data['results'][0]
+        )
+
+    def test_page_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.feed()
+
+    def test_pages_follow_the_cursor(self):
+        response = self.feed(page_size=1)
+        self.assertEqual(['Rhaegal'], [item['title'] for item in response.data['results']])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(['Drogon'], [item['title'] for item in response.data['results']])
+        self.assertIsNone(response.data['next'])
+
+    def test_publish_adds_the_post_on_top(self):
+        self.client.post(reverse('post-publish', kwargs={'pk': self.draft.pk}))
+        self.assertEqual(['Viserion', 'Rhaegal', 'Drogon'], self.titles())
+
+    def test_edits_are_copied_and_keep_the_position(self):
+        self.client.patch(reverse('post-detail', kwargs={'pk': self.drogon.pk}), {'title': 'Drogon the Dread'})
+        self.assertEqual(['Rhaegal', 'Drogon the Dread'], self.titles())
+
+    def test_moving_a_post_moves_it_to_the_other_feed(self):
+        self.client.patch(reverse('post-detail', kwargs={'pk': self.drogon.pk}), {
+            'topic': reverse('topic-detail', kwargs={'pk': self.other_topic.pk}),
+        })
+        self.assertEqual(['Rhaegal'], self.titles())
+        self.assertEqual(['Drogon'], self.titles(self.other_topic))
+
+    def test_unpublished_and_deleted_posts_leave_the_feed(self):
+        self.client.patch(reverse('post-detail', kwargs={'pk': self.drogon.pk}), {'status': 'draft'})
+        self.client.delete(reverse('post-detail', kwargs={'pk': self.rhaegal.pk}))
+        self.assertEqual([], self.titles())
+
+    def test_bulk_publish_fills_the_feed(self):
+        Post.objects.filter(pk=self.draft.pk).update(status='published')
+        self.assertIn('Viserion', self.titles())
+
+    def test_unknown_topic(self):
+        response = self.client.get(reverse('topic-feed', kwargs={'pk': self.other_topic.pk + 100}))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        response = self.client.get('/api/topics/dragons/feed/')
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+        self.assertEqual([], self.titles(self.other_topic))
@@ -1,4 +1,4 @@
-from .views import UserViewSet, PostViewSet, TopicViewSet
+from .views import UserViewSet, PostViewSet, TopicViewSet, metrics
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 
@@ -10,5 +10,6 @@ blog_api.register(r'topics', TopicViewSet, 'topic')
 
 urlpatterns = [
     path('', include(blog_api.urls)),
+    path('metrics/', metrics, name='metrics'),
     path('auth/', include('rest_framework.urls')),
 ]
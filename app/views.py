@@ -1,13 +1,25 @@
-from django.db.models import Q
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, ValidationError as DjangoValidationError
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, permissions, serializers
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from .models import User, Post, Topic
+from . import bulk, cache, export, metrics as api_metrics
+from .mixins import CachedRetrieveMixin, ConditionalGetMixin, ReaderListMixin, ReplicaReadMixin
+from .models import User, Post, Topic, FeedEntry, POST_STATUS_CHOICES
+from .pagination import (
+    PostCursorPagination, UserCursorPagination, TopicCursorPagination, FeedCursorPagination, SearchResultsPagination
+)
 from .permissions import IsOwnerOrAdmin, IsSelfUserOrAdmin
-from .serializers import UserSerializer, PostSerializer, TopicSerializer
+from .profiling import phase
+from .readers import FeedReader, PostListReader, TopicListReader, UserListReader
+from .search import search_posts
+from .serializers import UserSerializer, PostSerializer, TopicSerializer, PublishFilterSerializer
 
 
 # Just a single response that can be used for the index page if this Blog had a front-end
@@ -15,9 +27,23 @@ def index(request):
     return HttpResponse("Welcome to the Blog")
 
 
-class UserViewSet(viewsets.ModelViewSet):
+# Scrape endpoint of the metrics registry, in the Prometheus text exposition format, for
+# the scrapers of settings.METRICS_ALLOWED_IPS and staff users logged in with a session.
+def metrics(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(api_metrics.registry.exposition(), content_type=api_metrics.CONTENT_TYPE)
+
+
+class UserViewSet(ReplicaReadMixin, ConditionalGetMixin, CachedRetrieveMixin, ReaderListMixin,
+                  viewsets.ModelViewSet):
     serializer_class = UserSerializer
+    list_reader_class = UserListReader
+    # Lists read the nested posts with UserListReader, a single user reads its first posts
+    # with one narrow LIMIT query (UserPostSerializer), never all of them.
     queryset = User.objects.all()
+    pagination_class = UserCursorPagination
+    embedded_relation = 'posts'
     lookup_field = 'pk'
 
     def get_permissions(self):
@@ -32,15 +58,24 @@ class UserViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ReplicaReadMixin, ConditionalGetMixin, CachedRetrieveMixin, ReaderListMixin,
+                  viewsets.ModelViewSet):
     serializer_class = PostSerializer
+    list_reader_class = PostListReader
     lookup_field = 'pk'
 
+    @property
+    def pagination_class(self):
+        request = getattr(self, 'request', None)
+        if request is not None and request.GET.get('q') is not None:
+            return SearchResultsPagination
+        return PostCursorPagination
+
     def get_permissions(self):
 
         # Instantiates and returns the list of permissions that this view requires.
 
-        if self.action == 'list' or self.action == 'retrieve':
+        if self.action == 'list' or self.action == 'retrieve' or self.action == 'export_posts':
             permission_classes = [permissions.AllowAny]
         elif self.action == 'update' or self.action == 'partial_update' or self.action == 'destroy':
             permission_classes = [IsOwnerOrAdmin]
@@ -48,46 +83,145 @@ class PostViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
 
-    # Override of the basic get_queryset method in order to provide option for search.
+    # Override of the basic get_queryset method in order to provide option for search,
+    # for filtering by status and by topic or user (the "rest of the posts" links of topics and users).
     # DRF also provides filter search.
     def get_queryset(self):
         queryset = Post.objects.all()
+        post_status = self.request.GET.get('status')
+        if post_status is not None:
+            if post_status not in dict(POST_STATUS_CHOICES):
+                raise serializers.ValidationError({'status': '"{}" is not a valid choice.'.format(post_status)})
+            queryset = queryset.filter(status=post_status)
+        for param in ('topic', 'user'):
+            value = self.request.GET.get(param)
+            if value is not None:
+                if not value.isdecimal():
+                    raise serializers.ValidationError({param: 'A valid integer is required.'})
+                queryset = queryset.filter(**{param: int(value)})
         qs = self.request.GET.get("q")
         if qs is not None:
-            queryset = queryset.filter(
-                Q(title__icontains=qs) |
-                Q(content__icontains=qs)).distinct()
+            queryset = search_posts(queryset, qs)
         return queryset
 
     # This is direct publish url. Without this method, status can be updated via PUT/PATCH
+    # Publishing is a single conditional UPDATE, so concurrent publishes of the same post are
+    # race free and the post is never loaded on success.
     @action(methods=['post'], detail=True, permission_classes=[permissions.IsAuthenticated], url_path='publish',
             url_name='publish')
     def post_publish(self, request, pk=None):
-        post = get_object_or_404(Post, pk=pk)
+        try:
+            pk = Post._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise Http404
         user = request.user
 
-        if post.user != user:
-            raise serializers.ValidationError('You can not publish posts that are not yours')
-        if post.status == 'publish':
+        published = Post.objects.filter(pk=pk, user=user).exclude(status='published').update(
+            status='published', modified=timezone.now()
+        )
+        if not published:
+            # Only a failed publish needs to know why it failed.
+            post = get_object_or_404(Post.objects.only('user_id', 'status'), pk=pk)
+            if post.user_id != user.pk:
+                raise serializers.ValidationError('You can not publish posts that are not yours')
             raise serializers.ValidationError('This post is already published')
 
-        post.status = 'publish'
-        post.save()
+        # The cached topic is keyed by its conditional GET validators, which cover the
+        # modified time of its posts, so the topic does not have to be looked up here.
+        cache.invalidate(('post', pk), ('user', user.pk))
         return Response(data=["Post published"], status=200)
 
+    # Publishes all draft posts of a topic and/or created in a date range, see app/bulk.py.
+    @action(methods=['post'], detail=False, url_path='publish-filtered', url_name='publish-filtered')
+    def publish_filtered(self, request):
+        filters = PublishFilterSerializer(data=request.data, context={'request': request})
+        filters.is_valid(raise_exception=True)
+        published = bulk.publish_filtered(request, filters.validated_data)
+        return Response(data={'published': published}, status=200)
+
+    # Streams all posts matching the list filters and a modified_after/modified_before range
+    # (for incremental exports) as NDJSON or CSV, in constant memory. See app/export.py.
+    @action(methods=['get'], detail=False, url_path='export', url_name='export')
+    def export_posts(self, request):
+        output = request.GET.get('output', 'ndjson')
+        if output not in export.EXPORT_FORMATS:
+            raise serializers.ValidationError({'output': '"{}" is not a valid choice.'.format(output)})
+
+        queryset = self.get_queryset()
+        for param, lookup in (('modified_after', 'modified__gte'), ('modified_before', 'modified__lt')):
+            value = request.GET.get(param)
+            if value is not None:
+                try:
+                    moment = parse_datetime(value)
+                except ValueError:
+                    moment = None
+                if moment is None:
+                    raise serializers.ValidationError({param: 'Datetime has wrong format.'})
+                if timezone.is_naive(moment):
+                    moment = timezone.make_aware(moment)
+                queryset = queryset.filter(**{lookup: moment})
+
+        response = StreamingHttpResponse(
+            export.export(request, queryset.order_by('modified', 'pk'), output),
+            content_type=export.EXPORT_FORMATS[output]
+        )
+        response['Content-Disposition'] = 'attachment; filename="posts.{}"'.format(output)
+        return response
+
+    # Batch endpoints for importers: POST creates and PATCH updates a list of posts, in one
+    # transaction. Every item gets its own result, see app/bulk.py.
+    @action(methods=['post', 'patch'], detail=False, url_path='bulk', url_name='bulk')
+    def bulk_write(self, request):
+        items = bulk.get_items(request.data)
+        if request.method == 'POST':
+            results = bulk.create_posts(request, items)
+        else:
+            results = bulk.update_posts(request, items)
+        return Response(data={'results': results}, status=200)
 
-class TopicViewSet(viewsets.ModelViewSet):
+    @action(methods=['post'], detail=False, url_path='bulk-publish', url_name='bulk-publish')
+    def bulk_publish(self, request):
+        results = bulk.publish_posts(request, bulk.get_items(request.data))
+        return Response(data={'results': results}, status=200)
+
+
+class TopicViewSet(ReplicaReadMixin, ConditionalGetMixin, CachedRetrieveMixin, ReaderListMixin,
+                   viewsets.ModelViewSet):
+    # Lists read the nested posts with TopicListReader, a single topic reads its first
+    # posts with one LIMIT query (TopicSerializer.get_posts): two queries either way, no
+    # matter how many posts there are.
     queryset = Topic.objects.all()
     serializer_class = TopicSerializer
+    list_reader_class = TopicListReader
+    pagination_class = TopicCursorPagination
+    embedded_relation = 'posts'
     lookup_field = 'pk'
+    replica_actions = ('list', 'retrieve', 'feed')
 
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
-        if self.action == 'retrieve' or self.action == 'list':
+        if self.action == 'retrieve' or self.action == 'list' or self.action == 'feed':
             permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [permissions.IsAdminUser]
 
         return [permission() for permission in permission_classes]
+
+    # Latest published posts of the topic, read from the feed table maintained on every
+    # post write (see app.models.FeedEntry): a page is one indexed query, whatever the
+    # number of posts. Only an empty first page checks that the topic exists.
+    @action(methods=['get'], detail=True, url_path='feed', url_name='feed', pagination_class=FeedCursorPagination)
+    def feed(self, request, pk=None):
+        try:
+            pk = Topic._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise Http404
+        reader = FeedReader(request, format=self.format_kwarg)
+        page = self.paginate_queryset(reader.get_queryset(FeedEntry.objects.filter(topic_id=pk)))
+        if not page and not request.query_params.get(self.paginator.cursor_query_param):
+            get_object_or_404(Topic.objects.only('pk'), pk=pk)
+        with phase('serialize'):
+            data = reader.to_representation(page)
+        return self.get_paginated_response(data)
@@ -0,0 +1,330 @@
+"""
+Latency, throughput and queries per request of every route of app.urls.blog_api.
+
+    python -m benchmarks.api --users 1000 --topics 1000 --posts 100000 --requests 200 --output results.json
+    python -m benchmarks.api --posts 100000 --compare results.json
+
+Every route is driven by one or more scenarios (a method, a path and a body), first
+through the Django test client in this process, then over HTTP through a local threaded
+WSGI server. A route without a scenario is an error, so new routes get benchmarked.
+Results (p50/p95/p99 in milliseconds, requests per second, queries per request and
+response statuses) are keyed by ``<mode> <route> <method> <label>``; --compare prints
+the p95 and query count changes against the results of an earlier run.
+"""
+import base64
+import collections
+import itertools
+import json
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import common
+
+ADMIN_USERNAME = 'bench-admin'
+ADMIN_PASSWORD = 'bench-admin-password'
+
+
+Scenario = collections.namedtuple('Scenario', 'route label method path body')
+
+
+class QueryCounter(object):
+    """
+    Execute wrapper counting the queries of every connection, including the ones opened
+    by the threads of the WSGI server.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        def add(sender, connection, **kwargs):
+            if self not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self)
+
+        connection_created.connect(add, weak=False)
+        for connection in connections.all():
+            add(None, connection)
+
+
+def route_names():
+    from app.urls import blog_api
+
+    return sorted({pattern.name for pattern in blog_api.urls if pattern.name})
+
+
+def fixtures(requests):
+    """
+    Picks the rows the scenarios read and write: enough drafts for every publish request
+    of both modes, objects to read in rotation so the detail cache does not serve
+    everything.
+    """
+    from app.models import Post, Topic, User
+
+    data = {
+        'users': list(User.objects.order_by('?').values_list('pk', flat=True)[:1000]),
+        'topics': list(Topic.objects.order_by('?').values_list('pk', flat=True)[:1000]),
+        'posts': list(Post.objects.order_by('?').values_list('pk', flat=True)[:1000]),
+        'unique': itertools.count(),
+    }
+
+    user = User.objects.filter(username=ADMIN_USERNAME).first()
+    if user is None:
+        user = User(username=ADMIN_USERNAME, email='{}@example.com'.format(ADMIN_USERNAME), is_staff=True)
+        user.set_password(ADMIN_PASSWORD)
+        user.save()
+    # Posts are published by their author only, and the publish-filtered scenario must not
+    # publish them first: the drafts are the admin's, in a topic of their own.
+    topic, _ = Topic.objects.get_or_create(name='Benchmark drafts')
+    Post.objects.bulk_create(
+        Post(user=user, topic=topic, title='Draft {}'.format(i), content='Benchmark draft') for i in range(requests * 11)
+    )
+    data['drafts'] = iter(Post.objects.filter(topic=topic, status='draft').values_list('pk', flat=True))
+    return data
+
+
+def build_scenarios(data):
+    def rotate(key, template):
+        return lambda i: template.format(data[key][i % len(data[key])])
+
+    def next_drafts(count):
+        return [pk for pk in itertools.islice(data['drafts'], count)]
+
+    def post_link(pk):
+        return 'http://testserver/api/posts/{}/'.format(pk)
+
+    def topic_link(i):
+        return 'http://testserver/api/topics/{}/'.format(data['topics'][i % len(data['topics'])])
+
+    def unique():
+        return next(data['unique'])
+
+    def new_post(i):
+        return {'title': 'Bench {}'.format(unique()), 'content': 'Benchmark post', 'topic': topic_link(i)}
+
+    def publish_path(i):
+        drafts = next_drafts(1) or [0]
+        return '/api/posts/{}/publish/'.format(drafts[0])
+
+    return [
+        Scenario('api-root', 'root', 'GET', lambda i: '/api/', None),
+        Scenario('user-list', 'first page', 'GET', lambda i: '/api/users/', None),
+        Scenario('user-list', 'signup', 'POST', lambda i: '/api/users/', lambda i: {
+            'first_name': 'Bench', 'last_name': 'Signup', 'password': 'bench-signup',
+            'email': 'signup{}-{}@example.com'.format(unique(), time.time()),
+        }),
+        Scenario('user-detail', 'rotating', 'GET', rotate('users', '/api/users/{}/'), None),
+        Scenario('topic-list', 'first page', 'GET', lambda i: '/api/topics/', None),
+        Scenario('topic-list', 'create', 'POST', lambda i: '/api/topics/', lambda i: {
+            'name': 'Bench topic {}-{}'.format(unique(), time.time()),
+        }),
+        Scenario('topic-detail', 'rotating', 'GET', rotate('topics', '/api/topics/{}/'), None),
+        Scenario('topic-feed', 'rotating', 'GET', rotate('topics', '/api/topics/{}/feed/'), None),
+        Scenario('post-list', 'first page', 'GET', lambda i: '/api/posts/', None),
+        Scenario('post-list', 'published', 'GET', lambda i: '/api/posts/?status=published', None),
+        Scenario('post-list', 'by topic', 'GET', rotate('topics', '/api/posts/?topic={}'), None),
+        Scenario('post-list', 'search', 'GET', lambda i: '/api/posts/?q=content%20topic', None),
+        Scenario('post-list', 'create', 'POST', lambda i: '/api/posts/', new_post),
+        Scenario('post-detail', 'rotating', 'GET', rotate('posts', '/api/posts/{}/'), None),
+        Scenario('post-detail', 'edit title', 'PATCH', rotate('posts', '/api/posts/{}/'), lambda i: {
+            'title': 'Edited {}'.format(unique()),
+        }),
+        Scenario('post-publish', 'next draft', 'POST', publish_path, None),
+        Scenario('post-publish-filtered', 'by topic', 'POST', lambda i: '/api/posts/publish-filtered/',
+                 lambda i: {'topic': topic_link(i)}),
+        Scenario('post-export', 'ndjson by topic', 'GET', rotate('topics', '/api/posts/export/?topic={}'), None),
+        Scenario('post-bulk', 'create 10', 'POST', lambda i: '/api/posts/bulk/',
+                 lambda i: [new_post(i) for _ in range(10)]),
+        Scenario('post-bulk', 'edit 10', 'PATCH', lambda i: '/api/posts/bulk/', lambda i: [
+            {'url': post_link(data['posts'][(i * 10 + n) % len(data['posts'])]), 'title': 'Bulk {}'.format(unique())}
+            for n in range(10)
+        ]),
+        Scenario('post-bulk-publish', 'next 10 drafts', 'POST', lambda i: '/api/posts/bulk-publish/',
+                 lambda i: [{'url': post_link(pk)} for pk in next_drafts(10)]),
+    ]
+
+
+def check_coverage(scenarios):
+    missing = set(route_names()) - {scenario.route for scenario in scenarios}
+    if missing:
+        raise SystemExit('No benchmark scenario for the routes: {}'.format(', '.join(sorted(missing))))
+
+
+def authorization():
+    credentials = '{}:{}'.format(ADMIN_USERNAME, ADMIN_PASSWORD).encode('utf-8')
+    return 'Basic {}'.format(base64.b64encode(credentials).decode('ascii'))
+
+
+def client_sender():
+    from django.test import Client
+
+    client = Client()
+
+    def send(method, path, body):
+        if method == 'GET':
+            response = client.get(path)
+        else:
+            response = client.generic(
+                method, path, json.dumps(body) if body is not None else '', content_type='application/json',
+                HTTP_AUTHORIZATION=authorization(),
+            )
+        # Consume streaming responses, the export is only done once it has been read.
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+    return send
+
+
+def wsgi_sender(base_url):
+    def send(method, path, body):
+        headers = {}
+        data = None
+        if method != 'GET':
+            headers = {'Content-Type': 'application/json', 'Authorization': authorization()}
+            data = json.dumps(body).encode('utf-8') if body is not None else b''
+        request = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code
+
+    return send
+
+
+def start_wsgi_server():
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+
+def run(scenario, send, requests, concurrency, counter):
+    def one(i):
+        body = scenario.body(i) if scenario.body is not None else None
+        start = time.perf_counter()
+        status = send(scenario.method, scenario.path(i), body)
+        return (time.perf_counter() - start) * 1000, status
+
+    queries_before = counter.count
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(one, range(requests)))
+    else:
+        outcomes = [one(i) for i in range(requests)]
+    elapsed = time.perf_counter() - start
+
+    result = common.percentiles([timing for timing, _ in outcomes])
+    result.update({
+        'requests': requests,
+        'requests_per_second': requests / elapsed,
+        'queries_per_request': (counter.count - queries_before) / float(requests),
+        'statuses': dict(collections.Counter(str(status) for _, status in outcomes)),
+    })
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, results):
+    print('\n{:<64} {:>10} {:>10} {:>8}'.format('change against previous run', 'p95 ms', 'was', 'queries'))
+    for key in sorted(results['results']):
+        if key not in previous.get('results', {}):
+            continue
+        now, before = results['results'][key], previous['results'][key]
+        print('{:<64} {:>10.1f} {:>10.1f} {:>+8.1f}'.format(
+            key, now['p95'], before['p95'], now['queries_per_request'] - before['queries_per_request']
+        ))
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--topics', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=50, help='Requests per scenario and mode')
+    parser.add_argument('--concurrency', type=int, default=4, help='Client threads against the WSGI server')
+    parser.add_argument('--modes', nargs='+', choices=['client', 'wsgi'], default=['client', 'wsgi'])
+    parser.add_argument('--routes', nargs='+', help='Only run the scenarios of these routes')
+    parser.add_argument('--no-seed', action='store_true', help='Reuse the data already in --database')
+    parser.add_argument('--compare', help='JSON results of an earlier run')
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+
+    from django.conf import settings
+
+    # Cheap hashes, the admin authenticates every write with basic auth.
+    settings.PASSWORD_HASH_ITERATIONS = 1000
+    if not args.no_seed:
+        common.seed(users=args.users, topics=args.topics, posts=args.posts)
+
+    counter = QueryCounter()
+    counter.install()
+    scenarios = build_scenarios(fixtures(args.requests * len(args.modes)))
+    check_coverage(scenarios)
+    if args.routes:
+        scenarios = [scenario for scenario in scenarios if scenario.route in args.routes]
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'users': args.users, 'topics': args.topics, 'posts': args.posts,
+            'requests': args.requests, 'concurrency': args.concurrency,
+        },
+        'results': {},
+    }
+    server = None
+    for mode in args.modes:
+        if mode == 'client':
+            send, concurrency = client_sender(), 1
+        else:
+            server, base_url = start_wsgi_server()
+            send, concurrency = wsgi_sender(base_url), args.concurrency
+        for scenario in scenarios:
+            key = '{} {} {} {}'.format(mode, scenario.route, scenario.method, scenario.label)
+            result = results['results'][key] = run(scenario, send, args.requests, concurrency, counter)
+            print('{:<64} p50 {p50:8.1f}  p95 {p95:8.1f}  p99 {p99:8.1f} ms  {requests_per_second:8.1f} req/s  '
+                  '{queries_per_request:6.1f} queries  {statuses}'.format(key, **result))
+    if server is not None:
+        server.shutdown()
+
+    common.write_results(args.output, results)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Load test of the read endpoints with many concurrent connections, served by one process
+in WSGI mode (a pool of --wsgi-threads threads, each connection holding one until its
+request is done) and in ASGI mode (app.asgi: connections wait in the event loop and
+--read-threads threads handle the requests).
+
+    python -m benchmarks.asgi --posts 10000 --latency-ms 20 --concurrency 1,32,256
+
+The local SQLite file answers in microseconds, so --latency-ms adds a sleep to every
+query to stand in for a database over the network. The default --wsgi-threads of 1 is a
+sync worker process (gunicorn's default worker class). Both modes call the same Django
+handler in process, there is no socket involved.
+"""
+import asyncio
+import io
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import common
+
+
+class Latency(object):
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self):
+        from django.db.backends.signals import connection_created
+
+        def add(sender, connection, **kwargs):
+            connection.execute_wrappers.append(self)
+
+        connection_created.connect(add, weak=False)
+
+
+def read_paths(post_pks, topic_pks, user_pks):
+    paths = ['/api/posts/', '/api/topics/', '/api/users/']
+    paths += ['/api/posts/{}/'.format(pk) for pk in post_pks[:50]]
+    paths += ['/api/topics/{}/'.format(pk) for pk in topic_pks[:20]]
+    paths += ['/api/users/{}/'.format(pk) for pk in user_pks[:20]]
+    return paths
+
+
+def scope(path):
+    return {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'http_version': '1.1',
+        'headers': [(b'host', b'localhost')], 'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+    }
+
+
+def run_wsgi(application, environ, paths, requests, concurrency, threads):
+    """
+    ``concurrency`` clients; a connection is only served once one of the ``threads`` of
+    the process is free, so the time spent waiting for a thread counts.
+    """
+    def one(path, submitted):
+        statuses = []
+        chunks = application(environ(scope(path), io.BytesIO()), lambda status, headers: statuses.append(status))
+        b''.join(chunks)
+        chunks.close()
+        return (time.perf_counter() - submitted) * 1000, statuses[0].split(' ', 1)[0]
+
+    # The clients send their next request once the previous one is answered, so at most
+    # ``concurrency`` requests are waiting at any time.
+    outcomes = []
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        cycle = itertools.cycle(paths)
+        start = time.perf_counter()
+        for _ in range(0, requests, concurrency):
+            batch = [executor.submit(one, next(cycle), time.perf_counter()) for _ in range(concurrency)]
+            outcomes.extend(future.result() for future in batch)
+        elapsed = time.perf_counter() - start
+    return outcomes, elapsed
+
+
+async def run_asgi(application, paths, requests, concurrency):
+    cycle = itertools.cycle(paths)
+    outcomes = []
+
+    async def client():
+        for _ in range(requests // concurrency):
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                messages.append(message)
+
+            start = time.perf_counter()
+            await application(scope(next(cycle)), receive, send)
+            outcomes.append(((time.perf_counter() - start) * 1000, str(messages[0]['status'])))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return outcomes, time.perf_counter() - start
+
+
+def summary(outcomes, elapsed):
+    result = common.percentiles([timing for timing, _ in outcomes])
+    result['requests_per_second'] = len(outcomes) / elapsed
+    result['errors'] = sum(1 for _, status in outcomes if not status.startswith('2'))
+    return result
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=1024)
+    parser.add_argument('--concurrency', default='1,32,256')
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--wsgi-threads', type=int, default=1)
+    parser.add_argument('--read-threads', type=int, default=None, help='ASGI_READ_THREADS by default')
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+    user_pks, topic_pks = common.seed(users=100, topics=50, posts=args.posts)
+
+    from django.core.handlers.wsgi import WSGIHandler
+    from app.asgi import ASGIHandler
+    from app.models import Post
+
+    post_pks = list(Post.objects.order_by('pk').values_list('pk', flat=True)[:50])
+    paths = read_paths(post_pks, list(topic_pks), list(user_pks))
+    Latency(args.latency_ms / 1000.0).install()
+
+    asgi = ASGIHandler(read_threads=args.read_threads)
+    wsgi = WSGIHandler()
+    results = {}
+    try:
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            requests = max(concurrency, args.requests // concurrency * concurrency)
+            for mode, (outcomes, elapsed) in [
+                ('wsgi', run_wsgi(wsgi, asgi.environ, paths, requests, concurrency, args.wsgi_threads)),
+                ('asgi', asyncio.run(run_asgi(asgi, paths, requests, concurrency))),
+            ]:
+                result = results['{} c={}'.format(mode, concurrency)] = summary(outcomes, elapsed)
+                print('{:<4} concurrency {:>4}: {:>8.1f} requests/s  p50 {:>8.2f} ms  p99 {:>8.2f} ms  '
+                      'errors {}'.format(mode, concurrency, result['requests_per_second'], result['p50'],
+                                         result['p99'], result['errors']))
+    finally:
+        asgi.shutdown()
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Throughput of the bulk post endpoints against one request per post.
+
+    python -m benchmarks.bulk_posts --posts 10000
+
+Creates, updates and publishes ``--posts`` posts through the single-object endpoints
+and through the bulk endpoints (in batches of ``--batch-size``), with the DRF test
+client.
+"""
+import time
+
+from benchmarks import common
+
+
+def run(label, posts, function):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print('{:<28} {:8.2f} s {:10.0f} posts/s'.format(label, elapsed, posts / elapsed))
+    return {'seconds': elapsed, 'posts_per_second': posts / elapsed}
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+
+    from rest_framework.test import APIClient
+    from app.models import User, Topic, Post
+
+    user = User.objects.create(username='importer', email='importer@example.com')
+    topic = Topic.objects.create(name='Imports')
+    topic_url = 'http://testserver/api/topics/{}/'.format(topic.pk)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def item(i):
+        return {'title': 'Post {}'.format(i), 'content': 'Imported content {}'.format(i), 'topic': topic_url}
+
+    def batches(items):
+        for start in range(0, len(items), args.batch_size):
+            yield items[start:start + args.batch_size]
+
+    results = {}
+
+    def single_create():
+        for i in range(args.posts):
+            assert client.post('/api/posts/', item(i), format='json').status_code == 201
+
+    results['single create'] = run('single create', args.posts, single_create)
+    single_urls = ['http://testserver/api/posts/{}/'.format(pk) for pk in Post.objects.values_list('pk', flat=True)]
+
+    def single_update():
+        for url in single_urls:
+            assert client.patch(url, {'title': 'Updated'}, format='json').status_code == 200
+
+    def single_publish():
+        for url in single_urls:
+            assert client.post(url + 'publish/').status_code == 200
+
+    results['single update'] = run('single update', args.posts, single_update)
+    results['single publish'] = run('single publish', args.posts, single_publish)
+
+    created = []
+
+    def bulk_create():
+        for batch in batches([item(i) for i in range(args.posts)]):
+            response = client.post('/api/posts/bulk/', batch, format='json')
+            created.extend(result['url'] for result in response.data['results'])
+
+    def bulk_update():
+        for batch in batches([{'url': url, 'title': 'Updated'} for url in created]):
+            client.patch('/api/posts/bulk/', batch, format='json')
+
+    def bulk_publish():
+        for batch in batches([{'url': url} for url in created]):
+            client.post('/api/posts/bulk-publish/', batch, format='json')
+
+    results['bulk create'] = run('bulk create', args.posts, bulk_create)
+    results['bulk update'] = run('bulk update', args.posts, bulk_update)
+    results['bulk publish'] = run('bulk publish', args.posts, bulk_publish)
+
+    common.write_results(args.output, {'posts': args.posts, 'batch_size': args.batch_size, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
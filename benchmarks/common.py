@@ -0,0 +1,147 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Benchmarks never touch the database configured in blog/settings.py: setup() points the
+default connection at a scratch SQLite file (or the file given with --database) before
+Django is set up.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+
+
+def argument_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--database', help='SQLite file to run against, a temporary one by default')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    return parser
+
+
+def setup(database=None):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog.settings')
+    from django.conf import settings
+
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(prefix='blog-bench-'), 'db.sqlite3')
+    settings.DATABASES['default']['NAME'] = database
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+    django.setup()
+    return database
+
+
+def migrate(target=None):
+    """
+    Migrates the database, to migration ``target`` of the app if given, and returns the
+    apps registry of the migrated state: seed with its models when the schema is older
+    than the models of the tree.
+    """
+    from django.core.management import call_command
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    if target is None:
+        call_command('migrate', verbosity=0)
+    else:
+        call_command('migrate', 'app', target, verbosity=0)
+    loader = MigrationExecutor(connection).loader
+    return loader.project_state(sorted(loader.applied_migrations)).apps
+
+
+@contextmanager
+def explicit_timestamps(model):
+    """
+    Lets seeded rows carry their own ``created``/``modified`` values instead of now(), so
+    the data is spread over time like a real blog.
+    """
+    fields = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now', False) or
+              getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def seed(users=100, topics=50, posts=1000, published_ratio=0.3, batch_size=5000, seed_value=0, apps=None):
+    """
+    Bulk inserts a synthetic dataset and returns ``(user_pks, topic_pks)``. Posts are spread
+    over the last year, ``published_ratio`` of them are published. ``apps`` is the registry
+    of the models to insert, as returned by migrate(), the models of the tree by default.
+
+    Django 2.2 uses an explicit bulk_create batch_size as is, ignoring SQLite's limit on
+    query parameters, so ``batch_size`` only chunks the objects held in memory.
+    """
+    from django.apps import apps as installed_apps
+    from django.utils import timezone
+
+    apps = apps or installed_apps
+    User, Topic, Post = (apps.get_model('app', name) for name in ('User', 'Topic', 'Post'))
+    rand = random.Random(seed_value)
+    now = timezone.now()
+
+    user_start = User.objects.count()
+    User.objects.bulk_create(
+        (User(username='bench{}'.format(i), email='bench{}@example.com'.format(i), first_name='Bench',
+              last_name=str(i)) for i in range(user_start, user_start + users))
+    )
+    Topic.objects.bulk_create(
+        (Topic(name='Topic {}'.format(i)) for i in range(Topic.objects.count(), Topic.objects.count() + topics))
+    )
+    user_pks = list(User.objects.values_list('pk', flat=True))
+    topic_pks = list(Topic.objects.values_list('pk', flat=True))
+
+    with explicit_timestamps(Post):
+        for start in range(0, posts, batch_size):
+            batch = []
+            for i in range(start, min(start + batch_size, posts)):
+                created = now - timedelta(seconds=rand.randrange(365 * 24 * 3600))
+                batch.append(Post(
+                    user_id=rand.choice(user_pks),
+                    topic_id=rand.choice(topic_pks),
+                    title='Post {}'.format(i),
+                    content='Content of post {} about topic {}'.format(i, rand.randrange(1000)),
+                    status='published' if rand.random() < published_ratio else 'draft',
+                    created=created,
+                    modified=created,
+                ))
+            Post.objects.bulk_create(batch)
+    return user_pks, topic_pks
+
+
+def timed(function, repeat=5):
+    """
+    Runs ``function`` ``repeat`` times and returns its median wall time in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def percentiles(timings):
+    ordered = sorted(timings)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99)}
+
+
+def write_results(path, results):
+    if path:
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True, default=str)
@@ -0,0 +1,100 @@
+"""
+Per request latency with and without the connection pool of app.db.pool, through the
+Django handler, from one thread and from --threads threads (a threaded WSGI worker).
+
+    python -m benchmarks.db_pool --posts 10000 --requests 2000 --threads 8
+
+With CONN_MAX_AGE = 0 every request connects to the database and closes the connection
+when it finishes, unless the pool hands it a connection of an earlier request.
+"""
+import io
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import common
+
+
+def paths(post_pks, topic_pks):
+    # Detail responses are cached after the first request, which leaves mostly the
+    # validator query and the connection: the case where connecting weighs the most.
+    return (['/api/posts/{}/'.format(pk) for pk in post_pks] +
+            ['/api/topics/{}/'.format(pk) for pk in topic_pks] + ['/api/posts/', '/api/topics/'])
+
+
+def environ(path):
+    return {
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.multithread': True,
+        'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+
+
+def run(application, paths, requests, threads):
+    def one(path):
+        statuses = []
+        start = time.perf_counter()
+        chunks = application(environ(path), lambda status, headers: statuses.append(status))
+        b''.join(chunks)
+        chunks.close()
+        assert statuses[0].startswith('200'), statuses[0]
+        return (time.perf_counter() - start) * 1000
+
+    cycle = itertools.cycle(paths)
+    selected = [next(cycle) for _ in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        timings = list(executor.map(one, selected))
+    result = common.percentiles(timings)
+    result['requests_per_second'] = requests / (time.perf_counter() - start)
+    return result
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+    common.seed(users=100, topics=50, posts=args.posts)
+
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connection
+    from app.models import Post, Topic
+
+    post_pks = list(Post.objects.order_by('pk').values_list('pk', flat=True)[:50])
+    topic_pks = list(Topic.objects.order_by('pk').values_list('pk', flat=True)[:20])
+    connection.close()
+
+    pool_settings = settings.DATABASES['default']['POOL']
+    size = pool_settings['SIZE'] or args.threads
+    application = WSGIHandler()
+    selected = paths(post_pks, topic_pks)
+    # Fill the response cache, both modes then serve the same work.
+    run(application, selected, len(selected), 1)
+
+    results = {}
+    for mode, pool_size in [('unpooled', 0), ('pooled', size)]:
+        pool_settings['SIZE'] = pool_size
+        for threads in sorted({1, args.threads}):
+            result = results['{} threads={}'.format(mode, threads)] = run(application, selected, args.requests, threads)
+            print('{:<8} threads {:>3}: p50 {:>7.3f} ms  p95 {:>7.3f} ms  p99 {:>7.3f} ms  {:>8.1f} requests/s'.format(
+                mode, threads, result['p50'], result['p95'], result['p99'], result['requests_per_second']))
+
+    # The cost the pool saves: opening a Django SQLite connection, functions included.
+    pool_settings['SIZE'] = 0
+    unpooled = common.timed(lambda: (connection.ensure_connection(), connection.close()), args.requests) * 1000
+    pool_settings['SIZE'] = size
+    pooled = common.timed(lambda: (connection.ensure_connection(), connection.close()), args.requests) * 1000
+    results['connect_close_us'] = {'unpooled': unpooled, 'pooled': pooled}
+    print('connect + close: {:.1f} us unpooled, {:.1f} us pooled'.format(unpooled, pooled))
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
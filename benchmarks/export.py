@@ -0,0 +1,70 @@
+"""
+Memory use and throughput of the streaming post export.
+
+    python -m benchmarks.export --posts 1000000 --output-format ndjson
+
+Streams the whole table through the export endpoint with the Django test client and
+samples the resident set size of the process while doing so. RSS should stay flat
+however many posts are exported.
+"""
+import os
+import resource
+import time
+
+from benchmarks import common
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024.0 / 1024.0
+    except (IOError, OSError):
+        # Peak instead of current RSS outside of Linux (kilobytes on Linux, bytes on macOS).
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--output-format', choices=['ndjson', 'csv'], default='ndjson')
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+    common.seed(users=1000, topics=100, posts=args.posts)
+
+    from django.test import Client
+
+    client = Client()
+    start_rss = rss_mb()
+    samples = []
+    exported = 0
+    size = 0
+    start = time.perf_counter()
+    response = client.get('/api/posts/export/', {'output': args.output_format})
+    for index, chunk in enumerate(response.streaming_content):
+        exported += chunk.count(b'\n')
+        size += len(chunk)
+        if index % 50 == 0:
+            samples.append(rss_mb())
+    elapsed = time.perf_counter() - start
+    samples.append(rss_mb())
+
+    results = {
+        'posts': args.posts,
+        'lines': exported,
+        'megabytes': size / 1024.0 / 1024.0,
+        'seconds': elapsed,
+        'rows_per_second': exported / elapsed,
+        'rss_start_mb': start_rss,
+        'rss_max_mb': max(samples),
+        'rss_end_mb': samples[-1],
+    }
+    for key in sorted(results):
+        print('{:<16} {:.2f}'.format(key, results[key]))
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
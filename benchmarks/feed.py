@@ -0,0 +1,51 @@
+"""
+First page latency of the topic feeds (app.models.FeedEntry) as the number of posts
+grows, next to the post list filtered by topic and status.
+
+    python -m benchmarks.feed --posts 10000,100000 --requests 200
+
+The dataset grows in place: each size adds the missing posts to the previous one.
+"""
+import itertools
+
+from benchmarks import common
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', default='10000,100000')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+
+    from django.test import Client
+    from app.models import Post, Topic
+
+    client = Client()
+    results = {}
+    seeded = 0
+    for size in [int(value) for value in args.posts.split(',')]:
+        common.seed(users=100, topics=50, posts=size - seeded, seed_value=size)
+        seeded = size
+        topics = itertools.cycle(Topic.objects.values_list('pk', flat=True))
+
+        def get(template):
+            def one():
+                response = client.get(template.format(next(topics)))
+                assert response.status_code == 200, response.status_code
+            return one
+
+        result = results[size] = {
+            'feed_ms': common.timed(get('/api/topics/{}/feed/'), args.requests),
+            'filtered_list_ms': common.timed(get('/api/posts/?topic={}&status=published'), args.requests),
+            'posts': Post.objects.count(),
+        }
+        print('{:>8} posts: feed {:.2f} ms, filtered post list {:.2f} ms'.format(
+            result['posts'], result['feed_ms'], result['filtered_list_ms']))
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Per object cost of the hyperlinked fields, reversed for every object (DRF) against the
+templates of app.hyperlinks.
+
+    python -m benchmarks.hyperlinks --posts 10000
+"""
+from benchmarks import common
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+    common.seed(users=100, topics=50, posts=args.posts)
+
+    from rest_framework import serializers
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from app.models import Post
+    from app.serializers import PostSerializer
+
+    class ReversingPostSerializer(PostSerializer):
+        serializer_related_field = serializers.HyperlinkedRelatedField
+        url = serializers.HyperlinkedIdentityField(view_name='post-detail')
+
+    request = Request(APIRequestFactory().get('/api/'))
+    posts = list(Post.objects.order_by('created', 'pk'))
+
+    def serialize(serializer_class):
+        return lambda: serializer_class(posts, many=True, context={'request': request}).data
+
+    assert serialize(ReversingPostSerializer)() == serialize(PostSerializer)()
+    reverse_ms = common.timed(serialize(ReversingPostSerializer), args.repeat)
+    template_ms = common.timed(serialize(PostSerializer), args.repeat)
+    results = {
+        'posts': len(posts),
+        'reverse_us_per_post': reverse_ms * 1000 / len(posts),
+        'template_us_per_post': template_ms * 1000 / len(posts),
+        'speedup': reverse_ms / template_ms,
+    }
+    for key in sorted(results):
+        print('{:<22} {:.2f}'.format(key, results[key]))
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
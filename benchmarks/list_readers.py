@@ -0,0 +1,63 @@
+"""
+Serialization time of list pages, DRF serializers against the readers of app.readers.
+
+    python -m benchmarks.list_readers --posts 10000
+
+Both paths read and render the same rows; the time includes the queries. The readers
+are expected to be at least 5x faster on posts.
+"""
+from benchmarks import common
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--topics', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+    common.seed(users=args.users, topics=args.topics, posts=args.posts)
+
+    from django.db.models import Prefetch
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from app.models import Post, Topic, User
+    from app.readers import PostListReader, TopicListReader, UserListReader
+    from app.serializers import PostSerializer, TopicSerializer, UserSerializer
+
+    request = Request(APIRequestFactory().get('/api/'))
+    renderer = JSONRenderer()
+    posts = Prefetch('posts', queryset=Post.objects.order_by('created', 'pk'))
+    cases = [
+        ('posts', PostSerializer, PostListReader, Post.objects.order_by('created', 'pk')),
+        ('topics', TopicSerializer, TopicListReader, Topic.objects.prefetch_related(posts).order_by('pk')),
+        ('users', UserSerializer, UserListReader, User.objects.prefetch_related(posts).order_by('created', 'pk')),
+    ]
+
+    results = {}
+    for name, serializer_class, reader_class, queryset in cases:
+        def serialize():
+            serializer = serializer_class(queryset.all(), many=True, context={'request': request})
+            return renderer.render(serializer.data)
+
+        def read():
+            reader = reader_class(request)
+            return renderer.render(reader.to_representation(reader.get_queryset(queryset.all())))
+
+        assert serialize() == read(), 'the {} reader output differs from the serializer'.format(name)
+        serializer_ms = common.timed(serialize, args.repeat)
+        reader_ms = common.timed(read, args.repeat)
+        results[name] = {'serializer_ms': serializer_ms, 'reader_ms': reader_ms, 'speedup': serializer_ms / reader_ms}
+        print('{:<8} serializer {:9.1f} ms  reader {:9.1f} ms  speedup {:5.1f}x'.format(
+            name, serializer_ms, reader_ms, serializer_ms / reader_ms
+        ))
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
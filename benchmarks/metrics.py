@@ -0,0 +1,44 @@
+"""
+Cost of recording app.metrics values (per call, in microseconds) and of a scrape.
+
+    python -m benchmarks.metrics --calls 100000
+"""
+from benchmarks import common
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    common.setup(args.database)
+
+    from app import metrics
+
+    registry = metrics.Registry()
+    counter = registry.counter('bench_total', 'Counter.', ('viewset', 'action', 'status'))
+    histogram = registry.histogram('bench_seconds', 'Histogram.', ('viewset', 'action'))
+    labels = ('PostViewSet', 'list')
+    counter_labels = labels + ('200',)
+
+    def inc():
+        for _ in range(args.calls):
+            counter.inc(counter_labels)
+
+    def observe():
+        for index in range(args.calls):
+            histogram.observe(labels, (index % 100) / 1000.0)
+
+    results = {
+        'counter_inc_us': common.timed(inc, args.repeat) * 1000 / args.calls,
+        'histogram_observe_us': common.timed(observe, args.repeat) * 1000 / args.calls,
+        'exposition_ms': common.timed(lambda: metrics.registry.exposition(), args.repeat),
+    }
+    for key in sorted(results):
+        print('{:<22} {:.3f}'.format(key, results[key]))
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
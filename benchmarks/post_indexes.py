@@ -0,0 +1,75 @@
+"""
+Query plans and timings of the hot Post filters before and after migration 0005.
+
+    python -m benchmarks.post_indexes --posts 1000000
+
+Seeds the dataset with the schema of migration 0004, measures, applies 0005 and
+measures again.
+"""
+from benchmarks import common
+
+
+def queries(Post, topic_pk, user_pk, middle):
+    page = 50
+    return {
+        'published page': Post.objects.filter(status='published').order_by('created', 'pk')[:page],
+        'published deep page': Post.objects.filter(status='published', created__gt=middle).order_by(
+            'created', 'pk')[:page],
+        'drafts count': Post.objects.filter(status='draft'),
+        'topic page': Post.objects.filter(topic_id=topic_pk).order_by('created', 'pk')[:page],
+        'user page': Post.objects.filter(user_id=user_pk).order_by('created', 'pk')[:page],
+        'user drafts': Post.objects.filter(user_id=user_pk, status='draft').order_by('created', 'pk')[:page],
+    }
+
+
+def explain(queryset):
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+
+
+def measure(label, Post, topic_pk, user_pk, middle, repeat):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    results = {}
+    for name, queryset in queries(Post, topic_pk, user_pk, middle).items():
+        run = queryset.count if name.endswith('count') else lambda q=queryset: list(q.all())
+        results[name] = {'plan': explain(queryset), 'ms': common.timed(run, repeat)}
+        print('[{}] {:<22} {:9.2f} ms  {}'.format(label, name, results[name]['ms'], ' | '.join(results[name]['plan'])))
+    return results
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    # The models of the tree have columns that 0004 does not: seed and query with the
+    # historical models of the migrated state.
+    apps = common.migrate('0004')
+    user_pks, topic_pks = common.seed(users=args.users, topics=args.topics, posts=args.posts, apps=apps)
+
+    Post = apps.get_model('app', 'Post')
+    ordered = Post.objects.order_by('created').values_list('created', flat=True)
+    middle = ordered[args.posts // 2]
+
+    before = measure('before', Post, topic_pks[0], user_pks[0], middle, args.repeat)
+    Post = common.migrate('0005').get_model('app', 'Post')
+    after = measure('after', Post, topic_pks[0], user_pks[0], middle, args.repeat)
+
+    common.write_results(args.output, {'posts': args.posts, 'before': before, 'after': after})
+
+
+if __name__ == '__main__':
+    main()
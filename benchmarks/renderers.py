@@ -0,0 +1,57 @@
+"""
+Rendering and parsing time of PostSerializer output, DRF's stdlib json renderer and
+parser against app.renderers/app.parsers.
+
+    python -m benchmarks.renderers --posts 10000
+"""
+import io
+
+from benchmarks import common
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+    common.seed(users=100, topics=50, posts=args.posts)
+
+    from rest_framework import parsers, renderers
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from app import renderers as app_renderers, parsers as app_parsers
+    from app.models import Post
+    from app.serializers import PostSerializer
+
+    if app_renderers.orjson is None:
+        print('orjson is not installed, app.renderers falls back to the stdlib encoder')
+
+    request = Request(APIRequestFactory().get('/api/'))
+    data = PostSerializer(Post.objects.order_by('created', 'pk'), many=True, context={'request': request}).data
+    body = renderers.JSONRenderer().render(data)
+    assert app_renderers.JSONRenderer().render(data) == body
+
+    results = {'posts': len(data), 'megabytes': len(body) / 1024.0 / 1024.0}
+    for name, drf, app in [
+        ('render', lambda: renderers.JSONRenderer().render(data), lambda: app_renderers.JSONRenderer().render(data)),
+        ('parse', lambda: parsers.JSONParser().parse(io.BytesIO(body)),
+         lambda: app_parsers.JSONParser().parse(io.BytesIO(body))),
+    ]:
+        drf_ms = common.timed(drf, args.repeat)
+        app_ms = common.timed(app, args.repeat)
+        results.update({
+            '{}_drf_ms'.format(name): drf_ms,
+            '{}_app_ms'.format(name): app_ms,
+            '{}_speedup'.format(name): drf_ms / app_ms,
+        })
+    for key in sorted(results):
+        print('{:<18} {:.2f}'.format(key, results[key]))
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
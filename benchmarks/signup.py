@@ -0,0 +1,78 @@
+"""
+Signup throughput under concurrency, per PBKDF2 cost and bound on concurrent hashes.
+
+    python -m benchmarks.signup --threads 16 --signups 400 --iterations 150000 20000 --concurrency 0 4
+
+Every thread signs users up through the Django test client against a SQLite file.
+Reports signups per second and latency percentiles for each combination, and the
+latency of the requests that another thread sends to the index page meanwhile.
+"""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import common
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--signups', type=int, default=400)
+    parser.add_argument('--iterations', type=int, nargs='+', default=[150000, 20000])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[0, 4])
+    args = parser.parse_args()
+
+    common.setup(args.database)
+    common.migrate()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+
+    counter = itertools.count()
+
+    def signup(_):
+        email = 'signup{}@example.com'.format(next(counter))
+        start = time.perf_counter()
+        response = Client().post('/api/users/', {
+            'first_name': 'First', 'last_name': 'Last', 'email': email, 'password': 'not-a-common-password',
+        })
+        elapsed = (time.perf_counter() - start) * 1000
+        connection.close()
+        assert response.status_code == 201, response.content
+        return elapsed
+
+    def read(done, timings):
+        client = Client()
+        while not done.is_set():
+            start = time.perf_counter()
+            response = client.get('/')
+            timings.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.status_code
+        connection.close()
+
+    results = []
+    for iterations, concurrency in itertools.product(args.iterations, args.concurrency):
+        settings.PASSWORD_HASH_ITERATIONS = iterations
+        settings.PASSWORD_HASH_CONCURRENCY = concurrency
+        done, read_timings = threading.Event(), []
+        reader = threading.Thread(target=read, args=(done, read_timings))
+        reader.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            timings = list(executor.map(signup, range(args.signups)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        reader.join()
+        result = dict(common.percentiles(timings), iterations=iterations, concurrency=concurrency,
+                      signups_per_second=args.signups / elapsed, read=common.percentiles(read_timings))
+        results.append(result)
+        print('iterations {iterations:>7} concurrency {concurrency:>2}  {signups_per_second:7.1f} signups/s  '
+              'p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  p99 {p99:7.1f} ms  '
+              'reads p50 {read[p50]:6.1f} ms  p99 {read[p99]:6.1f} ms'.format(**result))
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Mixed read/write traffic on the post endpoints from concurrent threads, against a fresh
+SQLite file per PRAGMA profile (see app/db/backends/sqlite3/base.py).
+
+    python -m benchmarks.sqlite_profile --posts 20000 --requests 2000 --threads 16 --write-ratio 0.2
+
+A profile may name the transaction mode of its atomic blocks after a colon, e.g.
+``tuned:DEFERRED``, instead of the mode of the profile.
+
+Reads are the first page of the post list, a topic's posts and post details; writes
+create posts, update their titles, and update a few titles at once with the bulk
+endpoint, which reads the posts and writes them in one transaction. Errors ("database
+is locked" and the like) are counted per profile. Passwords are hashed with a single PBKDF2 iteration, so that
+authenticating the writes does not dominate their latency.
+"""
+import base64
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import common
+
+USERNAME = 'bench-writer'
+PASSWORD = 'bench-writer-password'
+
+
+def environ(method, path, query='', body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else b''
+    credentials = base64.b64encode('{}:{}'.format(USERNAME, PASSWORD).encode('utf-8')).decode('ascii')
+    return {
+        'REQUEST_METHOD': method, 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(data)),
+        'HTTP_AUTHORIZATION': 'Basic {}'.format(credentials),
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(data),
+        'wsgi.errors': io.StringIO(), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+
+
+def prepare(database, pragmas, transaction_mode, posts):
+    """
+    Points the default database at a new file with the PRAGMA profile and transaction
+    mode, migrates and seeds it. Returns the pks of the topics and of the posts to read
+    and update.
+    """
+    from django.conf import settings
+    from django.db import connection
+
+    connection.close()
+    settings.DATABASES['default'].update(NAME=database, PRAGMAS=pragmas, TRANSACTION_MODE=transaction_mode)
+    common.migrate()
+    _, topic_pks = common.seed(users=100, topics=50, posts=posts)
+
+    from app.models import Post, User
+
+    user = User(username=USERNAME, email='{}@example.com'.format(USERNAME), is_staff=True)
+    user.set_password(PASSWORD)
+    user.save()
+    post_pks = list(Post.objects.order_by('?').values_list('pk', flat=True)[:1000])
+    connection.close()
+    return list(topic_pks), post_pks
+
+
+def requests_mix(count, write_ratio, topic_pks, post_pks, seed_value=0):
+    rand = random.Random(seed_value)
+    mix = []
+    for i in range(count):
+        if rand.random() < write_ratio:
+            kind = rand.random()
+            if kind < 1 / 3:
+                mix.append(('write', 'POST', '/api/posts/', '', {
+                    'title': 'Bench {}'.format(i), 'content': 'Benchmark post',
+                    'topic': 'http://localhost/api/topics/{}/'.format(rand.choice(topic_pks)),
+                }))
+            elif kind < 2 / 3:
+                mix.append(('write', 'PATCH', '/api/posts/{}/'.format(rand.choice(post_pks)), '',
+                            {'title': 'Edited {}'.format(i)}))
+            else:
+                mix.append(('write', 'PATCH', '/api/posts/bulk/', '', [
+                    {'url': 'http://localhost/api/posts/{}/'.format(pk), 'title': 'Bulk edited {}'.format(i)}
+                    for pk in rand.sample(post_pks, 5)
+                ]))
+        else:
+            kind = rand.random()
+            if kind < 0.3:
+                mix.append(('read', 'GET', '/api/posts/', '', None))
+            elif kind < 0.6:
+                mix.append(('read', 'GET', '/api/posts/', 'topic={}'.format(rand.choice(topic_pks)), None))
+            else:
+                mix.append(('read', 'GET', '/api/posts/{}/'.format(rand.choice(post_pks)), '', None))
+    return mix
+
+
+def run(application, mix, threads):
+    def one(request):
+        kind, method, path, query, body = request
+        statuses = []
+        start = time.perf_counter()
+        chunks = application(environ(method, path, query, body), lambda status, headers: statuses.append(status))
+        b''.join(chunks)
+        chunks.close()
+        return kind, (time.perf_counter() - start) * 1000, int(statuses[0].split(' ', 1)[0])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        outcomes = list(executor.map(one, mix))
+    elapsed = time.perf_counter() - start
+
+    results = {'requests_per_second': len(mix) / elapsed}
+    for kind in ('read', 'write'):
+        timings = [timing for outcome_kind, timing, _ in outcomes if outcome_kind == kind]
+        if timings:
+            results[kind] = common.percentiles(timings)
+    results['errors'] = sum(1 for _, _, status in outcomes if status >= 500)
+    return results
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--profiles', default='default,tuned:DEFERRED,tuned')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='blog-bench-')
+    common.setup(os.path.join(directory, 'setup.sqlite3'))
+
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+    import logging
+
+    settings.PASSWORD_HASH_ITERATIONS = 1
+    # Failed requests are counted, not logged with their traceback.
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    application = WSGIHandler()
+
+    results = {}
+    for profile in args.profiles.split(','):
+        pragmas, _, transaction_mode = profile.partition(':')
+        database = os.path.join(directory, '{}.sqlite3'.format(profile.replace(':', '-')))
+        topic_pks, post_pks = prepare(database, pragmas, transaction_mode or None, args.posts)
+        mix = requests_mix(args.requests, args.write_ratio, topic_pks, post_pks)
+        result = results[profile] = run(application, mix, args.threads)
+        print('{:<14} {:>7.1f} requests/s  read p50 {:>7.2f} p99 {:>8.2f} ms  write p50 {:>7.2f} p99 {:>8.2f} ms  '
+              'errors {}'.format(profile, result['requests_per_second'], result['read']['p50'], result['read']['p99'],
+                                 result['write']['p50'], result['write']['p99'], result['errors']))
+    common.write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
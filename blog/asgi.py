@@ -0,0 +1,14 @@
+"""
+ASGI config for blog project.
+
+It exposes the ASGI callable as a module-level variable named ``application``. Reads and
+writes are handled in bounded thread pools, see app/asgi.py.
+"""
+
+import os
+
+from app.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog.settings')
+
+application = get_asgi_application()
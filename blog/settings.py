@@ -44,11 +44,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Request metrics scraped from /api/metrics/, see METRICS_* below.
+    'app.metrics.MetricsMiddleware',
+    # Read replica routing and read-your-writes pinning, see DATABASE_REPLICAS below.
+    'app.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Opt-in timing breakdown of requests, see PROFILING_* below. After the session
+    # authentication, which tells staff users.
+    'app.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,6 +80,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'blog.wsgi.application'
 
+# ASGI mode (blog/asgi.py, app/asgi.py): threads handling reads (GET, HEAD, OPTIONS) and
+# writes, per process. Waiting connections do not take a thread.
+
+ASGI_READ_THREADS = int(os.environ.get('ASGI_READ_THREADS', 32))
+ASGI_WRITE_THREADS = int(os.environ.get('ASGI_WRITE_THREADS', 4))
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -80,10 +93,26 @@ WSGI_APPLICATION = 'blog.wsgi.application'
 # This is the default Django db which is not advised to be used in production or complex systems.
 # But for simplicity on this project I will keep using it and commit it to github.
 
+# The engines of app.db.backends (sqlite3, postgresql) reuse connections from a pool per
+# process instead of connecting for every request, see POOL below and app/db/pool.py.
+# The pool holds up to SIZE connections, by default as many as the threads of the ASGI mode.
+# PRAGMAS (SQLite) is applied to every new connection: the 'tuned' profile of
+# app/db/backends/sqlite3/base.py (WAL, mmap, synchronous=NORMAL, busy timeout...),
+# 'default' for SQLite's defaults, or a dict of PRAGMAs. Atomic blocks of the 'tuned' profile
+# begin with BEGIN IMMEDIATE, taking the write lock up front; TRANSACTION_MODE (DEFERRED,
+# IMMEDIATE or EXCLUSIVE) overrides the mode of the profile.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'app.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'PRAGMAS': os.environ.get('SQLITE_PRAGMAS', 'tuned'),
+        'POOL': {
+            'SIZE': int(os.environ.get('DATABASE_POOL_SIZE', ASGI_READ_THREADS + ASGI_WRITE_THREADS)),
+            'TIMEOUT': 10,
+            'MAX_LIFETIME': 600,
+            'CHECK_IDLE': 30,
+        },
     }
 }
 # Recommended database and settings: Postgres
@@ -93,7 +122,7 @@ DATABASES = {
 # _ENGINE = "django.db.backends.postgresql_psycopg2"
 # DATABASES = {
 #     'default': {
-#         'ENGINE': _ENGINE,  # Add 'postgresql_psycopg2', 'postgresql'
+#         'ENGINE': _ENGINE,  # Add 'postgresql_psycopg2', 'postgresql', or 'app.db.backends.postgresql' for pooling
 #         'NAME': 'blog',
 #         'USER': 'developer',
 #         'PASSWORD': 'developer',
@@ -102,6 +131,38 @@ DATABASES = {
 #     }
 # }
 
+# Read replicas (app/routers.py): alias -> weight. The list and retrieve endpoints open to
+# everybody read from them, requests of a client that wrote in the last
+# REPLICA_PIN_SECONDS seconds (REPLICA_PIN_COOKIE cookie) read from the primary, and a
+# replica that fails to connect is skipped for REPLICA_RETRY_SECONDS seconds.
+# DATABASE_REPLICA_NAMES (environment variable) adds comma separated SQLite files, e.g.
+# copies of db.sqlite3 standing in for replicas locally.
+
+DATABASE_ROUTERS = ['app.routers.ReplicaRouter']
+DATABASE_REPLICAS = {}
+
+for _index, _name in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_NAMES', '').split(',')), 1):
+    DATABASES['replica{}'.format(_index)] = dict(DATABASES['default'], NAME=_name, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS['replica{}'.format(_index)] = 1
+
+REPLICA_PIN_COOKIE = 'pin_primary'
+REPLICA_PIN_SECONDS = 10
+REPLICA_RETRY_SECONDS = 30
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# Rendered detail responses of the API are cached here (see app/cache.py). Any Django
+# cache backend works, use a shared one (memcached, redis) when running several processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = 300
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -120,9 +181,81 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/2.2/topics/auth/passwords/
+# The first hasher hashes new passwords, all of them check existing ones. The PBKDF2 cost
+# is set per environment, e.g. lower for development and test runs.
+
+PASSWORD_HASHERS = [
+    'app.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 150000))
+
+# At most this many signup passwords are hashed at once per process, 0 for no limit.
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 0))
+
+# Request profiling (app/profiling.py)
+# Requests sending the PROFILING_HEADER header (None to ignore it) and a PROFILING_SAMPLE_RATE
+# fraction of all requests get a Server-Timing header and a JSON log line with their queries.
+# The header is honoured from staff users with a session, or with the value of the
+# PROFILING_SECRET environment variable; without it anonymous requests cannot turn profiling on.
+
+PROFILING_HEADER = 'X-Profile'
+PROFILING_SECRET = os.environ.get('PROFILING_SECRET') or None
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+
+# Metrics (app/metrics.py)
+# With several worker processes, set METRICS_MULTIPROCESS_DIR to a directory shared by
+# them (and emptied on deploy): each process writes its metrics there every
+# METRICS_FLUSH_INTERVAL seconds and a scrape adds them up.
+
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR') or None
+METRICS_FLUSH_INTERVAL = 1.0
+
+# Client addresses (REMOTE_ADDR) allowed to scrape /api/metrics/, besides staff users.
+# METRICS_ALLOWED_IPS (environment variable) is comma separated, empty by default. Only list
+# scrapers that connect directly: behind a reverse proxy every client has its address.
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'app.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'app.metrics': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Include default rest_permission class
 REST_FRAMEWORK = {
    'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.IsAdminUser', ),
+   # JSON goes through orjson when it is installed, the output is the same as DRF's.
+   'DEFAULT_RENDERER_CLASSES': (
+       'app.renderers.JSONRenderer',
+       'rest_framework.renderers.BrowsableAPIRenderer',
+   ),
+   'DEFAULT_PARSER_CLASSES': (
+       'app.parsers.JSONParser',
+       'rest_framework.parsers.FormParser',
+       'rest_framework.parsers.MultiPartParser',
+   ),
 }
 
 